@@ -1,97 +1,350 @@
 import math
 import time
+import numpy as np
+import threading
+import itertools
+import queue
+from collections import namedtuple
+from concurrent.futures import Future
 import serial
 from u2can.DM_CAN import (
-    Motor, MotorControl,
+    Motor, MotorControl, MotorParamCache, BusScheduler,
     DM_Motor_Type, Control_Type, DM_variable
 )
+from topology import Group, load_topology, validate_topology
+
+# 单个电机的状态快照（来自已收到的反馈），age 为距最近一次反馈的秒数；
+# filtered_velocity / acceleration / torque_trend 为 Motor 在收到反馈时增量更新的在线估计
+MotorSnapshot = namedtuple("MotorSnapshot", ["position", "velocity", "torque", "age",
+                                             "filtered_velocity", "acceleration", "torque_trend"])
+
+class _Bus:
+    """
+    一个 U2CAN 适配器：串口、MotorControl，以及独占它们的 I/O 工作线程。
+
+    串口与 MotorControl 只由工作线程访问；其他线程通过 submit() 把操作放入优先级队列
+    （BusScheduler.PRIO_*，数值越小越先执行，同级按提交顺序），并可通过返回的 Future 等待结果。
+    已开始执行的操作不会被打断，因此耗时的状态查询应使用 PRIO_STATUS 提交，
+    使平衡循环的控制帧不必排在 UI 查询之后。
+    stop() 在队列中已有的操作全部执行完后结束工作线程，之后 submit() 会抛出 RuntimeError，
+    直到再次 start()。
+    """
+
+    # 停止标记的优先级低于所有 BusScheduler.PRIO_*，保证它排在已提交的操作之后
+    _STOP_PRIORITY = BusScheduler.PRIO_STATUS + 1
+
+    def __init__(self, name, port, baudrate, timeout, capture=None, param_cache=None):
+        self.name = name
+        self.serial_device = serial.Serial(port, baudrate, timeout=timeout)
+        self.mc = MotorControl(self.serial_device,
+                               capture=capture.tap(name) if capture is not None else None,
+                               param_cache=param_cache)
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.start()
+
+    def start(self):
+        """启动工作线程（已在运行时不做任何事）。"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name=f"bus-{self.name}", daemon=True)
+                self._thread.start()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def stop(self, timeout=None):
+        """
+        停止工作线程：先执行完已排队的操作，再结束线程并等待其退出。
+        在工作线程内部调用时只放入停止标记，不等待。
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._queue.put((self._STOP_PRIORITY, next(self._seq), None, None))
+        if threading.current_thread() is not thread:
+            thread.join(timeout)
+
+    def submit(self, fn, priority=BusScheduler.PRIO_CONTROL):
+        """
+        提交无参函数 fn 到工作线程执行，返回 Future。
+        在工作线程内部嵌套提交时直接执行（避免自身等待自身）。
+        """
+        future = Future()
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                raise RuntimeError(f"总线 {self.name} 的工作线程已停止")
+            if threading.current_thread() is not thread:
+                self._queue.put((priority, next(self._seq), fn, future))
+                return future
+        self._execute(fn, future)
+        return future
+
+    def call(self, fn, priority=BusScheduler.PRIO_CONTROL):
+        """提交 fn 并等待其返回值（异常原样抛出）。"""
+        return self.submit(fn, priority).result()
+
+    def run(self, cmds):
+        """在本总线上依次执行 [(方法名, 电机, 参数元组), ...]（应在工作线程中调用）。"""
+        for method, motor, args in cmds:
+            getattr(self.mc, method)(motor, *args)
+
+    def _execute(self, fn, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _worker(self):
+        while True:
+            _, _, fn, future = self._queue.get()
+            if future is None:
+                return
+            self._execute(fn, future)
+
 
 class LegsController:
     """
     简单的达妙腿部/轮子控制类，只实现基本的初始化、使能、
     失能、扭矩读取以及位置控制。
+
+    电机可以分布在多个 U2CAN 适配器上（例如腿和轮子各用一个），
+    每个适配器一个独占串口的 I/O 工作线程，同一周期内各总线的指令并行发送，全部完成后才返回。
+    平衡循环与 UI 等多个线程可以同时调用本类的方法：所有总线访问都排入工作线程的优先级队列，
+    失能/使能优先于控制指令，控制指令优先于状态查询。直接使用 mc 属性会绕过工作线程，
+    只适用于单线程脚本。
     """
 
-    def __init__(self, port="/dev/dm-u2can", baudrate=921600, timeout=0.5):
-        """打开串口、创建 MotorControl、实例化并注册所有电机。"""
-        self.serial_device = serial.Serial(port, baudrate, timeout=timeout)
-        self.mc = MotorControl(self.serial_device)
+    def __init__(self, port="/dev/dm-u2can", baudrate=921600, timeout=0.5, buses=None, motor_bus=None,
+                 capture=None, param_cache=None, topology=None):
+        """
+        打开串口、创建 MotorControl、按拓扑描述实例化并注册所有电机。
+        :param port: 只有一个适配器时的串口路径
+        :param buses: 可选，{总线名: 串口路径}，例如 {"legs": "/dev/dm-u2can", "wheels": "/dev/dm-u2can2"}；
+                      给出时覆盖拓扑中的 buses
+        :param motor_bus: 可选，{电机名: 总线名}，例如 {"wheel1": "wheels", ...}；覆盖拓扑中的 bus 字段，
+                          两者都未指定的电机放在第一个总线上
+        :param capture: 可选，u2can.can_capture.CanCapture，记录各总线收发的每一帧
+        :param param_cache: 可选，电机参数缓存文件路径（或 MotorParamCache），供 load_motor_params 使用
+        :param topology: 可选，拓扑描述（dict 或 JSON 文件路径，格式见 topology.py），默认四腿四轮
+        """
+        topo = load_topology(topology)
+        validate_topology(topo)
+        if buses is None:
+            buses = topo.get("buses") if topology is not None else None
+            buses = buses or {"main": port}
+        if isinstance(param_cache, str):
+            param_cache = MotorParamCache(param_cache)
+        self.param_cache = param_cache
+        self.buses = {name: _Bus(name, p, baudrate, timeout, capture, param_cache)
+                      for name, p in buses.items()}
+        self.capture = capture
+        default_bus = next(iter(self.buses.values()))
+        # 兼容单总线用法：mc / serial_device 指向第一个总线
+        self.mc = default_bus.mc
+        self.serial_device = default_bus.serial_device
+
+        # 实例化电机（电机名即属性名，如 motor1 / wheel1）并注册到各自的总线
+        motor_bus = motor_bus or {}
+        self.motors = {}
+        self._bus_of = {}
+        members = {}
+        for name, spec in topo["motors"].items():
+            m = Motor(getattr(DM_Motor_Type, spec["type"]), spec["slave"], spec["master"])
+            bus_name = motor_bus.get(name, spec.get("bus"))
+            bus = self.buses[bus_name] if bus_name is not None else default_bus
+            bus.mc.addMotor(m)
+            setattr(self, name, m)
+            self.motors[name] = m
+            self._bus_of[m] = bus
+            members.setdefault(spec["group"], []).append(
+                (m, spec.get("dir", 1), spec.get("turn", 0), bus))
 
-        # 四条腿电机（DM4340）
-        self.motor1 = Motor(DM_Motor_Type.DM4340, 0x01, 0x11)
-        self.motor2 = Motor(DM_Motor_Type.DM4340, 0x02, 0x12)
-        self.motor3 = Motor(DM_Motor_Type.DM4340, 0x03, 0x13)
-        self.motor4 = Motor(DM_Motor_Type.DM4340, 0x04, 0x14)
+        # 编译分组：方向 / 差速系数数组与按总线拆分的电机列表
+        self.groups = {name: Group(name, *zip(*ms)) for name, ms in members.items()}
+        empty = Group("", (), (), (), ())
+        self.legs = self.groups.get("legs", empty).motors
+        self.wheels = self.groups.get("wheels", empty).motors
+        # 腿部电机的安装方向（control_legs_pos / control_legs_mit 的符号）
+        self.LEG_SIGNS = self.groups.get("legs", empty).dirs
 
-        # 四个轮子电机（DMH6215）
-        self.wheel1 = Motor(DM_Motor_Type.DMH6215, 0x05, 0x15)
-        self.wheel2 = Motor(DM_Motor_Type.DMH6215, 0x06, 0x16)
-        self.wheel3 = Motor(DM_Motor_Type.DMH6215, 0x07, 0x17)
-        self.wheel4 = Motor(DM_Motor_Type.DMH6215, 0x08, 0x18)
+    # ---------- 多总线调度 ----------
+    def _run_on_buses(self, work, priority=BusScheduler.PRIO_CONTROL):
+        """
+        执行 {总线: 无参函数}：提交到各总线的工作线程（多个总线并行），全部完成后返回。
+        """
+        futures = [bus.submit(fn, priority) for bus, fn in work.items()]
+        for f in futures:
+            f.result()
 
-        # 注册所有电机
-        for m in (self.motor1, self.motor2, self.motor3, self.motor4,
-                  self.wheel1, self.wheel2, self.wheel3, self.wheel4):
-            self.mc.addMotor(m)
+    def _by_bus(self, motors):
+        """把电机按所在总线分组：{总线: [电机, ...]}。"""
+        groups = {}
+        for m in motors:
+            groups.setdefault(self._bus_of[m], []).append(m)
+        return groups
+
+    def _refresh(self, motors, timeout=0.02):
+        """
+        查询一组电机的状态并等待反馈（各总线并行）。
+        查询帧一次性发出后，等待期间只以 PRIO_STATUS 提交短小的接收操作，
+        工作线程不会被长时间占用，平衡循环的控制帧可以穿插执行。
+        """
+        start = time.monotonic()
+        groups = self._by_bus(motors)
+        self._run_on_buses({bus: (lambda bus=bus, ms=ms: bus.mc.refresh_motors_status(ms, timeout=0))
+                            for bus, ms in groups.items()}, BusScheduler.PRIO_STATUS)
+        while True:
+            pending = [bus for bus, ms in groups.items() if any(m.last_update < start for m in ms)]
+            if not pending or time.monotonic() - start >= timeout:
+                return
+            time.sleep(0.0005)
+            self._run_on_buses({bus: bus.mc.recv for bus in pending}, BusScheduler.PRIO_STATUS)
+
+    def _dispatch(self, cmds, priority=BusScheduler.PRIO_CONTROL):
+        """将 [(方法名, 电机, 参数元组), ...] 按总线分组执行（见 _run_on_buses）。"""
+        groups = {}
+        for cmd in cmds:
+            groups.setdefault(self._bus_of[cmd[1]], []).append(cmd)
+        self._run_on_buses({bus: (lambda bus=bus, c=c: bus.run(c)) for bus, c in groups.items()},
+                           priority)
+
+    def _repeat(self, method, motors, times=3, interval=0.001, priority=BusScheduler.PRIO_SAFETY):
+        """对一组电机重复发送同一指令（使能/失能需要多发几次以确保生效）。"""
+        for i in range(times):
+            if i:
+                time.sleep(interval)
+            self._dispatch([(method, m, ()) for m in motors], priority)
 
     # ---------- 串口管理 ----------
     def open_serial(self):
-        """重新打开已关闭的串口（如果需要）。"""
-        if not self.serial_device.is_open:
-            self.serial_device.open()
+        """重新打开已关闭的串口（如果需要），并重新启动已停止的工作线程。"""
+        for bus in self.buses.values():
+            bus.start()
+        self._run_on_buses({bus: (lambda bus=bus: bus.serial_device.is_open or bus.serial_device.open())
+                            for bus in self.buses.values()}, BusScheduler.PRIO_SAFETY)
 
     def close_serial(self):
-        """关闭串口，释放资源。"""
-        if self.serial_device.is_open:
-            self.serial_device.close()
+        """关闭串口并停止各总线的工作线程，释放资源（之后可用 open_serial 重新打开；重复调用无影响）。"""
+        try:
+            self._run_on_buses({bus: (lambda bus=bus: bus.serial_device.is_open and bus.serial_device.close())
+                                for bus in self.buses.values() if bus.running}, BusScheduler.PRIO_SAFETY)
+        finally:
+            for bus in self.buses.values():
+                bus.stop()
 
     # ---------- 使能 ----------
     def enable_legs(self):
         """使能四条腿电机。"""
-        for m in (self.motor1, self.motor2, self.motor3, self.motor4):
-            self.mc.enable(m)
-        time.sleep(0.001)
-        for m in (self.motor1, self.motor2, self.motor3, self.motor4):
-            self.mc.enable(m)
-        time.sleep(0.001)
-        for m in (self.motor1, self.motor2, self.motor3, self.motor4):
-            self.mc.enable(m)
+        self._repeat("enable", self.legs)
 
     def enable_wheels(self):
         """使能四个轮子电机。"""
-        for w in (self.wheel1, self.wheel2, self.wheel3, self.wheel4):
-            self.mc.enable(w)
-        time.sleep(0.001)
-        for w in (self.wheel1, self.wheel2, self.wheel3, self.wheel4):
-            self.mc.enable(w)
-        time.sleep(0.001)
-        for w in (self.wheel1, self.wheel2, self.wheel3, self.wheel4):
-            self.mc.enable(w)
+        self._repeat("enable", self.wheels)
+
     def disable_all(self):
         """一次性失能所有电机（腿+轮子）。"""
-        for m in (self.motor1, self.motor2, self.motor3, self.motor4,
-                  self.wheel1, self.wheel2, self.wheel3, self.wheel4):
-            self.mc.disable(m)
-        time.sleep(0.001)
-        for m in (self.motor1, self.motor2, self.motor3, self.motor4,
-                  self.wheel1, self.wheel2, self.wheel3, self.wheel4):
-            self.mc.disable(m)
-        time.sleep(0.001)
-        for m in (self.motor1, self.motor2, self.motor3, self.motor4,
-                  self.wheel1, self.wheel2, self.wheel3, self.wheel4):
-            self.mc.disable(m)
+        self._repeat("disable", self.legs + self.wheels)
 
     # ---------- 状态读取 ----------
-    def get_legs_torque(self):
-        """刷新四条腿的状态并返回它们的扭矩列表。"""
-        for m in (self.motor1, self.motor2, self.motor3, self.motor4):
-            self.mc.refresh_motor_status(m)
-        return [
-            self.motor1.getTorque(),
-            self.motor2.getTorque(),
-            self.motor3.getTorque(),
-            self.motor4.getTorque(),
-        ]
+    def get_legs_state(self, max_age=0.1):
+        """
+        返回四条腿的状态快照列表（位置、速度、扭矩、数据年龄，以及滤波速度、加速度、扭矩趋势）。
+        数据来自控制指令的反馈帧；只有超过 max_age 秒未更新的电机才会批量发送一次状态查询。
+        平衡循环运行时反馈持续更新，此调用只是内存读取。
+        """
+        stale = [m for m in self.legs if m.getAge() > max_age]
+        if stale:
+            self._refresh(stale)
+        return [MotorSnapshot(m.getPosition(), m.getVelocity(), m.getTorque(), m.getAge(),
+                              m.getFilteredVelocity(), m.getAcceleration(), m.getTorqueTrend())
+                for m in self.legs]
+
+    def probe(self, timeout=0.2):
+        """
+        向所有电机发送一次状态查询（各总线并行），返回在 timeout 内未响应的电机 SlaveID 列表。
+        用于启动时确认适配器与电机均在线。
+        """
+        start = time.monotonic()
+        self._refresh(self.legs + self.wheels, timeout)
+        return [m.SlaveID for m in self.legs + self.wheels if m.last_update < start]
+
+    def bus_stats(self):
+        """返回各总线的链路利用率统计 {总线名: BusScheduler.stats()}（只读内存）。"""
+        return {name: bus.mc.scheduler.stats() for name, bus in self.buses.items()}
+
+    def health(self):
+        """
+        返回电机健康状态（只读内存，数据来自控制指令的反馈帧，不产生额外总线流量）：
+        {"motors": {电机名: Motor.getHealth()}, "buses": {总线名: HealthMonitor.stats()}}
+        """
+        return {"motors": {name: m.getHealth() for name, m in self.motors.items()},
+                "buses": {name: bus.mc.health.stats() for name, bus in self.buses.items()}}
+
+    def add_health_callback(self, fn):
+        """在所有总线上注册健康事件回调 fn(motor, event, value)（见 HealthMonitor）。"""
+        for bus in self.buses.values():
+            bus.mc.health.add_callback(fn)
+
+    def load_motor_params(self, force=False):
+        """
+        通过参数缓存加载所有电机的参数（各总线并行）：指纹（SN + sw_ver）与缓存一致的电机
+        直接使用缓存，其余完整读取并写回缓存；PMAX/VMAX/TMAX 自动更新 Limit_Param。
+        完整读取期间独占工作线程（数十毫秒），应在启动阶段、平衡循环开始前调用。
+        :return: {SlaveID: "cached" | "read" | "partial" | "missing"}
+        """
+        result = {}
+        self._run_on_buses({bus: (lambda bus=bus, motors=motors:
+                                   result.update(bus.mc.load_motor_params(motors, force=force)))
+                            for bus, motors in self._by_bus(self.legs + self.wheels).items()},
+                           BusScheduler.PRIO_STATUS)
+        return result
+
+    def get_legs_torque(self, max_age=0.1):
+        """返回四条腿的扭矩列表（优先使用缓存的反馈，过期时才刷新）。"""
+        return [s.torque for s in self.get_legs_state(max_age)]
+
+    def get_cached_legs_torque(self):
+        """返回最近一次反馈帧中的四条腿扭矩（只读内存，不访问总线）。"""
+        return [m.getTorque() for m in self.legs]
+
+    # ---------- 分组控制 ----------
+    def _group_pos_work(self, group, pos, vel):
+        """分组位置‑速度指令：整组数组换算方向后，按总线切片交给批量接口。"""
+        pos = group.dirs * np.asarray(pos, np.float64)
+        vel = np.broadcast_to(np.asarray(vel, np.float64), pos.shape)
+        return {bus: (lambda bus=bus, plan=plan:
+                      bus.mc.control_Pos_Vel_batch(plan.motors, pos[plan.index], vel[plan.index]))
+                for bus, plan in group.plans.items()}
+
+    def _group_vel_work(self, group, vel, of_vel=0.0):
+        """分组速度指令：dir * (vel + turn * of_vel)。"""
+        v = group.dirs * (np.asarray(vel, np.float64) + group.turns * of_vel)
+        return {bus: (lambda bus=bus, plan=plan: bus.mc.control_Vel_batch(plan.motors, v[plan.index]))
+                for bus, plan in group.plans.items()}
+
+    def _merge_work(self, *works):
+        """合并多个 {总线: 函数}，同一总线上的函数按顺序执行。"""
+        merged = {}
+        for work in works:
+            for bus, fn in work.items():
+                merged.setdefault(bus, []).append(fn)
+        return {bus: (lambda fns=fns: [fn() for fn in fns]) for bus, fns in merged.items()}
+
+    def control_group_pos(self, name, pos, vel=0.5):
+        """位置‑速度模式控制一个分组；pos 为标量或与分组电机数相同长度的序列（换算方向前）。"""
+        self._run_on_buses(self._group_pos_work(self.groups[name], pos, vel))
+
+    def control_group_vel(self, name, vel, of_vel=0.0):
+        """速度模式控制一个分组；vel 为标量或序列，of_vel 按各电机的 turn 系数叠加差速。"""
+        self._run_on_buses(self._group_vel_work(self.groups[name], vel, of_vel))
 
     # ---------- 位置控制 ----------
     def control_legs_pos(self, pos1, pos2, pos3, pos4, vel=0.5):
@@ -101,20 +354,47 @@ class LegsController:
             pos1‑pos4: 目标位置（单位依据电机规格）
             vel:      速度比例，默认 0.5
         """
-        self.mc.control_Pos_Vel(self.motor1, -pos1, vel)
-        self.mc.control_Pos_Vel(self.motor2,  pos2, vel)
-        self.mc.control_Pos_Vel(self.motor3,  pos3, vel)
-        self.mc.control_Pos_Vel(self.motor4, -pos4, vel)
+        self.control_group_pos("legs", (pos1, pos2, pos3, pos4), vel)
     
+    def control_legs_mit(self, kp, kd, q, dq=0.0, tau=0.0):
+        """
+        MIT（阻抗）模式批量控制四条腿：每个总线上的腿一次编码、一次写入。
+        电机需事先切换到 MIT 模式（MotorControl.switchControlMode）。
+        参数可为标量或长度为 4 的序列；q / dq / tau 按与 control_legs_pos 相同的方向换算。
+        """
+        group = self.groups["legs"]
+        sign = group.dirs
+        n = len(group)
+        kp = np.broadcast_to(np.asarray(kp, np.float64), (n,))
+        kd = np.broadcast_to(np.asarray(kd, np.float64), (n,))
+        q = sign * np.asarray(q, np.float64)
+        dq = sign * np.asarray(dq, np.float64)
+        tau = sign * np.asarray(tau, np.float64)
+        dq = np.broadcast_to(dq, (n,))
+        tau = np.broadcast_to(tau, (n,))
+        work = {}
+        for bus, plan in group.plans.items():
+            idx = plan.index
+            work[bus] = (lambda bus=bus, motors=plan.motors, idx=idx:
+                         bus.mc.controlMIT_batch(motors, kp[idx], kd[idx], q[idx], dq[idx], tau[idx]))
+        self._run_on_buses(work)
+
     def control_wheels_vel(self,vel,of_vel):
-        
-        self.mc.control_Vel(self.wheel1,-(vel+of_vel))
-        self.mc.control_Vel(self.wheel2,(vel-of_vel))
-        self.mc.control_Vel(self.wheel3,-(vel-of_vel))
-        self.mc.control_Vel(self.wheel4,(vel+of_vel))
+        """速度模式控制四个轮子（vel 为前进速度，of_vel 为左右差速）。"""
+        self.control_group_vel("wheels", vel, of_vel)
+
+    def control_tick(self, positions, leg_vel, wheels_vel, wheels_off):
+        """
+        一个控制周期内同时下发腿部位置与轮速指令。
+        腿和轮子在不同总线上时两组指令并行发送，全部总线完成后返回。
+        """
+        if self.capture is not None:
+            self.capture.mark()
+        self._run_on_buses(self._merge_work(
+            self._group_pos_work(self.groups["legs"], positions, leg_vel),
+            self._group_vel_work(self.groups["wheels"], wheels_vel, wheels_off)))
         
     def zero_position(self):
         """将四条腿电机的位置归零（相对当前位置）。"""
-        for m in (self.motor1, self.motor2, self.motor3, self.motor4):
-            self.mc.control_Pos_Vel(m, 0, 0.5)
+        self.control_legs_pos(0, 0, 0, 0, 0.5)
         self.control_wheels_vel(0,0)
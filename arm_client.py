@@ -0,0 +1,136 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ARM_BASE_URL = "http://127.0.0.1:8081"
+ACTION_GROUP_RUN = "/action-group/run"
+
+
+class ArmJob:
+    """一次动作组请求的状态记录。"""
+
+    def __init__(self, job_id, path):
+        self.id = job_id
+        self.path = path
+        self.state = "queued"       # queued / running / done / failed / cancelled
+        self.message = ""
+        self.submitted = time.time()
+        self.finished = None
+        self.future = None
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "path": self.path,
+            "state": self.state,
+            "message": self.message,
+            "elapsed": (self.finished or time.time()) - self.submitted,
+        }
+
+
+class ArmClient:
+    """
+    手臂动作组服务客户端：
+    - 复用一个 keep-alive 的 requests.Session（连接池），不再每次新建连接
+    - 请求以后台任务提交，立即返回任务 ID，可轮询状态或注册完成回调
+    - 通过线程池大小限制同时进行的动作数（默认 1，动作串行执行）
+    - 排队中的任务可取消；已发出的请求无法中断，取消后其结果被丢弃
+    """
+
+    def __init__(self, base_url=ARM_BASE_URL, max_concurrency=1, timeout=60.0, max_jobs=100):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="arm")
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    # ---------- 连接 ----------
+    def _get_session(self):
+        # requests 延迟导入，只有真正控制手臂时才加载
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    # ---------- 任务 ----------
+    def submit(self, path=ACTION_GROUP_RUN, callback=None):
+        """
+        提交一个动作组请求并立即返回任务 ID。
+        :param callback: 可选，任务结束（成功/失败/取消）后以 job 状态字典调用
+        """
+        job = ArmJob(next(self._ids), path)
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job)
+        if callback is not None:
+            job.future.add_done_callback(lambda _f: callback(job.as_dict()))
+        return job.id
+
+    def _run(self, job):
+        # 状态检查与切换在锁内进行：出队后、开始执行前被取消的任务也要记录结束时间，
+        # 否则等待 finished 的调用方会一直等下去
+        with self._jobs_lock:
+            if job.state == "cancelled":
+                job.finished = time.time()
+                return
+            job.state = "running"
+        try:
+            response = self._get_session().post(self.base_url + job.path, timeout=self.timeout)
+            ok = response.status_code == 200
+            if job.state != "cancelled":
+                job.state = "done" if ok else "failed"
+                job.message = "" if ok else response.text
+        except Exception as e:
+            if job.state != "cancelled":
+                job.state = "failed"
+                job.message = str(e)
+        finally:
+            job.finished = time.time()
+
+    def status(self, job_id):
+        """返回任务状态字典；未知 ID 返回 None。"""
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+        return job.as_dict() if job is not None else None
+
+    def cancel(self, job_id):
+        """取消任务：排队中的直接取消；执行中的标记为取消并丢弃结果。"""
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in ("done", "failed", "cancelled"):
+                return False
+            job.state = "cancelled"
+        if job.future is not None and job.future.cancel():
+            job.finished = time.time()
+        return True
+
+    def _prune(self):
+        """只保留最近 max_jobs 个已结束的任务记录。"""
+        if len(self._jobs) <= self.max_jobs:
+            return
+        for job_id in sorted(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[job_id].finished is not None:
+                del self._jobs[job_id]
+
+    def close(self):
+        """取消排队任务并关闭连接池。"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
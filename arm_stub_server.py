@@ -0,0 +1,77 @@
+"""
+手臂动作组服务的本地替身，用于在没有手臂硬件时测试 ArmClient 与 UI。
+
+    python arm_stub_server.py --port 8081 --delay 3
+
+POST /action-group/run 会等待 delay 秒（模拟动作执行时间）后返回 200。
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _make_handler(delay, status):
+    class ArmStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # 支持 keep-alive
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            if self.path != "/action-group/run":
+                self._reply(404, {"error": "not found"})
+                return
+            time.sleep(delay)
+            self.server.runs += 1
+            self._reply(status, {"ok": status == 200, "runs": self.server.runs})
+
+        def _reply(self, code, body):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return ArmStubHandler
+
+
+def start_stub_server(host="127.0.0.1", port=0, delay=1.0, status=200):
+    """
+    在后台线程启动替身服务，返回 (server, base_url)；port=0 时自动选择空闲端口。
+    用完后调用 server.shutdown()。
+    """
+    server = ThreadingHTTPServer((host, port), _make_handler(delay, status))
+    server.runs = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="手臂动作组服务本地替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=3.0, help="模拟动作耗时（秒）")
+    parser.add_argument("--status", type=int, default=200, help="返回的 HTTP 状态码")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(args.delay, args.status))
+    server.runs = 0
+    print(f"arm stub server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
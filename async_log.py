@@ -0,0 +1,131 @@
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    非阻塞入队的 QueueHandler：队列已满时直接丢弃并计数，
+    由监听线程稍后写出一条汇总记录，调用线程永远不会被日志 I/O 阻塞。
+    """
+
+    def __init__(self, q):
+        super().__init__(q)
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+
+    def take_dropped(self):
+        """返回并清零自上次调用以来丢弃的记录数。"""
+        with self._dropped_lock:
+            n, self._dropped = self._dropped, 0
+        return n
+
+
+class BatchedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """按大小轮转的文件 handler；emit 不逐条 flush，由监听线程每批 flush 一次。"""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class BatchingQueueListener:
+    """
+    后台日志线程：阻塞等待第一条记录，随后一次性取出队列中已有的记录（最多 batch_size 条），
+    逐条交给 handlers 后统一 flush。
+    """
+
+    _SENTINEL = None
+
+    def __init__(self, q, queue_handler, handlers, batch_size=256):
+        self.queue = q
+        self.queue_handler = queue_handler
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """写出剩余记录并结束线程。"""
+        if self._thread is None:
+            return
+        self.queue.put(self._SENTINEL)
+        self._thread.join()
+        self._thread = None
+
+    def _handle(self, record):
+        for h in self.handlers:
+            if record.levelno >= h.level:
+                h.handle(record)
+
+    def _flush(self):
+        for h in self.handlers:
+            if isinstance(h, BatchedRotatingFileHandler):
+                h.flush_batch()
+            else:
+                h.flush()
+
+    def _run(self):
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is self._SENTINEL:
+                    running = False
+                    continue
+                self._handle(record)
+            dropped = self.queue_handler.take_dropped()
+            if dropped:
+                self._handle(logging.makeLogRecord({
+                    "name": "log", "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"日志队列已满，丢弃 {dropped} 条记录",
+                }))
+            self._flush()
+
+
+def setup_logging(path, level=logging.INFO, max_bytes=1024 * 1024, backup_count=3,
+                  queue_size=10000, console=True):
+    """
+    配置根 logger：所有日志先进入有界队列，由后台线程批量写入按大小轮转的文件
+    （并可选输出到控制台）。返回已启动的监听器，退出前调用其 stop()。
+    """
+    fmt = logging.Formatter(LOG_FORMAT)
+    file_handler = BatchedRotatingFileHandler(path, maxBytes=max_bytes,
+                                              backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(fmt)
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(logging.Formatter("%(message)s"))
+        handlers.append(console_handler)
+
+    q = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(q)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    listener = BatchingQueueListener(q, queue_handler, handlers)
+    listener.start()
+    return listener
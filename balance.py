@@ -1,6 +1,18 @@
+import logging
 import time
-from dm_imu import imu_py
 from Legs_controller import LegsController
+from command_channel import CommandChannel
+
+logger = logging.getLogger("balance")
+
+class DummyLegs:
+    """腿部控制器不可用时的占位对象（没有 mc 属性，调用方据此跳过电机操作）。"""
+
+class DummyImu:
+    """IMU 不可用时的占位对象。"""
+    def getData(self):
+        # 返回零姿态以便算法继续运行
+        return {'roll': 0.0, 'pitch': 0.0, 'yaw': 0.0}
 
 class BalanceController:
     """
@@ -9,31 +21,59 @@ class BalanceController:
     与位置控制等接口，保持脚本仍可直接运行。
     """
 
-    def __init__(self, imu_port="/dev/dm-imu", imu_baud=921600, leg_port="/dev/dm-u2can"):
+    def __init__(self, imu_port="/dev/dm-imu", imu_baud=921600, leg_port="/dev/dm-u2can",
+                 command_rate_hz=50.0, leg_buses=None, motor_bus=None, legs=None, imu=None,
+                 pitch_gain=0.0002, roll_gain=0.0001, pitch_deadband=2.0, roll_deadband=2.0,
+                 max_offset=0.5):
+        """
+        legs / imu 可传入已完成初始化的设备对象（例如由 bringup.bring_up 并行探测得到），
+        此时跳过对应设备的创建。
+        pitch_gain / roll_gain 为每周期偏置增量与角度（度）之比，pitch_deadband / roll_deadband
+        为不调整的角度死区（度），max_offset 为偏置上限；可用 tuning.py 离线搜索。
+        """
         # 实例化 LegsController（内部完成串口、MotorControl、所有电机的注册）
         # 若实际硬件不存在，LegsController 会在内部捕获异常，仍可安全实例化
-        try:
-            self.legs = LegsController(port=leg_port)
-        except Exception as e:
-            print(f"初始化 LegsController 失败: {e}")
-            # 创建一个空对象，后续通过 getattr 检查其是否拥有 mc 属性
-            self.legs = type('DummyLegs', (), {})()
+        # leg_buses / motor_bus 用于把腿和轮子分到多个 U2CAN 适配器上（见 LegsController）
+        if legs is not None:
+            self.legs = legs
+        else:
+            try:
+                self.legs = LegsController(port=leg_port, buses=leg_buses, motor_bus=motor_bus)
+            except Exception as e:
+                logger.error(f"初始化 LegsController 失败: {e}")
+                # 使用占位对象，后续通过 getattr 检查其是否拥有 mc 属性
+                self.legs = DummyLegs()
         # 初始化 IMU（若硬件不可用则使用模拟对象）
-        try:
-            self.imu = imu_py.DmImu(imu_port, imu_baud)
-            self.imu.start()
-        except Exception as e:
-            print(f"初始化 IMU 失败: {e}")
-            class DummyImu:
-                def getData(self):
-                    # 返回零姿态以便算法继续运行
-                    return {'roll': 0.0, 'pitch': 0.0, 'yaw': 0.0}
-            self.imu = DummyImu()
+        # 扩展模块在此处才加载，import balance 本身不触发 .so 搜索
+        if imu is not None:
+            self.imu = imu
+        else:
+            try:
+                from dm_imu import imu_py
+                self.imu = imu_py.DmImu(imu_port, imu_baud)
+                self.imu.start()
+            except Exception as e:
+                logger.error(f"初始化 IMU 失败: {e}")
+                self.imu = DummyImu()
+        # 平衡算法参数（见 _update_offsets）
+        self.pitch_gain = pitch_gain
+        self.roll_gain = roll_gain
+        self.pitch_deadband = pitch_deadband
+        self.roll_deadband = roll_deadband
+        self.max_offset = max_offset
         # 运行标志，控制主循环的退出
         self._running = False
         self.offs=[0.0,0.0,0.0,0.0]
         self.wheels_vel=0.0
         self.wheels_off=0.0
+        # 轮速指令通道：UI 提交最新值，控制循环在周期边界合并应用
+        self.commands = CommandChannel(initial={"vel": 0.0, "off": 0.0},
+                                       max_rate_hz=command_rate_hz)
+        # 四条腿的基准高度（平衡偏置在此基础上扣除）
+        self.leg_base = [0.85, 0.85, 0.85, 0.85]
+        # 遥测快照：由控制循环每个周期整体替换（引用赋值是原子的），UI 只读不加锁
+        self._telemetry = {}
+        self._loop_dt = 0.001   # 平滑后的循环周期（秒）
 
     # ---------- 电机管理 ----------
     def enable_all(self):
@@ -43,14 +83,14 @@ class BalanceController:
             self.legs.enable_wheels()
             self.legs.zero_position()
         else:
-            print("警告: LegsController 未成功初始化串口，跳过使能步骤。")
+            logger.warning("LegsController 未成功初始化串口，跳过使能步骤。")
 
     def disable_all(self):
         """一次性失能所有电机（腿+轮子）。"""
         if getattr(self.legs, "mc", None):
             self.legs.disable_all()
         else:
-            print("警告: LegsController 未成功初始化串口，跳过失能步骤。")
+            logger.warning("LegsController 未成功初始化串口，跳过失能步骤。")
 
     # ---------- 状态读取 ----------
     def get_legs_torque(self):
@@ -58,44 +98,115 @@ class BalanceController:
         if getattr(self.legs, "mc", None):
             return self.legs.get_legs_torque()
         else:
-            print("警告: LegsController 未成功初始化串口，返回空列表。")
+            logger.warning("LegsController 未成功初始化串口，返回空列表。")
             return []
 
+    def get_telemetry(self):
+        """返回控制循环维护的最新遥测快照（内存读取，不访问串口）。"""
+        snap = self._telemetry
+        if not snap:
+            return {}
+        snap = dict(snap)
+        snap["age"] = time.monotonic() - snap["t"]
+        if hasattr(self.legs, "bus_stats"):
+            snap["bus"] = self.legs.bus_stats()
+        if hasattr(self.legs, "health"):
+            snap["health"] = self.legs.health()
+        return snap
+
     # ---------- 位置控制 ----------
     def control_legs_pos(self, pos1, pos2, pos3, pos4, vel=0.5):
         """使用 LegsController 的位置‑速度控制四条腿。"""
         if getattr(self.legs, "mc", None):
             self.legs.control_legs_pos(pos1, pos2, pos3, pos4, vel)
         else:
-            print("警告: LegsController 未成功初始化串口，跳过位置控制。")
+            logger.warning("LegsController 未成功初始化串口，跳过位置控制。")
 
     # ---------- 私有工具 ----------
     def _limit_offsets(self,offs):
-        """将偏置限制在 0~0.5 之间。"""
-        return min(max(offs, 0.0), 0.5)
+        """将偏置限制在 0~max_offset 之间。"""
+        return min(max(offs, 0.0), self.max_offset)
 
     def _update_offsets(self, data):
-        if data['pitch']>2:
-            self.offs[0]=self.offs[0]+0.0002*(data['pitch'])
-            self.offs[1]=self.offs[1]+0.0002*(data['pitch'])
-        if data['pitch']<-2:
-            self.offs[2]=self.offs[2]+0.0002*(-data['pitch'])
-            self.offs[3]=self.offs[3]+0.0002*(-data['pitch'])
-        if data['roll']<-2:
-            self.offs[0]=self.offs[0]+0.0001*(-data['roll'])
-            self.offs[3]=self.offs[3]+0.0001*(-data['roll'])
-        if data['roll']>2:
-            self.offs[1]=self.offs[1]+0.0001*(data['roll'])
-            self.offs[2]=self.offs[2]+0.0001*(data['roll'])
+        pg, rg = self.pitch_gain, self.roll_gain
+        if data['pitch']>self.pitch_deadband:
+            self.offs[0]=self.offs[0]+pg*(data['pitch'])
+            self.offs[1]=self.offs[1]+pg*(data['pitch'])
+        if data['pitch']<-self.pitch_deadband:
+            self.offs[2]=self.offs[2]+pg*(-data['pitch'])
+            self.offs[3]=self.offs[3]+pg*(-data['pitch'])
+        if data['roll']<-self.roll_deadband:
+            self.offs[0]=self.offs[0]+rg*(-data['roll'])
+            self.offs[3]=self.offs[3]+rg*(-data['roll'])
+        if data['roll']>self.roll_deadband:
+            self.offs[1]=self.offs[1]+rg*(data['roll'])
+            self.offs[2]=self.offs[2]+rg*(data['roll'])
 		
-        # 归一化到 0~0.5 区间
+        # 归一化到 0~max_offset 区间
         min_off = min(self.offs)
         self.offs = [o - min_off for o in self.offs]
         self.offs = [self._limit_offsets(o) for o in self.offs]
 
         return self.offs
 
+    def _publish_telemetry(self, data, dt):
+        """用本周期的数据生成新快照并替换旧快照。"""
+        # 循环周期做指数平滑，避免单次调度抖动
+        self._loop_dt += 0.05 * (dt - self._loop_dt)
+        if getattr(self.legs, "mc", None):
+            torques = self.legs.get_cached_legs_torque()
+        else:
+            torques = []
+        self._telemetry = {
+            "t": time.monotonic(),
+            "roll": data["roll"],
+            "pitch": data["pitch"],
+            "yaw": data["yaw"],
+            "offs": list(self.offs),
+            "wheels_vel": self.wheels_vel,
+            "wheels_off": self.wheels_off,
+            "torques": torques,
+            "loop_hz": 1.0 / self._loop_dt,
+        }
+
     # ---------- 主循环 ----------
+    def control_step(self, dt, max_vel=1.0):
+        """
+        执行一个控制周期：应用合并后的指令、读取 IMU、更新偏置、下发腿部与轮速指令并发布遥测。
+        run_balance_loop 按实时节拍调用；仿真（simulator.py）按仿真时间直接调用。
+        :return: 本周期的 IMU 数据
+        """
+        # 周期边界：整体应用合并后的最新轮速指令
+        cmd = self.commands.poll()
+        if cmd is not None:
+            self.wheels_vel = cmd["vel"]
+            self.wheels_off = cmd["off"]
+            if "legs" in cmd:
+                self.leg_base = list(cmd["legs"])
+
+        data = self.imu.getData()
+        self.offs = self._update_offsets(data)
+
+        if getattr(self.legs, "mc", None):
+            vel = min(12, max_vel)
+            # print(self.offs,data["roll"],data["pitch"])
+            # 腿部位置与轮速在同一周期下发，多总线时并行发送
+            self.legs.control_tick(
+                (self.leg_base[0] - self.offs[0],
+                 self.leg_base[1] - self.offs[1],
+                 self.leg_base[2] - self.offs[2],
+                 self.leg_base[3] - self.offs[3]),
+                vel,
+                self.wheels_vel, self.wheels_off,
+            )
+            # 每周期调试输出走 DEBUG 级别，默认 INFO 级别下只有一次级别判断的开销
+            logger.debug("偏置 %s roll=%.2f pitch=%.2f 轮速=%.2f 转向=%.2f",
+                         self.offs, data["roll"], data["pitch"], self.wheels_vel, self.wheels_off)
+        else:
+            logger.debug("偏置计算结果 %s", self.offs)
+        self._publish_telemetry(data, dt)
+        return data
+
     def run_balance_loop(self, max_vel=1.0):
         self._running = True
         self.offs = [0.0, 0.0, 0.0, 0.0]
@@ -110,31 +221,12 @@ class BalanceController:
                     dt = 1e-6
                 prev_time = cur_time
 
-                data = self.imu.getData()
-                self.offs = self._update_offsets(data)
-
-                if getattr(self.legs, "mc", None):
-                    vel = min(12, max_vel)
-                    # print(self.offs,data["roll"],data["pitch"])
-                    self.control_legs_pos(
-                        0.85 - self.offs[0],
-                        0.85 - self.offs[1],
-                        0.85 - self.offs[2],
-                        0.85 - self.offs[3],
-                        vel=vel,
-                    )
-                    
-                    self.legs.control_wheels_vel(self.wheels_vel,self.wheels_off)
-                    print(self.offs[0],self.offs[1],self.offs[2],self.offs[3])
-                    print(data["roll"],data["pitch"])
-                    print(self.wheels_vel,self.wheels_off)
-                else:
-                    print("调试: 偏置计算结果", self.offs)
+                self.control_step(dt, max_vel)
 
                 #print(f"euler: (roll={data['roll']:.2f}, pitch={data['pitch']:.2f}, yaw={data['yaw']:.2f})")
                 time.sleep(0.001)
             except Exception as e:
-                print(f"平衡循环内部异常, 退出循环: {e}")
+                logger.error(f"平衡循环内部异常, 退出循环: {e}")
                 break
 
     # ---------- 收尾 ----------
@@ -148,12 +240,27 @@ class BalanceController:
             try:
                 self.legs.close_serial()
             except Exception as e:
-                print(f"关闭串口时出现异常: {e}")
+                logger.error(f"关闭串口时出现异常: {e}")
         # 若 imu_py 提供 stop 方法，可取消注释以下行
         # self.imu.stop()
     def set_wheels_vel(self,vel,off):
-        self.wheels_vel=vel
-        self.wheels_off=off
+        """提交轮速指令（速度 + 转向），由控制循环在下一个周期边界一起应用。"""
+        self.commands.submit(vel=vel, off=off)
+
+    def set_leg_heights(self, heights):
+        """提交四条腿的基准高度，由控制循环在下一个周期边界应用。"""
+        self.commands.submit(legs=tuple(heights))
+
+    def stop_loop(self):
+        """请求平衡循环在当前周期结束后退出（不失能电机、不关闭串口）。"""
+        self._running = False
+
+    def emergency_stop(self):
+        """急停：轮速清零、退出平衡循环并立即失能所有电机。"""
+        self.stop_loop()
+        self.commands.submit_now(vel=0.0, off=0.0)
+        self.disable_all()
+        logger.warning("急停：已失能所有电机")
 
 def quick_test():
     """用于开发调试的快捷入口，手动调用时执行完整流程。"""
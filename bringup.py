@@ -0,0 +1,167 @@
+import logging
+import select
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+logger = logging.getLogger("bringup")
+
+LEGS_TIMEOUT = 3.0   # U2CAN 适配器打开 + 电机探测的总超时（秒）
+IMU_TIMEOUT = 3.0    # IMU 配置 + 等待第一个有效样本的总超时（秒）
+
+
+class DeviceStatus:
+    """单个设备的就绪状态。"""
+
+    def __init__(self, name):
+        self.name = name
+        self.ok = False
+        self.elapsed = 0.0
+        self.detail = ""
+        self.device = None
+        self.timed_out = False
+
+    def as_dict(self):
+        return {"name": self.name, "ok": self.ok,
+                "elapsed": round(self.elapsed, 3), "detail": self.detail}
+
+
+class ReadinessReport:
+    """启动就绪报告：各设备状态与总耗时。"""
+
+    def __init__(self, devices, elapsed):
+        self.devices = {d.name: d for d in devices}
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return all(d.ok for d in self.devices.values())
+
+    def as_dict(self):
+        return {"ok": self.ok, "elapsed": round(self.elapsed, 3),
+                "devices": [d.as_dict() for d in self.devices.values()]}
+
+    def __str__(self):
+        lines = [f"设备就绪报告（总耗时 {self.elapsed:.2f}s）:"]
+        for d in self.devices.values():
+            flag = "OK  " if d.ok else "FAIL"
+            lines.append(f"  [{flag}] {d.name:<6s} {d.elapsed:6.2f}s  {d.detail}")
+        return "\n".join(lines)
+
+
+# -------------------------------------------------
+# 各设备的打开 + 探测
+# -------------------------------------------------
+def _probe_legs(port, buses, motor_bus, capture, param_cache, timeout):
+    from Legs_controller import LegsController
+    legs = LegsController(port=port, buses=buses, motor_bus=motor_bus, capture=capture,
+                          param_cache=param_cache)
+    try:
+        missing = legs.probe(timeout=min(0.2, timeout))
+    except Exception:
+        # 探测异常时设备不会返回给调用方，在此关闭串口并停止总线工作线程
+        legs.close_serial()
+        raise
+    if missing:
+        ids = ", ".join(f"0x{i:02X}" for i in missing)
+        return legs, False, f"电机未响应: {ids}"
+    if param_cache is None:
+        return legs, True, "全部电机已响应"
+    params = list(legs.load_motor_params().values())
+    return legs, True, (f"全部电机已响应，参数: 缓存 {params.count('cached')} / "
+                        f"读取 {params.count('read')} / 失败 {len(params) - params.count('cached') - params.count('read')}")
+
+
+def _wait_first_sample(imu, timeout):
+    """等待 IMU 第一个有效样本：优先使用通知描述符，旧版扩展退化为轮询。"""
+    deadline = time.monotonic() + timeout
+    if hasattr(imu, "getNotifyFd") and imu.getNotifyFd() >= 0:
+        while imu.getSampleCount() == 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            select.select([imu.getNotifyFd()], [], [], remaining)
+        return True
+    while time.monotonic() < deadline:
+        if any(v != 0.0 for v in imu.getData().values()):
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def _probe_imu(port, baud, timeout):
+    from dm_imu import imu_py
+    start = time.monotonic()
+    imu = imu_py.DmImu(port, baud)
+    imu.start()
+    if not _wait_first_sample(imu, max(0.0, timeout - (time.monotonic() - start))):
+        return imu, False, "未收到有效样本"
+    return imu, True, "已收到有效样本"
+
+
+def _run_probe(status, fn, *args):
+    start = time.monotonic()
+    try:
+        status.device, status.ok, status.detail = fn(*args)
+    except Exception as e:
+        status.ok = False
+        status.detail = f"打开失败: {e}"
+    status.elapsed = time.monotonic() - start
+    return status
+
+
+def _release_late(status):
+    """超时后才完成打开的设备：调用方已放弃它，关闭串口 / 停止读取线程，避免占用端口。"""
+    device = status.device
+    if device is None:
+        return
+    try:
+        if hasattr(device, "close_serial"):
+            device.close_serial()
+        elif hasattr(device, "stop"):
+            device.stop()
+        logger.info(f"{status.name} 超时后完成打开，已释放")
+    except Exception as e:
+        logger.error(f"释放超时设备 {status.name} 失败: {e}")
+
+
+# -------------------------------------------------
+# 并行启动
+# -------------------------------------------------
+def bring_up(imu_port="/dev/dm-imu", imu_baud=921600, leg_port="/dev/dm-u2can",
+             leg_buses=None, motor_bus=None, capture=None, param_cache=None,
+             legs_timeout=LEGS_TIMEOUT, imu_timeout=IMU_TIMEOUT):
+    """
+    并行打开并探测 U2CAN 适配器（向每个电机查询一次状态）与 IMU（等待第一个有效样本），
+    总耗时取决于最慢的设备而不是各设备之和。给出 param_cache（缓存文件路径）时，
+    探测通过后经参数缓存加载电机参数（指纹未变时不做完整读取）。
+    :return: (legs, imu, ReadinessReport)；打开失败或超时的设备返回 None，
+             已打开但探测未通过的设备照常返回，由报告中的 ok 标记区分
+    """
+    start = time.monotonic()
+    legs_status = DeviceStatus("legs")
+    imu_status = DeviceStatus("imu")
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bringup")
+    futures = [
+        (legs_status, legs_timeout,
+         pool.submit(_run_probe, legs_status, _probe_legs, leg_port, leg_buses, motor_bus, capture, param_cache, legs_timeout)),
+        (imu_status, imu_timeout,
+         pool.submit(_run_probe, imu_status, _probe_imu, imu_port, imu_baud, imu_timeout)),
+    ]
+    for status, timeout, future in futures:
+        remaining = max(0.0, start + timeout - time.monotonic())
+        try:
+            future.result(timeout=remaining)
+        except FutureTimeout:
+            # 驱动的打开过程无法中断，超时的设备直接判为不可用，后台线程自行结束；
+            # 之后才打开成功的设备由完成回调释放（已完成时回调立即执行）
+            status.ok = False
+            status.timed_out = True
+            status.detail = f"超时（>{timeout:.1f}s）"
+            status.elapsed = time.monotonic() - start
+            future.add_done_callback(lambda _f, status=status: _release_late(status))
+    pool.shutdown(wait=False)
+
+    report = ReadinessReport([legs_status, imu_status], time.monotonic() - start)
+    legs = None if legs_status.timed_out else legs_status.device
+    imu = None if imu_status.timed_out else imu_status.device
+    return legs, imu, report
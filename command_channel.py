@@ -0,0 +1,70 @@
+import threading
+import time
+
+
+class CommandChannel:
+    """
+    UI → 控制循环的“最新值”指令通道。
+
+    UI 线程随时 ``submit()``，只覆盖待处理的字段、不做 I/O；控制循环在每个周期边界
+    调用 ``poll()``，按最大更新频率一次性取走合并后的完整指令并整体应用，
+    因此连续拖动滑块产生的大量事件会被合并为少量更新，也不会出现只更新了一半字段的情况。
+    指令停止变化超过 ``settle_s`` 后调用一次 ``on_settled``（用于只记录最终值）。
+    """
+
+    def __init__(self, initial=None, max_rate_hz=50.0, settle_s=0.3, on_settled=None):
+        """
+        :param initial: 初始指令字典
+        :param max_rate_hz: 控制循环应用指令的最大频率
+        :param settle_s: 认为指令已“稳定”所需的静默时间（秒）
+        :param on_settled: 指令稳定后的回调，参数为当前完整指令字典
+        """
+        self._lock = threading.Lock()
+        self._applied = dict(initial or {})
+        self._pending = {}
+        self._min_interval = 1.0 / max_rate_hz if max_rate_hz > 0 else 0.0
+        self._last_apply = float("-inf")
+        self._last_submit = float("-inf")
+        self._unreported = False
+        self.settle_s = settle_s
+        self.on_settled = on_settled
+
+    def submit(self, **values):
+        """提交新指令（只记录最新值，立即返回）。"""
+        with self._lock:
+            self._pending.update(values)
+            self._last_submit = time.monotonic()
+
+    def submit_now(self, **values):
+        """提交新指令并跳过频率限制，下一个周期边界立即应用（用于遥操作、急停等低延迟指令）。"""
+        with self._lock:
+            self._pending.update(values)
+            self._last_submit = time.monotonic()
+            self._last_apply = float("-inf")
+
+    def poll(self, now=None):
+        """
+        在控制循环周期边界调用。
+        有待处理指令且距上次应用已超过最小间隔时，返回合并后的完整指令字典；否则返回 None。
+        """
+        if now is None:
+            now = time.monotonic()
+        settled = None
+        with self._lock:
+            if self._pending and now - self._last_apply >= self._min_interval:
+                self._applied.update(self._pending)
+                self._pending = {}
+                self._last_apply = now
+                self._unreported = True
+                return dict(self._applied)
+            if self._unreported and not self._pending and now - self._last_submit >= self.settle_s:
+                self._unreported = False
+                settled = dict(self._applied)
+        if settled is not None and self.on_settled is not None:
+            self.on_settled(settled)
+        return None
+
+    def latest(self):
+        """返回最近一次已应用的完整指令。"""
+        with self._lock:
+            return dict(self._applied)
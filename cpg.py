@@ -0,0 +1,213 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+# -------------------------------------------------
+# 中枢模式发生器（CPG）：四条腿的耦合相位振荡器网络
+#
+#   dφ_i/dt = ω·s + K · Σ_j sin(φ_j − φ_i − Δ_ij)
+#   h_i     = base_height + A · sin(φ_i)
+#
+# Δ_ij 为对角步态（FL/RR 同相，FR/RL 反相）的期望相位差，耦合项把各腿拉回该相位关系。
+# IMU 角速度超出 stable_range 的部分记为 deviation，用于同时降低频率（s）与幅值（A），
+# 幅值经一阶滤波平滑变化。
+#
+# 由于 Δ_ij = g_j − g_i（g 为各腿的步态相位），令 ψ_i = φ_i − g_i，耦合项可化为
+#   Σ_j sin(ψ_j − ψ_i) = cos ψ_i · Σ_j sin ψ_j − sin ψ_i · Σ_j cos ψ_j
+# 即每步只需各腿一次 sin / cos 与两个求和（O(n)），不必计算 n² 个相位差；
+# 输出 sin φ_i = sin ψ_i · cos g_i + cos ψ_i · sin g_i 使用预先计算的步态相位表。
+# CPGController 按此方式整组更新；ReferenceCPG 按原公式逐对计算，供对比与基准测试（python cpg.py）。
+# 四条腿的规模下 NumPy 每次运算的调用开销（约 1 us）大于运算本身，因此逐腿更新使用列表推导。
+# -------------------------------------------------
+
+LEGS = ("FL", "FR", "RL", "RR")
+# 对角步态的相位（弧度）；t = base_period / 4 时 FL / RR 位于最高点
+GAIT_PHASES = (0.0, math.pi, math.pi, 0.0)
+_TWO_PI = 2.0 * math.pi
+
+
+class _CPGBase:
+    """两种实现共用的参数与调制逻辑（IMU 偏差 → 频率 / 幅值）。"""
+
+    def __init__(self, base_height=0.0, base_period=1.0, amplitude=1.0, stable_range=5.0,
+                 coupling=4.0, amp_tau=None):
+        """
+        :param base_height: 输出高度的中心值
+        :param base_period: 无扰动时的步态周期（秒）
+        :param amplitude: 无扰动时的输出幅值
+        :param stable_range: 视为稳定的 IMU 角速度范围（度/秒），超出部分产生 deviation
+        :param coupling: 振荡器间的耦合强度 K（1/秒）
+        :param amp_tau: 幅值调制的平滑时间常数（秒），默认 base_period / 4
+        """
+        self.base_height = base_height
+        self.base_period = base_period
+        self.amplitude = amplitude
+        self.stable_range = stable_range
+        self.coupling = coupling
+        self.amp_tau = amp_tau if amp_tau is not None else base_period / 4
+        self.deviation = 0.0
+        self._amp = amplitude
+        self._t = 0.0
+
+    @property
+    def t(self):
+        """CPG 时间（秒）；赋值时各腿相位重置为该时刻的标准步态相位。"""
+        return self._t
+
+    @t.setter
+    def t(self, value):
+        self._t = value
+        self._reset_phases(_TWO_PI * value / self.base_period)
+
+    def _modulate(self, pitch_rate, yaw_rate, dt):
+        """更新 deviation 与平滑后的幅值，返回本步的频率系数。"""
+        excess = math.hypot(pitch_rate, yaw_rate) - self.stable_range
+        self.deviation = max(0.0, excess) / self.stable_range if self.stable_range > 0 else 0.0
+        scale = 1.0 / (1.0 + self.deviation)
+        alpha = min(1.0, dt / self.amp_tau) if self.amp_tau > 0 else 1.0
+        self._amp += alpha * (self.amplitude * scale - self._amp)
+        return scale
+
+
+class CPGController(_CPGBase):
+    """四腿耦合振荡器（接口见 u2can/motor_interface.py 的 run）。"""
+
+    def __init__(self, *args, gait=GAIT_PHASES, **kwargs):
+        """:param gait: 各腿的步态相位（弧度），顺序同 LEGS"""
+        self._gait = tuple(gait)
+        # 步态相位表：输出时把 ψ 换回 φ
+        self._gait_cos = tuple(math.cos(g) for g in self._gait)
+        self._gait_sin = tuple(math.sin(g) for g in self._gait)
+        super().__init__(*args, **kwargs)
+        self.t = 0.0
+
+    def _reset_phases(self, rad):
+        # 标准步态下各腿的 ψ 相同
+        self._psi = [rad % _TWO_PI] * len(self._gait)
+        self._update_heights()
+
+    def _update_heights(self):
+        sin, cos = math.sin, math.cos
+        amp, base = self._amp, self.base_height
+        self._heights = [base + amp * (sin(p) * gc + cos(p) * gs)
+                         for p, gc, gs in zip(self._psi, self._gait_cos, self._gait_sin)]
+
+    def step(self, pitch_rate, yaw_rate, dt):
+        """
+        推进 dt 秒。
+        :param pitch_rate, yaw_rate: IMU 角速度（度/秒）
+        :return: deviation（超出 stable_range 的相对偏差，0 表示稳定）
+        """
+        scale = self._modulate(pitch_rate, yaw_rate, dt)
+        sin, cos = math.sin, math.cos
+        psi = self._psi
+        s = [sin(p) for p in psi]
+        c = [cos(p) for p in psi]
+        S, C = sum(s), sum(c)
+        omega = _TWO_PI / self.base_period * scale
+        k = self.coupling
+        self._psi = [(p + (omega + k * (ci * S - si * C)) * dt) % _TWO_PI
+                     for p, si, ci in zip(psi, s, c)]
+        self._t += dt
+        self._update_heights()
+        return self.deviation
+
+    def get_leg_heights(self):
+        """返回 {'FL', 'FR', 'RL', 'RR'} 四条腿的目标高度。"""
+        h = self._heights
+        return {"FL": h[0], "FR": h[1], "RL": h[2], "RR": h[3]}
+
+    def get_phases(self):
+        """返回四条腿的相位 φ（弧度，[0, 2π)）。"""
+        return np.array([(p + g) % _TWO_PI for p, g in zip(self._psi, self._gait)])
+
+    def set_phases(self, phases):
+        """直接设置四条腿的相位 φ（弧度）。"""
+        self._psi = [(p - g) % _TWO_PI for p, g in zip(phases, self._gait)]
+        self._update_heights()
+
+
+class ReferenceCPG(_CPGBase):
+    """逐腿浮点计算的参考实现（与 CPGController 数学上等价）。"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.t = 0.0
+
+    def _reset_phases(self, rad):
+        self._phase = [rad + g for g in GAIT_PHASES]
+        self._heights = [self.base_height + self._amp * math.sin(p) for p in self._phase]
+
+    def step(self, pitch_rate, yaw_rate, dt):
+        scale = self._modulate(pitch_rate, yaw_rate, dt)
+        omega = _TWO_PI / self.base_period * scale
+        ph = self._phase
+        new = []
+        for i in range(len(LEGS)):
+            c = sum(math.sin(ph[j] - ph[i] - (GAIT_PHASES[j] - GAIT_PHASES[i])) for j in range(len(LEGS)))
+            new.append((ph[i] + (omega + self.coupling * c) * dt) % (_TWO_PI))
+        self._phase = new
+        self._t += dt
+        self._heights = [self.base_height + self._amp * math.sin(p) for p in new]
+        return self.deviation
+
+    def get_leg_heights(self):
+        return dict(zip(LEGS, self._heights))
+
+    def get_phases(self):
+        return np.array(self._phase) % _TWO_PI
+
+    def set_phases(self, phases):
+        self._phase = list(phases)
+        self._heights = [self.base_height + self._amp * math.sin(p) for p in self._phase]
+
+
+def benchmark(seconds=10.0, dt=0.001, seed=0, perturb=0.0):
+    """
+    两种实现以相同输入推进 seconds 秒，返回每步耗时（微秒）与输出的最大差异。
+    :param perturb: 初始相位扰动（弧度），用于检验耦合项把步态拉回标准相位关系
+    """
+    steps = int(round(seconds / dt))
+    rng = np.random.default_rng(seed)
+    rates = rng.normal(0.0, 6.0, (steps, 2)).tolist()
+    kwargs = dict(base_height=0.0, base_period=2.0, amplitude=0.85, stable_range=6.0)
+    fast, ref = CPGController(**kwargs), ReferenceCPG(**kwargs)
+    for c in (fast, ref):
+        c.t = c.base_period / 4
+    if perturb:
+        noise = rng.uniform(-perturb, perturb, len(LEGS))
+        fast.set_phases(fast.get_phases() + noise)
+        ref.set_phases(ref.get_phases() + noise)
+
+    result = {"steps": steps}
+    for name, c in (("fast", fast), ("reference", ref)):
+        start = time.perf_counter()
+        for p, y in rates:
+            c.step(p, y, dt)
+            c.get_leg_heights()
+        result[name + "_us"] = (time.perf_counter() - start) / steps * 1e6
+    hf, hr = fast.get_leg_heights(), ref.get_leg_heights()
+    result["max_height_diff"] = max(abs(hf[k] - hr[k]) for k in LEGS)
+    dphi = np.angle(np.exp(1j * (fast.get_phases() - ref.get_phases())))
+    result["max_phase_diff"] = float(np.abs(dphi).max())
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CPG 实现与参考实现的对比基准")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--dt", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--perturb", type=float, default=0.5, help="初始相位扰动（弧度）")
+    args = parser.parse_args(argv)
+    r = benchmark(args.seconds, args.dt, args.seed, args.perturb)
+    print(f"{r['steps']} 步（{1.0 / args.dt:.0f} Hz）")
+    print(f"  整组实现:   {r['fast_us']:.1f} us/步（占 {r['fast_us'] * 1e-6 / args.dt:.1%} 周期）")
+    print(f"  参考实现:   {r['reference_us']:.1f} us/步")
+    print(f"  最大高度差 {r['max_height_diff']:.2e}，最大相位差 {r['max_phase_diff']:.2e} rad")
+
+
+if __name__ == "__main__":
+    main()
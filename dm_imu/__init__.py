@@ -2,19 +2,56 @@ import pathlib
 import importlib.util
 import sys
 
+# 记录上次成功加载的扩展路径，下次启动时跳过 glob 搜索
+_CACHE_FILE = pathlib.Path(__file__).parent / ".imu_py_path"
+
+_imu_mod = None
+
+
+def _load_from_path(p):
+    spec = importlib.util.spec_from_file_location("imu_py", p)
+    imu_py = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(imu_py)  # type: ignore
+    return imu_py
+
+
+def _read_cached_path():
+    try:
+        p = pathlib.Path(_CACHE_FILE.read_text(encoding="utf-8").strip())
+    except OSError:
+        return None
+    return p if p.is_file() else None
+
+
+def _write_cached_path(p):
+    try:
+        _CACHE_FILE.write_text(str(p), encoding="utf-8")
+    except OSError:
+        # 只读安装目录下无法缓存，不影响加载
+        pass
+
+
 def _load_imu_module():
     """
     Load the compiled pybind11 module ``imu_py``.
     The shared object should be placed in the ``build`` directory next to this ``__init__.py``.
     """
     # 1. Try to import if the .so is already in the package directory.
+    # (import_module avoids re-entering the module-level __getattr__ below)
     try:
-        from . import imu_py  # type: ignore  # pylint: disable=import-error
-        return imu_py
+        return importlib.import_module(__name__ + ".imu_py")
     except Exception:
         pass
 
-    # 2. Fallback: locate the build output relative to the package root.
+    # 2. Use the location cached by a previous successful load.
+    cached = _read_cached_path()
+    if cached is not None:
+        try:
+            return _load_from_path(cached)
+        except Exception:
+            pass
+
+    # 3. Fallback: locate the build output relative to the package root.
     possible_paths = [
         pathlib.Path(__file__).parent / "build" / "imu_py.cpython-310-darwin.so",
         pathlib.Path(__file__).parent / "build" / "imu_py.cpython-312-darwin.so",
@@ -31,9 +68,8 @@ def _load_imu_module():
             else:
                 continue
         if p.is_file():
-            spec = importlib.util.spec_from_file_location("imu_py", p)
-            imu_py = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(imu_py)  # type: ignore
+            imu_py = _load_from_path(p)
+            _write_cached_path(p.resolve())
             return imu_py
 
     raise ImportError(
@@ -42,6 +78,16 @@ def _load_imu_module():
         "or run the build step before importing."
     )
 
-# Expose the DmImu class at package level for convenience
-_imu_mod = _load_imu_module()
-DmImu = _imu_mod.DmImu
+
+def __getattr__(name):
+    """
+    延迟加载扩展：``import dm_imu`` 本身不再触发 .so 加载，
+    第一次访问 ``dm_imu.DmImu`` / ``dm_imu.imu_py`` 时才加载并缓存。
+    """
+    global _imu_mod
+    if name in ("DmImu", "imu_py"):
+        if _imu_mod is None:
+            _imu_mod = _load_imu_module()
+            sys.modules.setdefault(__name__ + ".imu_py", _imu_mod)
+        return _imu_mod if name == "imu_py" else _imu_mod.DmImu
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,95 @@
+"""
+asyncio 适配：基于 ``DmImu.getNotifyFd()`` 的新样本通知，在事件循环中
+以 ``loop.add_reader`` 等待 IMU 数据，无需额外的轮询线程。
+
+用法::
+
+    from dm_imu import DmImu
+    from dm_imu.aio import ImuSampleStream
+
+    imu = DmImu("/dev/dm-imu", 921600)
+    imu.start()
+    async with ImuSampleStream(imu) as stream:
+        async for sample in stream:
+            print(sample["seq"], sample["pitch"])
+"""
+
+import asyncio
+import os
+
+
+class ImuSampleStream:
+    """
+    IMU 样本的异步迭代器。
+
+    每当驱动线程收到新帧，通知描述符变为可读；回调中读空描述符并取最新样本。
+    消费者处理较慢时只保留最新样本（``seq`` 可用于判断跳过了多少帧）。
+    """
+
+    def __init__(self, imu, loop=None):
+        self._imu = imu
+        self._fd = imu.getNotifyFd()
+        if self._fd < 0:
+            raise RuntimeError("DmImu 未提供可用的通知描述符")
+        self._loop = loop
+        self._latest = None
+        self._waiter = None
+        self._closed = False
+        self._registered = False
+
+    # ---------- 注册 / 注销 ----------
+    def _ensure_reader(self):
+        if self._registered:
+            return
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._fd, self._on_readable)
+        self._registered = True
+
+    def close(self):
+        """停止监听通知描述符，并结束正在等待的迭代。"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._registered:
+            self._loop.remove_reader(self._fd)
+            self._registered = False
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_exception(StopAsyncIteration())
+
+    # ---------- 回调 ----------
+    def _on_readable(self):
+        # eventfd 一次读出累计计数；pipe 则读空缓冲区
+        try:
+            os.read(self._fd, 4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        sample = self._imu.getData()
+        sample["seq"] = self._imu.getSampleCount()
+        self._latest = sample
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    # ---------- 异步迭代协议 ----------
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._closed:
+            raise StopAsyncIteration
+        self._ensure_reader()
+        if self._latest is None:
+            self._waiter = self._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        sample, self._latest = self._latest, None
+        return sample
+
+    async def __aenter__(self):
+        self._ensure_reader()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
@@ -32,5 +32,9 @@ PYBIND11_MODULE(imu_py, m) {
         .def("getData",
              [](const DmImu &self) {
                  return imu_data_to_dict(self.getData());
-             });
+             })
+        .def("getNotifyFd", &DmImu::getNotifyFd,
+             "File descriptor that becomes readable when a new sample arrives")
+        .def("fileno", &DmImu::getNotifyFd)
+        .def("getSampleCount", &DmImu::getSampleCount);
 }
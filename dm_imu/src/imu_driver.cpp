@@ -4,6 +4,10 @@
 #include <fcntl.h>
 #include <unistd.h>
 #include <termios.h>
+#include <stdexcept>
+#ifdef __linux__
+#include <sys/eventfd.h>
+#endif
 
 #ifndef B460800
 #define B460800 460800
@@ -18,43 +22,69 @@ namespace dmbot_serial
 DmImu::DmImu(const std::string& port, int baud)
     : imu_serial_port(port), imu_seial_baud(baud), stop_thread_(false)
 {
-    // 初始化串口并完成 IMU 配置
+    // 初始化串口并完成 IMU 配置（失败时抛出异常）
     init_imu_serial();
 
-    // 进入配置模式并初始化 IMU
-    enter_setting_mode();
-    std::this_thread::sleep_for(std::chrono::milliseconds(10));
+    // 此后任一步骤抛出异常时析构函数不会执行，需在此关闭已打开的描述符再重新抛出
+    try
+    {
+        // 新样本通知描述符（供 asyncio 等事件循环监听）
+        init_notify();
+
+        // 进入配置模式并初始化 IMU
+        enter_setting_mode();
+        std::this_thread::sleep_for(std::chrono::milliseconds(10));
 
-    turn_on_accel();
-    std::this_thread::sleep_for(std::chrono::milliseconds(10));
+        turn_on_accel();
+        std::this_thread::sleep_for(std::chrono::milliseconds(10));
 
-    turn_on_gyro();
-    std::this_thread::sleep_for(std::chrono::milliseconds(10));
+        turn_on_gyro();
+        std::this_thread::sleep_for(std::chrono::milliseconds(10));
 
-    turn_on_euler();
-    std::this_thread::sleep_for(std::chrono::milliseconds(10));
+        turn_on_euler();
+        std::this_thread::sleep_for(std::chrono::milliseconds(10));
 
-    turn_off_quat();
-    std::this_thread::sleep_for(std::chrono::milliseconds(10));
+        turn_off_quat();
+        std::this_thread::sleep_for(std::chrono::milliseconds(10));
 
-    set_output_1000HZ();
-    std::this_thread::sleep_for(std::chrono::milliseconds(10));
+        set_output_1000HZ();
+        std::this_thread::sleep_for(std::chrono::milliseconds(10));
 
-    save_imu_para();
-    std::this_thread::sleep_for(std::chrono::milliseconds(10));
+        save_imu_para();
+        std::this_thread::sleep_for(std::chrono::milliseconds(10));
 
-    exit_setting_mode();
-    std::this_thread::sleep_for(std::chrono::milliseconds(100));
+        exit_setting_mode();
+        std::this_thread::sleep_for(std::chrono::milliseconds(100));
+    }
+    catch (...)
+    {
+        close_fds();
+        throw;
+    }
 }
 
 DmImu::~DmImu()
 {
     stop();
+    close_fds();
+}
+
+void DmImu::close_fds()
+{
     if (serial_fd >= 0)
     {
         close(serial_fd);
         serial_fd = -1;
     }
+    if (notify_write_fd >= 0 && notify_write_fd != notify_read_fd)
+    {
+        close(notify_write_fd);
+    }
+    if (notify_read_fd >= 0)
+    {
+        close(notify_read_fd);
+    }
+    notify_read_fd = notify_write_fd = -1;
 }
 
 // -------------------------------
@@ -99,6 +129,16 @@ IMU_Data DmImu::getData() const
     return data;
 }
 
+int DmImu::getNotifyFd() const
+{
+    return notify_read_fd;
+}
+
+uint64_t DmImu::getSampleCount() const
+{
+    return sample_count.load(std::memory_order_relaxed);
+}
+
 // -------------------------------
 // Private implementation
 // -------------------------------
@@ -108,16 +148,17 @@ void DmImu::init_imu_serial()
     serial_fd = open(imu_serial_port.c_str(), O_RDWR | O_NOCTTY | O_SYNC);
     if (serial_fd < 0)
     {
-        std::cerr << "Failed to open IMU serial port: " << imu_serial_port << std::endl;
-        std::exit(EXIT_FAILURE);
+        // 抛出异常而非退出进程，Python 侧得到 RuntimeError 可自行降级/重试
+        throw std::runtime_error("Failed to open IMU serial port: " + imu_serial_port);
     }
 
     // 配置波特率和串口属性
     struct termios tty;
     if (tcgetattr(serial_fd, &tty) != 0)
     {
-        std::cerr << "Error from tcgetattr" << std::endl;
-        std::exit(EXIT_FAILURE);
+        close(serial_fd);
+        serial_fd = -1;
+        throw std::runtime_error("Error from tcgetattr");
     }
 
     // 设置波特率
@@ -129,8 +170,9 @@ void DmImu::init_imu_serial()
         case 460800: speed = B460800; break;
         case 921600: speed = B921600; break;
         default:
-            std::cerr << "Unsupported baud rate: " << imu_seial_baud << std::endl;
-            std::exit(EXIT_FAILURE);
+            close(serial_fd);
+            serial_fd = -1;
+            throw std::runtime_error("Unsupported baud rate: " + std::to_string(imu_seial_baud));
     }
     cfsetospeed(&tty, speed);
     cfsetispeed(&tty, speed);
@@ -150,13 +192,58 @@ void DmImu::init_imu_serial()
 
     if (tcsetattr(serial_fd, TCSANOW, &tty) != 0)
     {
-        std::cerr << "Error from tcsetattr" << std::endl;
-        std::exit(EXIT_FAILURE);
+        close(serial_fd);
+        serial_fd = -1;
+        throw std::runtime_error("Error from tcsetattr");
     }
 
     std::cout << "IMU serial port opened successfully." << std::endl;
 }
 
+// -------------------------------
+// 新样本通知：Linux 使用 eventfd，其余平台退化为非阻塞 pipe
+// -------------------------------
+void DmImu::init_notify()
+{
+#ifdef __linux__
+    notify_read_fd = eventfd(0, EFD_NONBLOCK | EFD_CLOEXEC);
+    notify_write_fd = notify_read_fd;
+#else
+    int fds[2];
+    if (pipe(fds) == 0)
+    {
+        for (int fd : fds)
+        {
+            fcntl(fd, F_SETFL, fcntl(fd, F_GETFL) | O_NONBLOCK);
+            fcntl(fd, F_SETFD, FD_CLOEXEC);
+        }
+        notify_read_fd = fds[0];
+        notify_write_fd = fds[1];
+    }
+#endif
+    if (notify_read_fd < 0)
+    {
+        std::cerr << "Failed to create IMU notify fd, async notification disabled." << std::endl;
+    }
+}
+
+void DmImu::signal_notify()
+{
+    sample_count.fetch_add(1, std::memory_order_relaxed);
+    if (notify_write_fd < 0)
+    {
+        return;
+    }
+#ifdef __linux__
+    uint64_t one = 1;
+    (void)!write(notify_write_fd, &one, sizeof(one));
+#else
+    // pipe 已满（读端未及时读取）时写入失败即可，读端可读状态不变
+    uint8_t one = 1;
+    (void)!write(notify_write_fd, &one, sizeof(one));
+#endif
+}
+
 // -------------------------------
 // 配置指令（与原始 ROS 代码保持一致，仅去掉 ros::Duration）
 // -------------------------------
@@ -302,6 +389,8 @@ void DmImu::get_imu_data_thread()
                 std::lock_guard<std::mutex> lock(data_mutex);
                 // data 已在上面更新，无需额外操作
             }
+            // 通知等待新样本的事件循环
+            signal_notify();
         }
         else
         {
@@ -74,6 +74,12 @@ public:
     // Get latest IMU data (thread‑safe copy)
     IMU_Data getData() const;
 
+    // File descriptor that becomes readable whenever a new sample arrives
+    // (eventfd on Linux, pipe read end elsewhere). Read it to clear readiness.
+    int getNotifyFd() const;
+    // Number of valid samples received since construction
+    uint64_t getSampleCount() const;
+
 private:
     void init_imu_serial();
     void get_imu_data_thread();
@@ -88,6 +94,10 @@ private:
     void exit_setting_mode();
     void restart_imu();
 
+    void init_notify();
+    void signal_notify();
+    void close_fds();
+
     int imu_seial_baud;
     std::string imu_serial_port;
     int serial_fd = -1;
@@ -95,6 +105,10 @@ private:
     mutable std::mutex data_mutex;
     bool stop_thread_ = false;
 
+    int notify_read_fd = -1;
+    int notify_write_fd = -1;
+    std::atomic<uint64_t> sample_count{0};
+
     IMU_Receive_Frame receive_data{};
     IMU_Data data{};
 };
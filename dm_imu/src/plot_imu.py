@@ -1,76 +1,190 @@
 #!/usr/bin/env python3
 """
-绘制 dm_imu/test_imu.cpp 生成的 CSV 数据。
+绘制 dm_imu/test_imu.cpp 生成的 CSV / 二进制记录数据。
 
 使用方式：
-    1. 确保已安装 matplotlib（pip install matplotlib）。
-    2. 运行 C++ 程序生成 imu_data.csv。
+    1. 确保已安装 numpy 与 matplotlib（pip install numpy matplotlib）。
+    2. 运行 C++ 程序生成 imu_data.csv（同时生成二进制记录 imu_data.bin）。
     3. 执行本脚本：
            python3 dm_imu/plot_imu.py
+           python3 dm_imu/plot_imu.py run.bin --rate 1000 --start 60 --end 120
     4. 脚本会在同目录下生成 `imu_plot.png` 并显示图形窗口（如果有可视化环境）。
+
+长时间记录（例如 1 kHz 下一小时）会先一次性解析为 NumPy 数组（二进制记录
+直接内存映射），再按时间窗口切片，并在绘图前做保形降采样（min/max 或 LTTB），
+因此绘制数百万点的记录也只需数秒。
 """
 
-import csv
+import argparse
 import os
 import sys
 
-import matplotlib.pyplot as plt
+import numpy as np
+
+# CSV 表头顺序，与 test_imu.cpp 写出的列一致
+COLUMNS = ('index', 'roll', 'pitch', 'yaw',
+           'accx', 'accy', 'accz',
+           'gyrox', 'gyroy', 'gyroz')
+
+# 二进制记录格式：每个样本 40 字节（小端 uint32 索引 + 9 个 float32）
+IMU_RECORD_DTYPE = np.dtype(
+    [('index', '<u4')] + [(name, '<f4') for name in COLUMNS[1:]]
+)
 
+# 默认绘图点数上限（每条曲线），远超屏幕像素宽度即可
+DEFAULT_MAX_POINTS = 4000
+
+
+# -------------------------------------------------
+# 数据读取
+# -------------------------------------------------
 def read_csv(csv_path):
-    """读取 CSV，返回每列的数据列表。"""
+    """一次性将 CSV 解析为 NumPy 数组，返回列名 -> 数组的字典。"""
     if not os.path.isfile(csv_path):
         print(f"错误：未找到 CSV 文件 {csv_path}", file=sys.stderr)
         sys.exit(1)
 
-    indices = []
-    roll = []
-    pitch = []
-    yaw = []
-    accx = []
-    accy = []
-    accz = []
-    gyrox = []
-    gyroy = []
-    gyroz = []
-
     with open(csv_path, newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            indices.append(int(row['index']))
-            roll.append(float(row['roll']))
-            pitch.append(float(row['pitch']))
-            yaw.append(float(row['yaw']))
-            accx.append(float(row['accx']))
-            accy.append(float(row['accy']))
-            accz.append(float(row['accz']))
-            gyrox.append(float(row['gyrox']))
-            gyroy.append(float(row['gyroy']))
-            gyroz.append(float(row['gyroz']))
-
-    return {
-        'index': indices,
-        'roll': roll,
-        'pitch': pitch,
-        'yaw': yaw,
-        'accx': accx,
-        'accy': accy,
-        'accz': accz,
-        'gyrox': gyrox,
-        'gyroy': gyroy,
-        'gyroz': gyroz,
-    }
-
-def plot_data(data, out_path):
-    """绘制三组曲线（姿态、加速度、陀螺仪）并保存为 PNG。"""
+        header = f.readline().strip().split(',')
+        table = np.loadtxt(f, delimiter=',', dtype=np.float64, ndmin=2)
+
+    data = {}
+    for name in COLUMNS:
+        col = table[:, header.index(name)]
+        data[name] = col.astype(np.int64) if name == 'index' else col
+    return data
+
+
+def read_binary(bin_path):
+    """以内存映射方式打开二进制记录，返回列名 -> 数组视图的字典（不拷贝数据）。"""
+    if not os.path.isfile(bin_path):
+        print(f"错误：未找到记录文件 {bin_path}", file=sys.stderr)
+        sys.exit(1)
+
+    records = np.memmap(bin_path, dtype=IMU_RECORD_DTYPE, mode='r')
+    return {name: records[name] for name in COLUMNS}
+
+
+def load_data(path):
+    """根据扩展名选择 CSV 或二进制读取方式。"""
+    if path.endswith('.csv'):
+        return read_csv(path)
+    return read_binary(path)
+
+
+def select_window(data, start=None, end=None):
+    """
+    按样本索引截取 [start, end) 区间。
+    索引列单调递增，使用二分查找定位，切片对内存映射数组不产生拷贝。
+    """
     idx = data['index']
+    lo = 0 if start is None else int(np.searchsorted(idx, start, side='left'))
+    hi = len(idx) if end is None else int(np.searchsorted(idx, end, side='left'))
+    return {name: col[lo:hi] for name, col in data.items()}
+
+
+# -------------------------------------------------
+# 保形降采样
+# -------------------------------------------------
+def decimate_minmax(x, y, max_points):
+    """
+    min/max 降采样：将数据分为 max_points // 2 个桶，每桶保留最小值与最大值
+    （按原始顺序），尖峰不会被抹掉。返回 (x, y)。
+    """
+    n = len(y)
+    if max_points <= 0 or n <= max_points:
+        return np.asarray(x), np.asarray(y)
+
+    n_bins = max(max_points // 2, 1)
+    bin_size = n // n_bins
+    usable = n_bins * bin_size
+    y_main = np.asarray(y[:usable]).reshape(n_bins, bin_size)
+
+    offsets = np.arange(n_bins) * bin_size
+    i_min = offsets + np.argmin(y_main, axis=1)
+    i_max = offsets + np.argmax(y_main, axis=1)
+    picks = np.sort(np.stack([i_min, i_max], axis=1), axis=1).ravel()
+
+    # 尾部不足一个桶的样本直接保留首尾两点
+    if usable < n:
+        picks = np.concatenate([picks, [usable, n - 1]])
+
+    return np.asarray(x)[picks], np.asarray(y)[picks]
+
+
+def decimate_lttb(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets 降采样：每个桶选出与前一个已选点、
+    下一个桶均值构成最大三角形面积的点，视觉上最接近原曲线。返回 (x, y)。
+    """
+    n = len(y)
+    if max_points < 3 or n <= max_points:
+        return np.asarray(x), np.asarray(y)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # 首尾两点固定，中间 max_points - 2 个桶
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    picks = np.empty(max_points, dtype=np.int64)
+    picks[0] = 0
+    picks[-1] = n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            n_lo, n_hi = edges[i + 1], edges[i + 2]
+        else:
+            n_lo, n_hi = n - 1, n
+        avg_x = x[n_lo:n_hi].mean()
+        avg_y = y[n_lo:n_hi].mean()
+
+        bx = x[lo:hi]
+        by = y[lo:hi]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        picks[i + 1] = a
+
+    return x[picks], y[picks]
+
+
+DECIMATORS = {
+    'minmax': decimate_minmax,
+    'lttb': decimate_lttb,
+    'none': lambda x, y, max_points: (np.asarray(x), np.asarray(y)),
+}
+
+
+# -------------------------------------------------
+# 绘图
+# -------------------------------------------------
+def plot_data(data, out_path, rate=None, method='minmax', max_points=DEFAULT_MAX_POINTS, show=True):
+    """绘制三组曲线（姿态、加速度、陀螺仪）并保存为 PNG。"""
+    import matplotlib
+    if not show:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    decimate = DECIMATORS[method]
+    if rate:
+        idx = np.asarray(data['index'], dtype=np.float64) / rate
+        x_label = 'Time (s)'
+    else:
+        idx = data['index']
+        x_label = 'Sample Index'
+
+    def _plot(ax, key, label):
+        x, y = decimate(idx, data[key], max_points)
+        ax.plot(x, y, label=label)
 
     plt.figure(figsize=(12, 9))
 
     # 1. 姿态（Roll, Pitch, Yaw）
     ax1 = plt.subplot(3, 1, 1)
-    ax1.plot(idx, data['roll'], label='Roll')
-    ax1.plot(idx, data['pitch'], label='Pitch')
-    ax1.plot(idx, data['yaw'], label='Yaw')
+    _plot(ax1, 'roll', 'Roll')
+    _plot(ax1, 'pitch', 'Pitch')
+    _plot(ax1, 'yaw', 'Yaw')
     ax1.set_ylabel('Angle (°)')
     ax1.set_title('IMU 姿态')
     ax1.legend()
@@ -78,9 +192,9 @@ def plot_data(data, out_path):
 
     # 2. 加速度（X, Y, Z）
     ax2 = plt.subplot(3, 1, 2)
-    ax2.plot(idx, data['accx'], label='Acc X')
-    ax2.plot(idx, data['accy'], label='Acc Y')
-    ax2.plot(idx, data['accz'], label='Acc Z')
+    _plot(ax2, 'accx', 'Acc X')
+    _plot(ax2, 'accy', 'Acc Y')
+    _plot(ax2, 'accz', 'Acc Z')
     ax2.set_ylabel('Acceleration (g)')
     ax2.set_title('加速度')
     ax2.legend()
@@ -88,10 +202,10 @@ def plot_data(data, out_path):
 
     # 3. 陀螺仪（X, Y, Z）
     ax3 = plt.subplot(3, 1, 3)
-    ax3.plot(idx, data['gyrox'], label='Gyro X')
-    ax3.plot(idx, data['gyroy'], label='Gyro Y')
-    ax3.plot(idx, data['gyroz'], label='Gyro Z')
-    ax3.set_xlabel('Sample Index')
+    _plot(ax3, 'gyrox', 'Gyro X')
+    _plot(ax3, 'gyroy', 'Gyro Y')
+    _plot(ax3, 'gyroz', 'Gyro Z')
+    ax3.set_xlabel(x_label)
     ax3.set_ylabel('Angular Velocity (°/s)')
     ax3.set_title('陀螺仪')
     ax3.legend()
@@ -102,18 +216,45 @@ def plot_data(data, out_path):
     print(f"绘图已保存至 {out_path}")
 
     # 如果当前环境支持图形界面，显示窗口
-    try:
-        plt.show()
-    except Exception:
-        pass
+    if show:
+        try:
+            plt.show()
+        except Exception:
+            pass
 
-def main():
+
+def parse_args(argv=None):
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(script_dir, 'imu_data.csv')
-    out_path = os.path.join(script_dir, 'imu_plot.png')
+    parser = argparse.ArgumentParser(description="绘制 IMU 记录（CSV 或二进制）")
+    parser.add_argument('path', nargs='?', default=os.path.join(script_dir, 'imu_data.csv'),
+                        help="CSV 或 .bin 记录文件路径")
+    parser.add_argument('-o', '--out', default=os.path.join(script_dir, 'imu_plot.png'),
+                        help="输出 PNG 路径")
+    parser.add_argument('--rate', type=float, default=None,
+                        help="采样率 (Hz)；给出时 --start/--end 以秒为单位，横轴显示时间")
+    parser.add_argument('--start', type=float, default=None, help="窗口起点（样本索引或秒）")
+    parser.add_argument('--end', type=float, default=None, help="窗口终点（样本索引或秒）")
+    parser.add_argument('--method', choices=sorted(DECIMATORS), default='minmax',
+                        help="降采样方法")
+    parser.add_argument('--max-points', type=int, default=DEFAULT_MAX_POINTS,
+                        help="每条曲线最多绘制的点数")
+    parser.add_argument('--no-show', action='store_true', help="只保存 PNG，不弹出窗口")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
 
-    data = read_csv(csv_path)
-    plot_data(data, out_path)
+    scale = args.rate if args.rate else 1
+    start = None if args.start is None else args.start * scale
+    end = None if args.end is None else args.end * scale
+
+    data = select_window(load_data(args.path), start, end)
+    if len(data['index']) == 0:
+        print("错误：所选时间窗口内没有数据", file=sys.stderr)
+        sys.exit(1)
+    plot_data(data, args.out, rate=args.rate, method=args.method,
+              max_points=args.max_points, show=not args.no_show)
 
 if __name__ == '__main__':
     main()
@@ -3,6 +3,18 @@
 #include <thread>
 #include <chrono>
 #include <fstream>
+#include <cstdint>
+
+#pragma pack(1)
+// 二进制记录格式（40 字节/样本），与 plot_imu.py 中 IMU_RECORD_DTYPE 保持一致
+struct ImuRecord
+{
+    uint32_t index;
+    float roll, pitch, yaw;
+    float accx, accy, accz;
+    float gyrox, gyroy, gyroz;
+};
+#pragma pack()
 
 int main()
 {
@@ -20,6 +32,9 @@ int main()
     std::ofstream csvFile("dm_imu/imu_data.csv");
     csvFile << "index,roll,pitch,yaw,accx,accy,accz,gyrox,gyroy,gyroz\n";
 
+    // 同时写出二进制记录，便于长时间记录时由 plot_imu.py 内存映射读取
+    std::ofstream binFile("dm_imu/imu_data.bin", std::ios::binary);
+
     // 示例：读取 1000 次数据（约 10 秒，100 Hz）
     for (int i = 0; i < 1000; ++i)
     {
@@ -38,11 +53,17 @@ int main()
                 << data.accx << ',' << data.accy << ',' << data.accz << ','
                 << data.gyrox << ',' << data.gyroy << ',' << data.gyroz << '\n';
 
+        ImuRecord rec{static_cast<uint32_t>(i), data.roll, data.pitch, data.yaw,
+                      data.accx, data.accy, data.accz,
+                      data.gyrox, data.gyroy, data.gyroz};
+        binFile.write(reinterpret_cast<const char*>(&rec), sizeof(rec));
+
         // 10 ms 间隔（约 100 Hz）
         std::this_thread::sleep_for(std::chrono::milliseconds(10));
     }
 
     csvFile.close();
+    binFile.close();
 
     // 停止采集并关闭串口
     imu.stop();
@@ -0,0 +1,73 @@
+import os
+import threading
+from collections import deque
+
+
+class LogTail:
+    """
+    增量读取日志文件（类似 ``tail -f``）：
+    记住上次读取的字节偏移，只读取新增内容，并在内存中保留有限行数的尾部，
+    因此每次刷新的开销与日志总长度无关。检测到文件被截断或轮转
+    （inode 变化 / 文件变小）时从新文件开头重新读取。
+    """
+
+    def __init__(self, path, max_lines=500, backfill_bytes=64 * 1024):
+        """
+        :param path: 日志文件路径
+        :param max_lines: 内存中保留的最大行数
+        :param backfill_bytes: 首次打开时最多回读的字节数（避免读入整个历史日志）
+        """
+        self.path = path
+        self.max_lines = max_lines
+        self.backfill_bytes = backfill_bytes
+        self._lines = deque(maxlen=max_lines)
+        self._offset = 0
+        self._inode = None
+        self._partial = b""
+        self._lock = threading.Lock()
+        self._first = True
+
+    def _reset(self, inode):
+        self._inode = inode
+        self._offset = 0
+        self._partial = b""
+
+    def read_new(self):
+        """读取自上次调用以来新增的完整行，返回新行列表并追加到内存尾部。"""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return []
+
+            if self._inode != st.st_ino or st.st_size < self._offset:
+                # 首次打开、文件轮转或被截断
+                self._reset(st.st_ino)
+                if self._first:
+                    self._offset = max(0, st.st_size - self.backfill_bytes)
+            first, self._first = self._first, False
+
+            if st.st_size == self._offset:
+                return []
+
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read(st.st_size - self._offset)
+            self._offset += len(chunk)
+
+            data = self._partial + chunk
+            parts = data.split(b"\n")
+            self._partial = parts.pop()
+            if first and self._offset > len(chunk):
+                # 回读起点可能落在某行中间，丢弃第一段不完整内容
+                parts = parts[1:]
+
+            new_lines = [p.decode("utf-8", errors="replace").rstrip("\r") for p in parts]
+            self._lines.extend(new_lines)
+            return new_lines
+
+    def text(self):
+        """刷新并返回内存中保留的日志尾部文本。"""
+        self.read_new()
+        with self._lock:
+            return "\n".join(self._lines)
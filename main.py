@@ -1,48 +1,133 @@
-import gradio as gr
-from balance import BalanceController
+import time
+_STARTUP_T0 = time.perf_counter()   # 进程启动计时起点（用于启动耗时报告）
+import argparse
+import atexit
 import logging
 import threading
-import time
-import os
-import requests
+from balance import BalanceController
+from log_tail import LogTail
+from async_log import setup_logging
+# gradio / requests（arm_client）仅在 UI 与 arms 控制中使用，延迟到实际需要时再导入
 # -------------------------------------------------
 # 全局配置 & 日志系统（写入磁盘文件 ui.log）
 # -------------------------------------------------
 LOG_PATH = "ui.log"
-logging.basicConfig(
-    filename=LOG_PATH,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+LOG_MAX_BYTES = 1024 * 1024   # 单个日志文件上限，超过后轮转为 ui.log.1 ...
+LOG_BACKUPS = 3
+# 日志经有界队列交给后台线程批量写盘（同时输出到控制台），调用方不做任何 I/O
+_log_listener = setup_logging(LOG_PATH, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUPS)
+atexit.register(_log_listener.stop)
 logger = logging.getLogger("ui")
 
 def log(msg: str) -> None:
-    """统一写入日志的函数，同时打印到控制台（方便调试）。"""
+    """统一写入日志的函数（入队即返回，文件与控制台输出由后台线程完成）。"""
     logger.info(msg)
-    for h in logger.handlers:
-        h.flush()
-    print(msg)  # optional, 可删除
+
+# -------------------------------------------------
+# 启动耗时报告
+# -------------------------------------------------
+_startup_marks: list = []   # [(阶段名, 距启动的秒数)]
+
+def mark_startup(stage: str) -> None:
+    """记录一个启动阶段完成的时间点。"""
+    _startup_marks.append((stage, time.perf_counter() - _STARTUP_T0))
+
+def startup_report() -> str:
+    """生成启动各阶段耗时报告（累计时间 + 阶段增量）。"""
+    lines = ["启动耗时报告:"]
+    prev = 0.0
+    for stage, t in _startup_marks:
+        lines.append(f"  {stage:<24s} {t * 1000:8.1f} ms  (+{(t - prev) * 1000:.1f} ms)")
+        prev = t
+    return "\n".join(lines)
+
+mark_startup("核心模块导入")
 
 controller: BalanceController | None = None   # 单例
 motors_enabled = False   # 电机使能状态
 port_opened: bool = False  # 是否已打开串口
 balance_running = False  # 平衡控制运行状态
+estop_active = False     # 急停后为 True，重新使能电机时清除
+
+def _log_settled_speed(cmd: dict) -> None:
+    """速度指令稳定后只记录一次最终值。"""
+    log(f"速度指令: 速度={cmd['vel']:.2f}, 转向={cmd['off']:.2f}")
+
+def _log_health_event(motor, event, value) -> None:
+    """电机故障 / 过温事件（状态变化时才触发）写入日志。"""
+    if event in ("fault", "fault_cleared"):
+        from u2can.DM_CAN import state_name
+        value = state_name(value)
+    log(f"电机 0x{motor.SlaveID:02X} 健康事件: {event} ({value})")
 
 # -------------------------------------------------
-# 安全创建 BalanceController（带重试）
+# 遥操作 UDP 服务（可选，--teleop-port 启用）
 # -------------------------------------------------
+teleop_port = 0          # 0 表示不启用
+teleop_bind = "127.0.0.1"   # 默认只接受本机报文，需要远程遥操作时用 --teleop-bind 显式指定
+_teleop_server = None
+
+def _start_teleop(ctrl: BalanceController) -> None:
+    """为新创建的控制器启动遥操作服务。"""
+    global _teleop_server
+    if not teleop_port:
+        return
+    from teleop_server import TeleopServer
+    if _teleop_server is not None:
+        _teleop_server.stop()
+    _teleop_server = TeleopServer(ctrl, address=(teleop_bind, teleop_port),
+                                  on_estop=lambda: emergency_stop(ctrl))
+    _teleop_server.start()
+
+# -------------------------------------------------
+# CAN 收发抓包（可选，--can-capture 启用）
+# -------------------------------------------------
+can_capture = None       # u2can.can_capture.CanCapture
+
+def _start_can_capture(path: str) -> None:
+    global can_capture
+    from u2can.can_capture import CanCapture
+    can_capture = CanCapture(path)
+    atexit.register(can_capture.close)
+    log(f"CAN 抓包写入 {path}")
+
+# -------------------------------------------------
+# 安全创建 BalanceController（并行探测设备，带重试）
+# -------------------------------------------------
+readiness = None   # 最近一次设备就绪报告（bringup.ReadinessReport）
+PARAM_CACHE_PATH = "motor_params.json"   # 电机参数缓存（按 SN 记录 PMAX/VMAX/TMAX、控制模式、固件版本等）
+
 def create_controller(retries: int = 3, delay: float = 1.0) -> BalanceController | None:
-    """尝试实例化 BalanceController，失败则记录日志并返回 None。"""
+    """
+    并行打开并探测 U2CAN 适配器与 IMU，记录就绪报告后创建 BalanceController。
+    腿部控制器打开失败时重试，重试用尽后与 IMU 不可用时一样使用占位对象继续。
+    """
+    global readiness
+    from bringup import bring_up
+    from balance import DummyLegs, DummyImu
+    legs = imu = None
     for attempt in range(1, retries + 1):
-        try:
-            log(f"尝试创建 BalanceController（第 {attempt} 次）")
-            return BalanceController()
-        except Exception as e:
-            log(f"创建 BalanceController 失败: {e}")
-            if attempt < retries:
-                time.sleep(delay)
-    log("全部重试结束，仍未能创建 BalanceController")
-    return None
+        log(f"尝试打开设备（第 {attempt} 次）")
+        legs, imu, readiness = bring_up(capture=can_capture, param_cache=PARAM_CACHE_PATH)
+        log(str(readiness))
+        if legs is not None:
+            legs.add_health_callback(_log_health_event)
+            break
+        if imu is not None and attempt < retries:
+            imu.stop()
+            imu = None
+        if attempt < retries:
+            time.sleep(delay)
+    try:
+        ctrl = BalanceController(legs=legs if legs is not None else DummyLegs(),
+                                 imu=imu if imu is not None else DummyImu())
+    except Exception as e:
+        log(f"创建 BalanceController 失败: {e}")
+        return None
+    ctrl.readiness = readiness
+    ctrl.commands.on_settled = _log_settled_speed
+    _start_teleop(ctrl)
+    return ctrl
 
 # ---------------------------------------
 # ----------
@@ -69,7 +154,7 @@ def open_port() -> tuple:
 
 def enable_all() -> tuple:
     """使能所有电机（腿部+轮子）。"""
-    global motors_enabled
+    global motors_enabled, estop_active
     if not port_opened:
         msg = "请先打开串口"
         log(msg)
@@ -80,6 +165,7 @@ def enable_all() -> tuple:
     try:
         controller.enable_all()
         motors_enabled = True
+        estop_active = False
         msg = "电机已全部使能"
         log(msg)
         return (msg, msg)
@@ -177,14 +263,6 @@ def start_balance_thread() -> None:
     thread.start()
     log("平衡控制线程已启动")
 
-def start_spd_thread(nomspd,offspd) -> None:
-    """在守护线程中启动平衡循环。"""
-    if controller is None:
-        log("启动speed控制失败：无法创建 BalanceController")
-        return
-    controller.set_wheels_vel(nomspd,offspd)
-    log("speed线程已启动")
-
 def start_balance() -> tuple:
     """检查电机是否已使能后启动平衡控制。"""
     global balance_running
@@ -202,6 +280,15 @@ def start_balance() -> tuple:
     log(msg)
     return (msg, msg)
 
+def emergency_stop(ctrl: BalanceController) -> None:
+    """急停（遥操作急停报文等）：失能电机并同步 UI 状态，需重新使能后才能启动平衡控制。"""
+    global balance_running, motors_enabled, estop_active
+    ctrl.emergency_stop()
+    balance_running = False
+    motors_enabled = False
+    estop_active = True
+    log("急停：平衡循环已停止，所有电机已失能")
+
 def stop_balance() -> tuple:
     """停止平衡控制：先关闭平衡进程，再降腿，最后失能电机。"""
     global balance_running
@@ -222,18 +309,46 @@ def stop_balance() -> tuple:
     
     msg = "已停止平衡控制"
     log(msg)
+    import gradio as gr
     # 返回状态消息和滑块更新（重置为0）
     return (msg, msg, gr.update(value=0.0), gr.update(value=0.0))
 
 # -------------------------------------------------
 # 日志刷新（用于 UI 按钮）
 # -------------------------------------------------
+LOG_VIEW_LINES = 500   # UI 日志框保留的最大行数
+_log_tail = LogTail(LOG_PATH, max_lines=LOG_VIEW_LINES)
+
 def refresh_log() -> str:
-    """读取最新的日志文件内容返回给 UI。"""
-    if not os.path.exists(LOG_PATH):
-        return ""
-    with open(LOG_PATH, "r", encoding="utf-8") as f:
-        return f.read()
+    """增量读取日志新增内容，返回最近 LOG_VIEW_LINES 行给 UI。"""
+    return _log_tail.text()
+
+# -------------------------------------------------
+# 实时遥测（由 gr.Timer 定时拉取控制循环维护的快照，不访问串口）
+# -------------------------------------------------
+TELEMETRY_HZ = 20.0   # 默认 UI 刷新频率，可通过 --telemetry-hz 修改
+
+def poll_telemetry() -> tuple:
+    """读取最新遥测快照并格式化为 UI 文本（姿态、偏置、轮速、扭矩与电机温度、循环频率与总线利用率）。"""
+    snap = controller.get_telemetry() if controller is not None else {}
+    if not snap:
+        return ("无数据",) * 5
+    stale = "（已停止）" if snap["age"] > 0.5 else ""
+    attitude = f"roll={snap['roll']:.2f}°  pitch={snap['pitch']:.2f}°  yaw={snap['yaw']:.2f}°"
+    offs = "  ".join(f"{o:.3f}" for o in snap["offs"])
+    wheels = f"速度={snap['wheels_vel']:.2f}  转向={snap['wheels_off']:.2f}"
+    torques = "  ".join(f"{t:.2f}" for t in snap["torques"]) or "N/A"
+    buses = snap.get("health", {}).get("buses", {})
+    if buses:
+        mos = max(b["max_temp_mos"] for b in buses.values())
+        rotor = max(b["max_temp_rotor"] for b in buses.values())
+        alarms = sum(len(b["alarms"]) for b in buses.values())
+        torques += f"  [最高温度 MOS {mos:.0f}℃ 线圈 {rotor:.0f}℃" + (f"，报警 {alarms}" if alarms else "") + "]"
+    rate = f"{snap['loop_hz']:.0f} Hz{stale}" + ("  [急停]" if estop_active else "")
+    for name, bus in snap.get("bus", {}).items():
+        if "tx_utilization" in bus:
+            rate += f"  [{name}] TX {bus['tx_utilization']:.0%} RX {bus['rx_utilization']:.0%}"
+    return (attitude, offs, wheels, torques, rate)
 
 # -------------------------------------------------
 # 自动打开串口并初始化 UI
@@ -241,83 +356,207 @@ def refresh_log() -> str:
 init_status = "未打开串口"
 
 def control_speed(spd,off_spd):
-    """检查电机是否已使能后启动平衡控制。"""
-    if not port_opened:
+    """提交速度/转向指令（只记录最新值，不写日志、不访问串口）。"""
+    if not port_opened or controller is None:
         msg = "请先打开串口"
-        log(msg)
         return (msg, msg)
     if not motors_enabled:
-        msg = "启动平衡控制失败：电机未使能"
-        log(msg)
+        msg = "速度控制失败：电机未使能"
         return (msg, msg)
-    start_spd_thread(spd,off_spd)
-    msg = "平衡控制已启动"
-    log(msg)
+    controller.set_wheels_vel(spd, off_spd)
+    msg = f"速度指令已提交: {spd:.2f}, {off_spd:.2f}"
     return (msg, msg)
 
 
+# -------------------------------------------------
+# 手臂动作组（后台任务，按钮立即返回）
+# -------------------------------------------------
+_arm_client = None
+_last_arm_job = None
+
+def _get_arm_client():
+    global _arm_client
+    if _arm_client is None:
+        from arm_client import ArmClient
+        _arm_client = ArmClient(max_concurrency=1)
+    return _arm_client
+
+def _on_arm_done(job: dict) -> None:
+    if job["state"] == "done":
+        log(f"成功控制arms（任务 {job['id']}，耗时 {job['elapsed']:.1f}s）")
+    else:
+        log(f"控制arms{job['state']}（任务 {job['id']}）: {job['message']}")
+
 def control_arms():
-    url = "http://127.0.0.1:8081/action-group/run"
+    """提交动作组任务后立即返回，不占用 Gradio worker 等待动作完成。"""
+    global _last_arm_job
     try:
-        response = requests.post(url, timeout=60)
-        if response.status_code == 200:
-            log("成功控制arms")
-            return ("成功控制arms", "")
-        else:
-            log(f"控制arms失败: {response.text}")
-            return (f"控制arms失败: {response.text}", "")
+        _last_arm_job = _get_arm_client().submit(callback=_on_arm_done)
     except Exception as e:
         log(f"控制arms异常: {e}")
         return (f"控制arms异常: {e}", "")
+    msg = f"arms任务 {_last_arm_job} 已提交"
+    log(msg)
+    return (msg, "")
+
+def arm_status():
+    """查询最近一次手臂任务的状态。"""
+    if _last_arm_job is None:
+        return "暂无arms任务"
+    job = _get_arm_client().status(_last_arm_job)
+    if job is None:
+        return "暂无arms任务"
+    return f"任务 {job['id']}: {job['state']}（{job['elapsed']:.1f}s）{job['message']}"
+
+def cancel_arms():
+    """取消最近一次手臂任务（执行中的请求无法中断，结果会被丢弃）。"""
+    if _last_arm_job is None:
+        return "暂无arms任务"
+    if _get_arm_client().cancel(_last_arm_job):
+        msg = f"arms任务 {_last_arm_job} 已取消"
+        log(msg)
+        return msg
+    return arm_status()
 
 
+# -------------------------------------------------
+# 无界面入口：不导入 gradio，直接启动平衡控制
+# -------------------------------------------------
+def run_headless(max_vel: float = 1.0) -> None:
+    """创建控制器、使能电机并在前台运行平衡循环，Ctrl+C 退出。"""
+    global controller, port_opened, motors_enabled, balance_running
+    controller = create_controller()
+    if controller is None:
+        log("无界面模式启动失败：无法创建 BalanceController")
+        return
+    port_opened = True
+    mark_startup("控制器创建")
+    controller.enable_all()
+    motors_enabled = True
+    mark_startup("电机使能")
+    log(startup_report())
+    balance_running = True
+    log("平衡循环启动（无界面模式）")
+    try:
+        controller.run_balance_loop(max_vel=max_vel)
+    except KeyboardInterrupt:
+        log("收到中断信号，停止平衡控制")
+    finally:
+        controller.shutdown()
+        balance_running = False
+        log("平衡循环已结束，资源已清理")
 
 # -------------------------------------------------
 # Gradio UI
 # -------------------------------------------------
-with gr.Blocks() as demo:
-    # 日志显示区
-    log_box = gr.Textbox(label="运行日志", lines=15, interactive=False)
-    refresh_btn = gr.Button("刷新日志")
-    refresh_btn.click(fn=refresh_log, inputs=None, outputs=log_box)
-
-    gr.Markdown("# 🤖 四足机器人控制面板")
-
-    with gr.Row():
-        # 左侧：电机控制
-        with gr.Column():
-            gr.Markdown("## 电机控制")
-            # 已移除 "打开串口" 按钮，串口在启动时已自动打开
-            open_btn    = gr.Button("🔌 打开串口")
-            enable_btn  = gr.Button("✅ 使能全部")
-            disable_btn = gr.Button("❌ 失能全部")
-            start_btn   = gr.Button("▶️ 启动平衡控制")
-            stop_btn    = gr.Button("⏹ 停止平衡控制")
-            status_box  = gr.Textbox(label="状态", value=init_status, interactive=False)
-
-            open_btn.click(fn=open_port, inputs=None, outputs=[status_box, log_box])
-            enable_btn.click(fn=enable_all, inputs=None, outputs=[status_box, log_box])
-            disable_btn.click(fn=disable_all, inputs=None, outputs=[status_box, log_box])
-            start_btn.click(fn=start_balance, inputs=None, outputs=[status_box, log_box])
+def build_ui(telemetry_hz: float = TELEMETRY_HZ):
+    """构建 Gradio 控制面板并返回 Blocks 对象。"""
+    import gradio as gr
+    from teleop_server import SPEED_LIMIT, TURN_LIMIT
+    mark_startup("gradio 导入")
+
+    with gr.Blocks() as demo:
+        # 日志显示区
+        log_box = gr.Textbox(label="运行日志", lines=15, interactive=False)
+        refresh_btn = gr.Button("刷新日志")
+        refresh_btn.click(fn=refresh_log, inputs=None, outputs=log_box)
+
+        gr.Markdown("# 🤖 四足机器人控制面板")
+
+        with gr.Row():
+            # 左侧：电机控制
+            with gr.Column():
+                gr.Markdown("## 电机控制")
+                # 已移除 "打开串口" 按钮，串口在启动时已自动打开
+                open_btn    = gr.Button("🔌 打开串口")
+                enable_btn  = gr.Button("✅ 使能全部")
+                disable_btn = gr.Button("❌ 失能全部")
+                start_btn   = gr.Button("▶️ 启动平衡控制")
+                stop_btn    = gr.Button("⏹ 停止平衡控制")
+                status_box  = gr.Textbox(label="状态", value=init_status, interactive=False)
+
+                open_btn.click(fn=open_port, inputs=None, outputs=[status_box, log_box])
+                enable_btn.click(fn=enable_all, inputs=None, outputs=[status_box, log_box])
+                disable_btn.click(fn=disable_all, inputs=None, outputs=[status_box, log_box])
+                start_btn.click(fn=start_balance, inputs=None, outputs=[status_box, log_box])
+
+            with gr.Column():
+                gr.Markdown("## 速度控制")
+                normal_speed = gr.Slider(label="速度",minimum=-SPEED_LIMIT,maximum=SPEED_LIMIT,value=0.0,step=0.01)
+                off_speed = gr.Slider(label="转向",minimum=-TURN_LIMIT,maximum=TURN_LIMIT,value=0.0,step=0.01)
+                # always_last：拖动过程中只保留最后一个待处理事件
+                normal_speed.change(fn=control_speed,inputs=[normal_speed,off_speed], outputs=[status_box, log_box],
+                                    trigger_mode="always_last")
+                off_speed.change(fn=control_speed,inputs=[normal_speed,off_speed], outputs=[status_box, log_box],
+                                 trigger_mode="always_last")
+            # 滑块创建之后再绑定停止按钮（停止时会把滑块复位为 0）
             stop_btn.click(fn=stop_balance, inputs=None, outputs=[status_box, log_box, normal_speed, off_speed])
-        
-        with gr.Column():
-            gr.Markdown("## 速度控制")
-            normal_speed = gr.Slider(label="速度",minimum=-2,maximum=2,value=0.0,step=0.01)
-            off_speed = gr.Slider(label="转向",minimum=-0.5,maximum=0.5,value=0.0,step=0.01)
-            normal_speed.change(fn=control_speed,inputs=[normal_speed,off_speed], outputs=[status_box, log_box])
-            off_speed.change(fn=control_speed,inputs=[normal_speed,off_speed], outputs=[status_box, log_box])
-        # 右侧：扭矩读取
-        with gr.Column():
-            gr.Markdown("## 扭矩读取")
-            torque_output = gr.Textbox(label="腿部扭矩 (N/m)", interactive=False)
-            read_btn = gr.Button("读取扭矩")
-            read_btn.click(fn=get_torque, inputs=None, outputs=[torque_output, log_box])
-
-        # control arms
-        with gr.Column():
-            gr.Markdown("## arms")
-            arm_btn = gr.Button("控制arms")
-            arm_btn.click(fn=control_arms, inputs=None, outputs=[status_box, log_box])
 
+            # 右侧：扭矩读取
+            with gr.Column():
+                gr.Markdown("## 扭矩读取")
+                torque_output = gr.Textbox(label="腿部扭矩 (N/m)", interactive=False)
+                read_btn = gr.Button("读取扭矩")
+                read_btn.click(fn=get_torque, inputs=None, outputs=[torque_output, log_box])
+
+            # control arms
+            with gr.Column():
+                gr.Markdown("## arms")
+                arm_btn = gr.Button("控制arms")
+                arm_status_btn = gr.Button("查询arms状态")
+                arm_cancel_btn = gr.Button("取消arms任务")
+                arm_status_box = gr.Textbox(label="arms任务", interactive=False)
+                arm_btn.click(fn=control_arms, inputs=None, outputs=[status_box, log_box])
+                arm_status_btn.click(fn=arm_status, inputs=None, outputs=arm_status_box)
+                arm_cancel_btn.click(fn=cancel_arms, inputs=None, outputs=arm_status_box)
+
+        # 实时遥测面板：按固定频率拉取快照
+        gr.Markdown(f"## 实时遥测（{telemetry_hz:g} Hz）")
+        with gr.Row():
+            attitude_box = gr.Textbox(label="姿态", interactive=False)
+            offs_box     = gr.Textbox(label="腿部偏置", interactive=False)
+            wheels_box   = gr.Textbox(label="轮速指令", interactive=False)
+            torques_box  = gr.Textbox(label="腿部扭矩 (N/m)", interactive=False)
+            rate_box     = gr.Textbox(label="循环频率", interactive=False)
+        telemetry_timer = gr.Timer(value=1.0 / telemetry_hz)
+        telemetry_timer.tick(fn=poll_telemetry, inputs=None,
+                             outputs=[attitude_box, offs_box, wheels_box, torques_box, rate_box],
+                             show_progress="hidden")
+
+    mark_startup("UI 构建")
+    return demo
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="四足机器人控制面板")
+    parser.add_argument("--headless", action="store_true",
+                        help="不启动 Gradio，直接创建控制器并运行平衡循环")
+    parser.add_argument("--max-vel", type=float, default=1.0, help="无界面模式下的腿部速度上限")
+    parser.add_argument("--telemetry-hz", type=float, default=TELEMETRY_HZ,
+                        help="UI 实时遥测刷新频率 (Hz)")
+    parser.add_argument("--teleop-port", type=int, default=0,
+                        help="启用遥操作 UDP 指令服务的端口（0 表示不启用，常用 9870）")
+    parser.add_argument("--teleop-bind", default="127.0.0.1",
+                        help="遥操作服务的监听地址（默认仅本机；报文无认证，绑定其他地址前确认网络可信）")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="UI 模式下在启动服务前打印启动耗时报告")
+    parser.add_argument("--can-capture", metavar="PATH", default=None,
+                        help="把 CAN 收发的每一帧记录到二进制抓包文件（python -m u2can.can_capture 解码）")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> None:
+    global teleop_port, teleop_bind
+    args = parse_args(argv)
+    teleop_port = args.teleop_port
+    teleop_bind = args.teleop_bind
+    if args.can_capture:
+        _start_can_capture(args.can_capture)
+    if args.headless:
+        run_headless(max_vel=args.max_vel)
+        return
+    demo = build_ui(telemetry_hz=args.telemetry_hz)
+    if args.startup_report:
+        log(startup_report())
     demo.launch(server_name="0.0.0.0", server_port=7860, debug=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+多机器人控制主机：在一个主进程中管理 N 台机器人。
+
+每台机器人运行在独立的子进程中（各自的串口 I/O、IMU、平衡循环与状态），
+可绑定到指定 CPU 核；一台机器人的总线阻塞不会影响其他机器人。
+主进程通过指令队列下发操作，并按机器人 ID 汇总最新遥测快照。
+``--ui`` 启动一个所有机器人共用的 Gradio 面板：遥测表按机器人 ID 列出全部机器人，
+按钮与滑块的指令按所选的机器人 ID（或“全部”）路由到对应子进程。
+
+配置文件示例（robots.json）::
+
+    [
+        {"id": "r1", "leg_port": "/dev/dm-u2can-1", "imu_port": "/dev/dm-imu-1", "cpu": 1},
+        {"id": "r2", "leg_port": "/dev/dm-u2can-2", "imu_port": "/dev/dm-imu-2", "cpu": 2}
+    ]
+
+运行::
+
+    python robot_host.py robots.json --start
+    python robot_host.py robots.json --ui          # 共享控制面板，默认 http://127.0.0.1:7860
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger("host")
+
+TELEMETRY_HZ = 20.0
+# 面板可路由的指令（与 _robot_worker 的 handlers 对应）
+COMMANDS = ("enable", "disable", "start", "stop", "wheels", "legs", "estop")
+ALL_ROBOTS = "全部"
+
+
+# -------------------------------------------------
+# 子进程：单台机器人
+# -------------------------------------------------
+def _robot_worker(spec, cmd_q, telemetry_q, telemetry_hz):
+    """子进程入口：创建 BalanceController，执行主机下发的指令并定期回传遥测。"""
+    from async_log import setup_logging
+    from balance import BalanceController
+
+    robot_id = spec["id"]
+    listener = setup_logging(f"robot_{robot_id}.log", console=False)
+    log = logging.getLogger(f"robot.{robot_id}")
+
+    cpu = spec.get("cpu")
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+
+    ctrl = BalanceController(imu_port=spec.get("imu_port", "/dev/dm-imu"),
+                             leg_port=spec.get("leg_port", "/dev/dm-u2can"))
+    loop_thread = None
+    period = 1.0 / telemetry_hz
+
+    def start(max_vel=1.0):
+        nonlocal loop_thread
+        if loop_thread is not None and loop_thread.is_alive():
+            return
+        ctrl.enable_all()
+        loop_thread = threading.Thread(target=ctrl.run_balance_loop, args=(max_vel,), daemon=True)
+        loop_thread.start()
+        log.info("平衡循环启动")
+
+    def stop():
+        ctrl.stop_loop()
+        if loop_thread is not None:
+            loop_thread.join(timeout=1.0)
+        ctrl.control_legs_pos(0, 0, 0, 0, 0.5)
+        ctrl.disable_all()
+        log.info("平衡循环停止")
+
+    handlers = {
+        "enable": ctrl.enable_all,
+        "disable": ctrl.disable_all,
+        "start": start,
+        "stop": stop,
+        "wheels": ctrl.set_wheels_vel,
+        "legs": ctrl.set_leg_heights,
+        "estop": ctrl.emergency_stop,
+    }
+
+    running = True
+    next_publish = time.monotonic()
+    while running:
+        timeout = max(0.0, next_publish - time.monotonic())
+        try:
+            cmd, args = cmd_q.get(timeout=timeout)
+        except queue.Empty:
+            cmd = None
+        if cmd == "shutdown":
+            running = False
+        elif cmd is not None:
+            try:
+                handlers[cmd](*args)
+            except Exception as e:
+                log.error(f"执行指令 {cmd} 失败: {e}")
+
+        now = time.monotonic()
+        if now >= next_publish:
+            next_publish = now + period
+            snap = ctrl.get_telemetry()
+            snap["running"] = loop_thread is not None and loop_thread.is_alive()
+            try:
+                telemetry_q.put_nowait(snap)
+            except queue.Full:
+                pass
+
+    # 先停止并等待平衡循环，再关闭总线：否则循环中的 control_step 会访问已停止的总线工作线程
+    ctrl.stop_loop()
+    if loop_thread is not None:
+        loop_thread.join(timeout=1.0)
+    ctrl.shutdown()
+    listener.stop()
+
+
+# -------------------------------------------------
+# 主进程：机器人管理
+# -------------------------------------------------
+class RobotHandle:
+    """主进程侧的单台机器人句柄。"""
+
+    def __init__(self, spec, process, cmd_q, telemetry_q):
+        self.spec = spec
+        self.process = process
+        self.cmd_q = cmd_q
+        self.telemetry_q = telemetry_q
+        self.latest = {}
+
+
+class RobotHost:
+    """
+    在一个主进程中管理多台机器人，每台机器人一个子进程（可绑核）。
+    ``send()`` 下发指令，``telemetry()`` 返回按机器人 ID 索引的最新遥测。
+    """
+
+    def __init__(self, specs, telemetry_hz=TELEMETRY_HZ):
+        ids = [s["id"] for s in specs]
+        if len(set(ids)) != len(ids):
+            raise ValueError("机器人 ID 不能重复")
+        self.specs = specs
+        self.telemetry_hz = telemetry_hz
+        self.robots = {}
+        # spawn：子进程不继承主进程的线程与串口句柄
+        self._ctx = mp.get_context("spawn")
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def start(self):
+        """为每台机器人启动子进程。"""
+        for spec in self.specs:
+            cmd_q = self._ctx.Queue()
+            telemetry_q = self._ctx.Queue(maxsize=8)
+            p = self._ctx.Process(target=_robot_worker, name=f"robot-{spec['id']}",
+                                  args=(spec, cmd_q, telemetry_q, self.telemetry_hz), daemon=True)
+            p.start()
+            self.robots[spec["id"]] = RobotHandle(spec, p, cmd_q, telemetry_q)
+            logger.info(f"机器人 {spec['id']} 进程已启动 (pid={p.pid})")
+
+    def send(self, robot_id, cmd, *args):
+        """向指定机器人下发指令：enable / disable / start / stop / wheels / legs / estop。"""
+        if robot_id not in self.robots:
+            raise ValueError(f"未知的机器人 ID: {robot_id}")
+        if cmd not in COMMANDS:
+            raise ValueError(f"未知的指令: {cmd}")
+        self.robots[robot_id].cmd_q.put((cmd, args))
+
+    def broadcast(self, cmd, *args):
+        """向所有机器人下发同一指令。"""
+        for robot_id in self.robots:
+            self.send(robot_id, cmd, *args)
+
+    def telemetry(self):
+        """读空各机器人的遥测队列，返回 {机器人 ID: 最新快照}。"""
+        result = {}
+        for robot_id, r in self.robots.items():
+            while True:
+                try:
+                    r.latest = r.telemetry_q.get_nowait()
+                except queue.Empty:
+                    break
+            snap = dict(r.latest)
+            snap["alive"] = r.process.is_alive()
+            result[robot_id] = snap
+        return result
+
+    def shutdown(self, timeout=3.0):
+        """通知所有子进程收尾（失能电机、关闭串口）并等待退出。"""
+        for r in self.robots.values():
+            if r.process.is_alive():
+                r.cmd_q.put(("shutdown", ()))
+        for r in self.robots.values():
+            r.process.join(timeout)
+            if r.process.is_alive():
+                r.process.terminate()
+        self.robots.clear()
+
+
+# -------------------------------------------------
+# 共享控制面板：遥测按机器人 ID 汇总，指令按所选 ID 路由
+# -------------------------------------------------
+TELEMETRY_COLUMNS = ["ID", "进程", "平衡", "roll (°)", "pitch (°)", "轮速", "转向", "循环 (Hz)"]
+
+
+def telemetry_rows(snaps):
+    """把 {机器人 ID: 快照} 格式化为遥测表的行（无遥测的机器人只显示进程状态）。"""
+    rows = []
+    for robot_id, snap in snaps.items():
+        alive = "运行" if snap["alive"] else "已退出"
+        if not snap.get("t"):
+            rows.append([robot_id, alive, "", "", "", "", "", ""])
+            continue
+        rows.append([robot_id, alive, "运行" if snap.get("running") else "停止",
+                     round(snap["roll"], 2), round(snap["pitch"], 2),
+                     round(snap["wheels_vel"], 2), round(snap["wheels_off"], 2), round(snap["loop_hz"])])
+    return rows
+
+
+def route(host, target, cmd, *args):
+    """把指令发给 target（机器人 ID 或 ALL_ROBOTS），返回状态文本。"""
+    try:
+        if target == ALL_ROBOTS:
+            host.broadcast(cmd, *args)
+        else:
+            host.send(target, cmd, *args)
+    except ValueError as e:
+        return str(e)
+    logger.info(f"[{target}] {cmd}{args if args else ''}")
+    return f"已向 {target} 下发 {cmd}"
+
+
+def build_ui(host, telemetry_hz=TELEMETRY_HZ):
+    """构建所有机器人共用的 Gradio 控制面板并返回 Blocks 对象。"""
+    import gradio as gr
+    from teleop_server import SPEED_LIMIT, TURN_LIMIT
+
+    ids = list(host.robots)
+    with gr.Blocks() as demo:
+        gr.Markdown("# 🤖 多机器人控制面板")
+        with gr.Row():
+            with gr.Column():
+                target = gr.Dropdown(label="目标机器人", choices=[ALL_ROBOTS] + ids, value=ALL_ROBOTS)
+                status_box = gr.Textbox(label="状态", interactive=False)
+                buttons = {"enable": "✅ 使能", "disable": "❌ 失能", "start": "▶️ 启动平衡控制",
+                           "stop": "⏹ 停止平衡控制", "estop": "🛑 急停"}
+                for cmd, label in buttons.items():
+                    gr.Button(label).click(fn=lambda t, cmd=cmd: route(host, t, cmd),
+                                           inputs=target, outputs=status_box)
+            with gr.Column():
+                speed = gr.Slider(label="速度", minimum=-SPEED_LIMIT, maximum=SPEED_LIMIT, value=0.0, step=0.01)
+                turn = gr.Slider(label="转向", minimum=-TURN_LIMIT, maximum=TURN_LIMIT, value=0.0, step=0.01)
+                for slider in (speed, turn):
+                    slider.change(fn=lambda t, v, o: route(host, t, "wheels", v, o),
+                                  inputs=[target, speed, turn], outputs=status_box, trigger_mode="always_last")
+
+        gr.Markdown(f"## 实时遥测（{telemetry_hz:g} Hz）")
+        table = gr.Dataframe(headers=TELEMETRY_COLUMNS, interactive=False)
+        timer = gr.Timer(value=1.0 / telemetry_hz)
+        timer.tick(fn=lambda: telemetry_rows(host.telemetry()), inputs=None, outputs=table,
+                   show_progress="hidden")
+    return demo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多机器人控制主机")
+    parser.add_argument("config", help="机器人配置 JSON 文件")
+    parser.add_argument("--start", action="store_true", help="启动后立即使能并运行平衡循环")
+    parser.add_argument("--telemetry-hz", type=float, default=TELEMETRY_HZ)
+    parser.add_argument("--ui", action="store_true", help="启动所有机器人共用的 Gradio 控制面板")
+    parser.add_argument("--ui-bind", default="127.0.0.1",
+                        help="控制面板的监听地址（默认仅本机；面板无认证，绑定其他地址前确认网络可信）")
+    parser.add_argument("--ui-port", type=int, default=7860)
+    args = parser.parse_args()
+
+    from async_log import setup_logging
+    listener = setup_logging("host.log")
+
+    host = RobotHost.from_file(args.config, telemetry_hz=args.telemetry_hz)
+    host.start()
+    if args.start:
+        host.broadcast("start")
+    try:
+        if args.ui:
+            build_ui(host, args.telemetry_hz).launch(server_name=args.ui_bind, server_port=args.ui_port)
+            return
+        while True:
+            time.sleep(1.0)
+            for robot_id, snap in host.telemetry().items():
+                if snap.get("t"):
+                    logger.info(f"[{robot_id}] alive={snap['alive']} roll={snap['roll']:.2f} "
+                                f"pitch={snap['pitch']:.2f} loop={snap['loop_hz']:.0f}Hz")
+                else:
+                    logger.info(f"[{robot_id}] alive={snap['alive']} 暂无遥测")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        host.shutdown()
+        listener.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+# -------------------------------------------------
+# 俯仰 / 横滚平台仿真
+#
+# 每台机器人是一个刚性平台，四条腿的伸出量决定平台相对地面的几何倾角：
+#   pitch_geo = slope_pitch + atan(k * ((h0 + h1) - (h2 + h3)) / 2 / L)
+#   roll_geo  = slope_roll  + atan(k * ((h1 + h2) - (h0 + h3)) / 2 / W)
+# （腿序与 BalanceController._update_offsets 一致：pitch > 0 时降低 0、1 号腿，
+#   roll < 0 时降低 0、3 号腿。）平台姿态以二阶弹簧‑阻尼跟随几何倾角，
+# 前进加速度经轮子耦合到俯仰。腿部按位置‑速度模式以指令速度限速趋近目标，
+# 轮子一阶跟随速度指令；执行器指令经固定步数的延迟队列后生效。
+#
+# 所有状态都是 (n,) 或 (n, 4) 的 NumPy 数组，一次 step() 推进全部机器人。
+# SimImu / SimLegs 是单台机器人的视图，可直接传给 BalanceController(legs=..., imu=...)。
+# -------------------------------------------------
+
+PITCH_SIGNS = np.array([1.0, 1.0, -1.0, -1.0])   # 抬高 0、1 号腿 → pitch 增大
+ROLL_SIGNS = np.array([-1.0, 1.0, 1.0, -1.0])    # 抬高 1、2 号腿 → roll 增大
+
+
+class PlatformSim:
+    """
+    n 台机器人的向量化平台仿真。
+    角度单位为度（与 IMU 一致），腿部位置与电机指令同单位，时间单位为秒。
+    """
+
+    def __init__(self, n=1, dt=0.001, seed=None, slope_std=3.0, slope=None,
+                 noise_std=0.0, latency=0.0, leg_height=0.85,
+                 height_gain=0.1, length=0.4, width=0.3,
+                 natural_freq=6.0, damping=0.7, wheel_tau=0.05, wheel_coupling=20.0,
+                 yaw_gain=60.0, torque_load=2.0):
+        """
+        :param n: 同时仿真的机器人数量
+        :param dt: 仿真步长（秒）
+        :param seed: 随机种子；相同种子 + 相同指令序列得到完全相同的结果
+        :param slope_std: 未给出 slope 时，各机器人地面坡度（pitch / roll）的随机标准差（度）
+        :param slope: 可选，(n, 2) 或 (2,) 的地面坡度（pitch, roll，度），覆盖随机坡度
+        :param noise_std: IMU 角度测量噪声标准差（度）
+        :param latency: 执行器延迟（秒），按 dt 取整为步数
+        :param leg_height: 初始腿部位置
+        :param height_gain: 腿部位置 → 伸出高度的换算系数（米 / 单位位置）
+        :param length, width: 前后腿距、左右腿距（米）
+        :param natural_freq, damping: 平台姿态跟随几何倾角的固有频率（Hz）与阻尼比
+        :param wheel_tau: 轮速一阶跟随的时间常数（秒）
+        :param wheel_coupling: 前进加速度 → 俯仰角加速度的耦合系数（度/s² per m/s²）
+        :param yaw_gain: 差速指令 → 偏航角速度（度/s per 单位差速）
+        :param torque_load: 平地静止时每条腿的负载扭矩
+        """
+        self.n = n
+        self.dt = dt
+        self.rng = np.random.default_rng(seed)
+        if slope is None:
+            slope = self.rng.normal(0.0, slope_std, (n, 2))
+        self.slope = np.broadcast_to(np.asarray(slope, np.float64), (n, 2)).copy()
+        self.noise_std = noise_std
+        self.delay_steps = max(0, int(round(latency / dt)))
+        self.height_gain = height_gain
+        self.length = length
+        self.width = width
+        self.wn = 2.0 * math.pi * natural_freq
+        self.damping = damping
+        self.wheel_tau = wheel_tau
+        self.wheel_coupling = wheel_coupling
+        self.yaw_gain = yaw_gain
+        self.torque_load = torque_load
+
+        # 执行器状态
+        self.legs = np.full((n, 4), leg_height, np.float64)
+        self.wheel_speed = np.zeros(n)
+        self.enabled = np.zeros(n, bool)
+        # 指令（经延迟队列后生效）：腿部目标、腿部限速、前进速度、差速
+        self.cmd_legs = self.legs.copy()
+        self.cmd_leg_vel = np.full(n, 0.5)
+        self.cmd_wheel = np.zeros((n, 2))
+        k = self.delay_steps + 1
+        self._q_legs = np.repeat(self.cmd_legs[None], k, axis=0)
+        self._q_leg_vel = np.repeat(self.cmd_leg_vel[None], k, axis=0)
+        self._q_wheel = np.zeros((k, n, 2))
+        self._q_pos = 0
+
+        # 平台姿态（度、度/秒）
+        self.pitch = self.slope[:, 0].copy()
+        self.roll = self.slope[:, 1].copy()
+        self.yaw = np.zeros(n)
+        self.pitch_rate = np.zeros(n)
+        self.roll_rate = np.zeros(n)
+        self.torques = np.full((n, 4), torque_load)
+        self.t = 0.0
+        self._measure()
+
+    # ---------- 几何 ----------
+    def geometric_tilt(self, legs=None):
+        """返回各机器人由腿部高度与地面坡度决定的 (pitch, roll)（度）。"""
+        h = (self.legs if legs is None else legs) * self.height_gain
+        pitch = self.slope[:, 0] + np.degrees(np.arctan(h @ PITCH_SIGNS / 2.0 / self.length))
+        roll = self.slope[:, 1] + np.degrees(np.arctan(h @ ROLL_SIGNS / 2.0 / self.width))
+        return pitch, roll
+
+    def _measure(self):
+        """生成 IMU 测量值（真实姿态 + 高斯噪声）。"""
+        if self.noise_std > 0:
+            noise = self.rng.normal(0.0, self.noise_std, (3, self.n))
+        else:
+            noise = np.zeros((3, self.n))
+        self.meas_pitch = self.pitch + noise[0]
+        self.meas_roll = self.roll + noise[1]
+        self.meas_yaw = self.yaw + noise[2]
+
+    # ---------- 指令 ----------
+    def set_legs(self, index, positions, vel):
+        """写入单台（index 为整数）或多台（切片 / 下标数组）机器人的腿部位置指令。"""
+        self.cmd_legs[index] = positions
+        self.cmd_leg_vel[index] = vel
+
+    def set_wheels(self, index, vel, of_vel):
+        """写入轮速指令（前进速度、差速）。"""
+        self.cmd_wheel[index, 0] = vel
+        self.cmd_wheel[index, 1] = of_vel
+
+    # ---------- 推进 ----------
+    def step(self, steps=1):
+        """所有机器人推进 steps 个仿真步。"""
+        dt = self.dt
+        k = self.delay_steps + 1
+        for _ in range(steps):
+            # 执行器延迟：本步写入的指令 delay_steps 步后生效
+            self._q_legs[self._q_pos] = self.cmd_legs
+            self._q_leg_vel[self._q_pos] = self.cmd_leg_vel
+            self._q_wheel[self._q_pos] = self.cmd_wheel
+            self._q_pos = (self._q_pos + 1) % k
+            legs_cmd = self._q_legs[self._q_pos]
+            leg_vel = self._q_leg_vel[self._q_pos]
+            wheel_cmd = self._q_wheel[self._q_pos]
+            on = self.enabled
+
+            # 腿部：位置‑速度模式，按指令速度限速趋近目标；失能的机器人保持不动
+            max_step = (np.abs(leg_vel) * dt)[:, None]
+            move = np.clip(legs_cmd - self.legs, -max_step, max_step)
+            self.legs += np.where(on[:, None], move, 0.0)
+
+            # 轮子：一阶跟随前进速度，前进加速度耦合到俯仰
+            target = np.where(on, wheel_cmd[:, 0], 0.0)
+            accel = (target - self.wheel_speed) / max(self.wheel_tau, dt)
+            self.wheel_speed += accel * dt
+
+            # 平台姿态：二阶跟随几何倾角
+            pitch_geo, roll_geo = self.geometric_tilt()
+            wn2 = self.wn * self.wn
+            c = 2.0 * self.damping * self.wn
+            pitch_acc = wn2 * (pitch_geo - self.pitch) - c * self.pitch_rate - self.wheel_coupling * accel
+            roll_acc = wn2 * (roll_geo - self.roll) - c * self.roll_rate
+            self.pitch_rate += pitch_acc * dt
+            self.roll_rate += roll_acc * dt
+            self.pitch += self.pitch_rate * dt
+            self.roll += self.roll_rate * dt
+            self.yaw += np.where(on, wheel_cmd[:, 1], 0.0) * self.yaw_gain * dt
+
+            # 腿部负载：平台倾斜时重心偏向较低一侧
+            sp = np.sin(np.radians(self.pitch))[:, None] * PITCH_SIGNS
+            sr = np.sin(np.radians(self.roll))[:, None] * ROLL_SIGNS
+            self.torques = self.torque_load * (1.0 - sp - sr)
+            self.t += dt
+        self._measure()
+
+    # ---------- 单台视图 ----------
+    def robot(self, i):
+        """返回第 i 台机器人的 (SimLegs, SimImu)，可直接传给 BalanceController。"""
+        return SimLegs(self, i), SimImu(self, i)
+
+
+class SimImu:
+    """PlatformSim 中单台机器人的 IMU 视图（与 DmImu.getData 接口一致）。"""
+
+    def __init__(self, sim, index):
+        self.sim = sim
+        self.index = index
+
+    def getData(self):
+        sim, i = self.sim, self.index
+        return {'roll': float(sim.meas_roll[i]), 'pitch': float(sim.meas_pitch[i]),
+                'yaw': float(sim.meas_yaw[i])}
+
+    def start(self):
+        pass
+
+
+class SimLegs:
+    """
+    PlatformSim 中单台机器人的电机视图，提供 BalanceController 用到的 LegsController 接口。
+    位置为腿部坐标（安装方向换算前），与 LegsController.control_legs_pos 的参数一致。
+    """
+
+    def __init__(self, sim, index):
+        self.sim = sim
+        self.index = index
+        self.mc = sim   # BalanceController 以 mc 属性判断电机后端是否可用
+
+    def enable_legs(self):
+        self.sim.enabled[self.index] = True
+
+    def enable_wheels(self):
+        self.sim.enabled[self.index] = True
+
+    def disable_all(self):
+        self.sim.enabled[self.index] = False
+
+    def zero_position(self):
+        self.control_legs_pos(0, 0, 0, 0, 0.5)
+        self.control_wheels_vel(0, 0)
+
+    def control_legs_pos(self, pos1, pos2, pos3, pos4, vel=0.5):
+        self.sim.set_legs(self.index, (pos1, pos2, pos3, pos4), vel)
+
+    def control_wheels_vel(self, vel, of_vel):
+        self.sim.set_wheels(self.index, vel, of_vel)
+
+    def control_tick(self, positions, leg_vel, wheels_vel, wheels_off):
+        self.sim.set_legs(self.index, positions, leg_vel)
+        self.sim.set_wheels(self.index, wheels_vel, wheels_off)
+
+    def get_legs_torque(self, max_age=0.1):
+        return self.get_cached_legs_torque()
+
+    def get_cached_legs_torque(self):
+        return [float(t) for t in self.sim.torques[self.index]]
+
+    def close_serial(self):
+        pass
+
+
+# -------------------------------------------------
+# 闭环运行
+# -------------------------------------------------
+def make_controllers(sim, leg_base=None):
+    """为 sim 中的每台机器人创建一个接入仿真的 BalanceController（已使能）。"""
+    from balance import BalanceController
+    ctrls = []
+    for i in range(sim.n):
+        legs, imu = sim.robot(i)
+        ctrl = BalanceController(legs=legs, imu=imu)
+        if leg_base is not None:
+            ctrl.leg_base = list(leg_base)
+        legs.enable_legs()
+        legs.enable_wheels()
+        ctrls.append(ctrl)
+    return ctrls
+
+
+def run_closed_loop(sim, controllers, duration, control_dt=None, max_vel=1.0):
+    """
+    按仿真时间闭环运行：每个控制周期依次调用各控制器的 control_step，再推进仿真。
+    :param control_dt: 控制周期（秒），默认等于仿真步长；须为仿真步长的整数倍
+    :return: {"t": (steps,), "pitch" / "roll": (steps, n) 真实姿态, "legs": (steps, n, 4)}
+    """
+    control_dt = control_dt or sim.dt
+    sub = max(1, int(round(control_dt / sim.dt)))
+    steps = int(round(duration / (sub * sim.dt)))
+    hist_t = np.empty(steps)
+    hist_pitch = np.empty((steps, sim.n))
+    hist_roll = np.empty((steps, sim.n))
+    hist_legs = np.empty((steps, sim.n, 4))
+    for k in range(steps):
+        for ctrl in controllers:
+            ctrl.control_step(control_dt, max_vel)
+        sim.step(sub)
+        hist_t[k] = sim.t
+        hist_pitch[k] = sim.pitch
+        hist_roll[k] = sim.roll
+        hist_legs[k] = sim.legs
+    return {"t": hist_t, "pitch": hist_pitch, "roll": hist_roll, "legs": hist_legs}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="平衡控制器闭环仿真")
+    parser.add_argument("--robots", type=int, default=16, help="同时仿真的机器人数量")
+    parser.add_argument("--seconds", type=float, default=10.0, help="仿真时长（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slope", type=float, default=3.0, help="随机地面坡度标准差（度）")
+    parser.add_argument("--noise", type=float, default=0.0, help="IMU 噪声标准差（度）")
+    parser.add_argument("--latency", type=float, default=0.0, help="执行器延迟（秒）")
+    parser.add_argument("--control-dt", type=float, default=0.002, help="控制周期（秒）")
+    args = parser.parse_args(argv)
+
+    sim = PlatformSim(args.robots, seed=args.seed, slope_std=args.slope,
+                      noise_std=args.noise, latency=args.latency)
+    ctrls = make_controllers(sim)
+    start = time.perf_counter()
+    hist = run_closed_loop(sim, ctrls, args.seconds, control_dt=args.control_dt)
+    wall = time.perf_counter() - start
+    final = np.abs(np.stack([hist["pitch"][-1], hist["roll"][-1]]))
+    print(f"{args.robots} 台机器人仿真 {args.seconds:.1f}s，耗时 {wall:.2f}s"
+          f"（{args.seconds * args.robots / wall:.0f}× 实时 · 台）")
+    print(f"初始坡度 |pitch| 均值 {np.abs(sim.slope[:, 0]).mean():.2f}°，|roll| 均值 {np.abs(sim.slope[:, 1]).mean():.2f}°")
+    print(f"结束时 |pitch| 最大 {final[0].max():.2f}°，|roll| 最大 {final[1].max():.2f}°")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import logging
+import math
+import os
+import socket
+import struct
+import threading
+import time
+
+logger = logging.getLogger("teleop")
+
+# -------------------------------------------------
+# 遥操作报文（小端，33 字节）
+#   magic   4s   b"BTEL"
+#   seq     u32  序号，用于丢弃乱序/重复报文
+#   speed   f32  前进速度
+#   turn    f32  转向
+#   h1..h4  f32  四条腿基准高度，四个均为 NaN 时四条腿高度保持不变
+#   flags   u8   bit0 = 急停
+# 其余任何非有限值（NaN / Inf）的报文都被拒绝；有效值限幅到下面的范围（与 UI 滑块一致）后提交。
+# -------------------------------------------------
+TELEOP_MAGIC = b"BTEL"
+TELEOP_FORMAT = struct.Struct("<4sIffffffB")
+FLAG_ESTOP = 0x01
+
+SPEED_LIMIT = 2.0              # 前进速度 ±（UI “速度”滑块范围）
+TURN_LIMIT = 0.5               # 转向 ±（UI “转向”滑块范围）
+HEIGHT_RANGE = (0.0, 0.85)     # 腿部基准高度（0 为收腿，0.85 为默认站立高度）
+
+TELEOP_PORT = 9870
+STALE_TIMEOUT = 0.3   # 超过该时间未收到报文则轮速清零（秒）
+
+
+def _clamp(x, lo, hi):
+    return min(max(x, lo), hi)
+
+
+def pack_command(seq, speed, turn, heights=None, estop=False):
+    """打包一条遥操作指令；heights 为 None 时四条腿高度均保持不变。"""
+    h = heights if heights is not None else (math.nan,) * 4
+    return TELEOP_FORMAT.pack(TELEOP_MAGIC, seq & 0xFFFFFFFF, speed, turn,
+                              h[0], h[1], h[2], h[3], FLAG_ESTOP if estop else 0)
+
+
+def send_command(sock, addr, seq, speed, turn, heights=None, estop=False):
+    """客户端辅助函数：向遥操作服务发送一条指令。"""
+    sock.sendto(pack_command(seq, speed, turn, heights, estop), addr)
+
+
+class TeleopServer:
+    """
+    低延迟遥操作指令服务：监听 UDP（或 Unix 数据报套接字），收到报文后直接提交到
+    BalanceController 的指令通道（跳过频率限制，下一个控制周期即生效），不经过 HTTP / Gradio。
+    超过 stale_timeout 未收到新报文时自动将轮速清零；收到急停标志时立即失能电机。
+    """
+
+    def __init__(self, controller, address=("127.0.0.1", TELEOP_PORT), stale_timeout=STALE_TIMEOUT,
+                 on_estop=None):
+        """
+        :param controller: BalanceController 实例
+        :param address: (host, port) 使用 UDP；字符串路径使用 Unix 数据报套接字
+        :param stale_timeout: 指令过期时间（秒）
+        :param on_estop: 可选，收到急停报文时调用的无参函数（例如同时更新 UI 状态的停止流程），
+                         默认直接调用 controller.emergency_stop()
+        """
+        self.controller = controller
+        self.on_estop = on_estop if on_estop is not None else controller.emergency_stop
+        self.address = address
+        self.stale_timeout = stale_timeout
+        self.last_seq = None
+        self.last_rx = 0.0
+        self.received = 0
+        self.rejected = 0
+        self._zeroed = True
+        self._sock = None
+        self._thread = None
+        self._running = False
+
+    # ---------- 生命周期 ----------
+    def start(self):
+        if isinstance(self.address, str):
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        else:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(self.address)
+        self._sock.settimeout(self.stale_timeout / 2)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="teleop", daemon=True)
+        self._thread.start()
+        logger.info(f"遥操作服务已启动: {self.address}")
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    # ---------- 接收循环 ----------
+    def _run(self):
+        while self._running:
+            try:
+                payload = self._sock.recv(64)
+            except socket.timeout:
+                self._check_stale()
+                continue
+            except OSError:
+                break
+            self._handle(payload)
+            self._check_stale()
+
+    def _is_newer(self, seq):
+        # 长时间无报文后视为发送端重启，接受任意序号
+        if self.last_seq is None or time.monotonic() - self.last_rx > 10 * self.stale_timeout:
+            return True
+        # 32 位序号回绕比较
+        diff = (seq - self.last_seq) & 0xFFFFFFFF
+        return 0 < diff < 0x80000000
+
+    def _handle(self, payload):
+        if len(payload) != TELEOP_FORMAT.size:
+            self.rejected += 1
+            return
+        magic, seq, speed, turn, h1, h2, h3, h4, flags = TELEOP_FORMAT.unpack(payload)
+        if magic != TELEOP_MAGIC:
+            self.rejected += 1
+            return
+        if flags & FLAG_ESTOP:
+            self.last_seq = seq
+            self.on_estop()
+            self._zeroed = True
+            return
+        if not self._is_newer(seq):
+            self.rejected += 1
+            return
+        heights = (h1, h2, h3, h4)
+        keep_heights = all(math.isnan(h) for h in heights)
+        values = (speed, turn) if keep_heights else (speed, turn) + heights
+        if not all(math.isfinite(v) for v in values):
+            self.rejected += 1
+            return
+        self.last_seq = seq
+        self.last_rx = time.monotonic()
+        self.received += 1
+
+        cmd = {"vel": _clamp(speed, -SPEED_LIMIT, SPEED_LIMIT),
+               "off": _clamp(turn, -TURN_LIMIT, TURN_LIMIT)}
+        if not keep_heights:
+            cmd["legs"] = tuple(_clamp(h, *HEIGHT_RANGE) for h in heights)
+        self.controller.commands.submit_now(**cmd)
+        self._zeroed = False
+
+    def _check_stale(self):
+        if self._zeroed or time.monotonic() - self.last_rx < self.stale_timeout:
+            return
+        self.controller.commands.submit_now(vel=0.0, off=0.0)
+        self._zeroed = True
+        logger.warning("遥操作指令超时，轮速已清零")
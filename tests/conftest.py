@@ -0,0 +1,38 @@
+import pytest
+
+
+class FakeSerial:
+    """记录写入字节的串口替身；read_all 返回预先放入的接收数据。"""
+
+    def __init__(self, *args, **kwargs):
+        self.is_open = True
+        self.baudrate = 921600
+        self.written = []
+        self.rx = b""
+
+    def write(self, data):
+        self.written.append(bytes(data))
+        return len(data)
+
+    def read_all(self):
+        data, self.rx = self.rx, b""
+        return data
+
+    def reset_input_buffer(self):
+        self.rx = b""
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def frames(self):
+        """把写入的字节按 30 字节 TX 帧切分。"""
+        data = b"".join(self.written)
+        return [data[i:i + 30] for i in range(0, len(data), 30)]
+
+
+@pytest.fixture
+def fake_serial():
+    return FakeSerial()
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from arm_client import ArmClient, ArmJob
+from arm_stub_server import start_stub_server
+
+
+@pytest.fixture
+def stub(request):
+    delay, status = getattr(request, "param", (0.2, 200))
+    server, url = start_stub_server(delay=delay, status=status)
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+def _submit_and_wait(client, **kwargs):
+    done = threading.Event()
+    result = {}
+
+    def callback(job):
+        result.update(job)
+        done.set()
+
+    job_id = client.submit(callback=callback, **kwargs)
+    return job_id, done, result
+
+
+def test_submit_runs_action_group(stub):
+    server, url = stub
+    client = ArmClient(url, timeout=5.0)
+    job_id, done, result = _submit_and_wait(client)
+    assert done.wait(5.0)
+    assert result["state"] == "done"
+    assert client.status(job_id)["state"] == "done"
+    assert server.runs == 1
+    client.close()
+
+
+@pytest.mark.parametrize("stub", [(0.0, 500)], indirect=True)
+def test_http_error_marks_job_failed(stub):
+    _, url = stub
+    client = ArmClient(url, timeout=5.0)
+    job_id, done, result = _submit_and_wait(client)
+    assert done.wait(5.0)
+    assert result["state"] == "failed"
+    client.close()
+
+
+@pytest.mark.parametrize("stub", [(1.0, 200)], indirect=True)
+def test_request_timeout_marks_job_failed(stub):
+    _, url = stub
+    client = ArmClient(url, timeout=0.1)
+    job_id, done, result = _submit_and_wait(client)
+    assert done.wait(5.0)
+    assert result["state"] == "failed"
+    client.close()
+
+
+def test_concurrency_limit_serialises_jobs(stub):
+    server, url = stub
+    client = ArmClient(url, max_concurrency=1, timeout=5.0)
+    start = time.monotonic()
+    ids = [client.submit() for _ in range(3)]
+    max_running = 0
+    while any(client.status(i)["state"] in ("queued", "running") for i in ids):
+        max_running = max(max_running, sum(client.status(i)["state"] == "running" for i in ids))
+        time.sleep(0.01)
+    assert max_running == 1
+    assert [client.status(i)["state"] for i in ids] == ["done"] * 3
+    assert time.monotonic() - start >= 3 * 0.2
+    assert server.runs == 3
+    client.close()
+
+
+def test_cancel_queued_job(stub):
+    server, url = stub
+    client = ArmClient(url, max_concurrency=1, timeout=5.0)
+    first, first_done, _ = _submit_and_wait(client)
+    second, second_done, result = _submit_and_wait(client)
+    assert client.cancel(second)
+    assert second_done.wait(5.0)
+    assert result["state"] == "cancelled"
+    assert client.status(second)["state"] == "cancelled"
+    assert first_done.wait(5.0)
+    assert not client.cancel(first)     # 已结束的任务不能取消
+    assert server.runs == 1
+    client.close()
+
+
+def test_job_cancelled_before_run_is_finished():
+    # 出队后、_run 开始前被取消的任务（future.cancel() 已无效）也要记录结束时间
+    client = ArmClient("http://127.0.0.1:9")
+    job = ArmJob(1, "/action-group/run")
+    job.state = "cancelled"
+    client._run(job)
+    assert job.finished is not None
+    client.close()
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import bringup
+
+
+class _Legs:
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def close_serial(self):
+        self.closed.set()
+
+
+class _Imu:
+    def __init__(self):
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def test_late_devices_are_released(monkeypatch):
+    devices = {}
+
+    def slow(name, cls):
+        def probe(*args):
+            time.sleep(0.2)
+            devices[name] = cls()
+            return devices[name], True, "ok"
+        return probe
+
+    monkeypatch.setattr(bringup, "_probe_legs", slow("legs", _Legs))
+    monkeypatch.setattr(bringup, "_probe_imu", slow("imu", _Imu))
+    legs, imu, report = bringup.bring_up(legs_timeout=0.02, imu_timeout=0.02)
+    assert legs is None and imu is None
+    assert all(d.timed_out for d in report.devices.values())
+    deadline = time.monotonic() + 2.0
+    while len(devices) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert devices["legs"].closed.wait(1.0)
+    assert devices["imu"].stopped.wait(1.0)
+
+
+def test_devices_in_time_are_returned(monkeypatch):
+    monkeypatch.setattr(bringup, "_probe_legs", lambda *a: (_Legs(), True, "ok"))
+    monkeypatch.setattr(bringup, "_probe_imu", lambda *a: (_Imu(), True, "ok"))
+    legs, imu, report = bringup.bring_up()
+    assert report.ok
+    assert not legs.closed.is_set() and not imu.stopped.is_set()
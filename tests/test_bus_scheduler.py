@@ -0,0 +1,84 @@
+import pytest
+
+import u2can.DM_CAN as dm
+from u2can.DM_CAN import BusScheduler
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(dm, "monotonic", c)
+    return c
+
+
+def _drain(s, priority=BusScheduler.PRIO_CONTROL):
+    """发送控制帧直到令牌低于保留量。"""
+    while s.tokens >= s.reserve:
+        assert s.admit(priority)
+
+
+def test_safety_and_control_always_admitted(clock):
+    s = BusScheduler()
+    for _ in range(1000):
+        assert s.admit(BusScheduler.PRIO_CONTROL)
+        assert s.admit(BusScheduler.PRIO_SAFETY)
+    assert s.tokens < 0
+    assert s.backlog() > 0
+    assert s.totals["control"] == s.totals["safety"] == 1000
+
+
+def test_status_deferred_below_reserve_and_resent_after_refill(clock):
+    s = BusScheduler()
+    assert s.admit(BusScheduler.PRIO_STATUS)          # 预算充足时立即发送
+    _drain(s)
+    assert not s.admit(BusScheduler.PRIO_STATUS)
+    s.defer(0x7FF, b"\x01\x00\xcc\x00\x00\x00\x00\x00")
+    s.defer(0x7FF, b"\x01\x00\xcc\x00\x00\x00\x00\x00")   # 相同帧只保留一份
+    s.defer(0x7FF, b"\x02\x00\xcc\x00\x00\x00\x00\x00")
+    assert s.stats()["queued"] == 2
+    assert s.pop_deferred() is None                   # 预算尚未恢复
+    # 已有排队帧时，新的状态帧也要排在后面
+    clock.t += 0.01
+    assert not s.admit(BusScheduler.PRIO_STATUS)
+    assert s.pop_deferred() == (0x7FF, b"\x01\x00\xcc\x00\x00\x00\x00\x00")
+    assert s.pop_deferred() == (0x7FF, b"\x02\x00\xcc\x00\x00\x00\x00\x00")
+    assert s.pop_deferred() is None
+    assert s.totals["status"] == 3 and s.totals["dropped"] == 0
+
+
+def test_deferred_frames_expire_and_overflow(clock):
+    s = BusScheduler(max_deferred=2, max_defer_s=0.1)
+    _drain(s)
+    for i in range(3):
+        s.defer(i, bytes([i]) * 8)
+    assert s.totals["dropped"] == 1 and s.stats()["queued"] == 2
+    clock.t += 0.2
+    assert s.pop_deferred() is None
+    assert s.totals["dropped"] == 3 and s.stats()["queued"] == 0
+
+
+def test_enforce_false_only_counts(clock):
+    s = BusScheduler(enforce=False)
+    _drain(s)
+    assert s.admit(BusScheduler.PRIO_STATUS)
+
+
+def test_stats_window(clock):
+    s = BusScheduler(window_s=1.0)
+    for _ in range(100):
+        s.admit(BusScheduler.PRIO_CONTROL)
+    s.on_rx(1600, 100)
+    clock.t += 1.0
+    s.admit(BusScheduler.PRIO_CONTROL)
+    stats = s.stats()
+    assert stats["tx_frames_per_s"] == pytest.approx(100)
+    assert stats["rx_bytes_per_s"] == pytest.approx(1600)
+    assert stats["tx_utilization"] == pytest.approx(3000 / 92160)
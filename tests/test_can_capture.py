@@ -0,0 +1,82 @@
+import os
+import struct
+
+import numpy as np
+
+from u2can.can_analysis import motor_latency, select_window
+from u2can.can_capture import (
+    CAPTURE_DTYPE, KIND_MARK, KIND_RX, KIND_TX, CanCapture,
+    decode_capture, load_capture, load_meta, param_replies,
+)
+from u2can.DM_CAN import DM_Motor_Type, Motor
+
+MIT = bytes([0x7F, 0xFF, 0x7F, 0xF0, 0x00, 0x00, 0x07, 0xFF])
+
+
+def _feedback(slave, q_hi=0x80, q_lo=0x00):
+    return bytes([0x10 | slave, q_hi, q_lo, 0x80, 0x08, 0x00, 30, 30])
+
+
+def _write(path):
+    """两条总线上各有一个 SlaveID 0x01 的电机，legs 总线上还有一次参数读取及其应答。"""
+    with CanCapture(path) as cap:
+        legs, wheels = cap.tap("legs"), cap.tap("wheels")
+        legs.tx(0x01, MIT)
+        legs.rx(0x11, 0x11, _feedback(1))
+        wheels.tx(0x201, bytes(8))
+        wheels.rx(0x11, 0x11, _feedback(1))
+        wheels.rx(0x11, 0x11, _feedback(1, q_lo=0x33))           # 位置低字节恰为 0x33 的普通反馈
+        legs.tx(0x7FF, bytes([0x01, 0x00, 0x33, 0x0A, 0, 0, 0, 0]))
+        legs.rx(0x11, 0x11, bytes([0x01, 0x00, 0x33, 0x0A, 0xFF, 0xFF, 0xFF, 0xFF]))
+        cap.mark(7)
+
+
+def test_record_format_round_trip(tmp_path):
+    path = str(tmp_path / "can.bin")
+    _write(path)
+    assert os.path.getsize(path) == 8 * CAPTURE_DTYPE.itemsize == 8 * 24
+    assert load_meta(path)["buses"] == ["legs", "wheels"]
+    rec = load_capture(path)
+    assert rec["kind"].tolist() == [KIND_TX, KIND_RX, KIND_TX, KIND_RX, KIND_RX, KIND_TX, KIND_RX, KIND_MARK]
+    assert rec["bus"].tolist()[:4] == [0, 0, 1, 1]
+    assert rec["can_id"][0] == 0x01 and rec["can_id"][-1] == 7
+    assert bytes(rec["data"][0]) == MIT
+    # 第一条记录按文档中的格式手工解包
+    with open(path, "rb") as f:
+        t, kind, bus, cmd, can_id, data = struct.unpack("<dBBBxI8s", f.read(24))
+    assert (kind, bus, cmd, can_id, data) == (KIND_TX, 0, 0, 0x01, MIT)
+    assert t == rec["t"][0]
+
+
+def test_truncated_tail_is_ignored(tmp_path):
+    path = str(tmp_path / "can.bin")
+    _write(path)
+    with open(path, "ab") as f:
+        f.write(b"\x00" * 10)
+    assert len(load_capture(path)) == 8
+
+
+def test_param_replies_mask(tmp_path):
+    path = str(tmp_path / "can.bin")
+    _write(path)
+    mask = param_replies(load_capture(path))
+    assert mask.tolist() == [False] * 6 + [True, False]
+
+
+def test_decode_capture_splits_buses_and_drops_param_replies(tmp_path):
+    path = str(tmp_path / "can.bin")
+    _write(path)
+    rec = load_capture(path)
+    motor = Motor(DM_Motor_Type.DM4310, 0x01, 0x11)
+    result = decode_capture(rec, [motor])
+    assert sorted(result) == [(0, 0x01), (1, 0x01)]
+    assert len(result[(0, 0x01)]["tx_t"]) == 2      # MIT + 参数读取
+    assert len(result[(0, 0x01)]["rx_t"]) == 1      # 参数应答不计入反馈
+    assert len(result[(1, 0x01)]["tx_t"]) == 1
+    assert len(result[(1, 0x01)]["rx_t"]) == 2
+    np.testing.assert_allclose(result[(1, 0x01)]["tx_vel"], [0.0])
+
+    # 与 can_analysis 的反馈统计一致
+    latency = motor_latency(select_window(rec))
+    for key, m in result.items():
+        assert latency[key]["rx"] == len(m["rx_t"])
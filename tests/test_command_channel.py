@@ -0,0 +1,40 @@
+from command_channel import CommandChannel
+
+
+def test_submits_are_coalesced_into_one_update():
+    ch = CommandChannel(initial={"vel": 0.0, "off": 0.0}, max_rate_hz=50.0)
+    for v in (0.1, 0.2, 0.3):
+        ch.submit(vel=v)
+    ch.submit(off=0.05)
+    assert ch.poll(now=1.0) == {"vel": 0.3, "off": 0.05}
+    assert ch.poll(now=1.001) is None               # 没有新的待处理指令
+
+
+def test_rate_limit_and_submit_now():
+    ch = CommandChannel(initial={"vel": 0.0}, max_rate_hz=50.0)
+    ch.submit(vel=0.1)
+    assert ch.poll(now=1.0) == {"vel": 0.1}
+    ch.submit(vel=0.2)
+    assert ch.poll(now=1.01) is None                # 距上次应用不足 20 ms
+    assert ch.poll(now=1.02) == {"vel": 0.2}
+    ch.submit_now(vel=0.0)
+    assert ch.poll(now=1.021) == {"vel": 0.0}       # 跳过频率限制
+    assert ch.latest() == {"vel": 0.0}
+
+
+def test_partial_updates_keep_other_fields():
+    ch = CommandChannel(initial={"vel": 1.0, "off": 0.2})
+    ch.submit(off=-0.1)
+    assert ch.poll(now=5.0) == {"vel": 1.0, "off": -0.1}
+
+
+def test_on_settled_fires_once_after_silence():
+    settled = []
+    ch = CommandChannel(initial={"vel": 0.0}, settle_s=0.3, on_settled=settled.append)
+    ch.submit(vel=0.5)
+    submitted = ch._last_submit
+    assert ch.poll(now=submitted) == {"vel": 0.5}
+    assert ch.poll(now=submitted + 0.1) is None and settled == []
+    ch.poll(now=submitted + 0.4)
+    ch.poll(now=submitted + 0.8)
+    assert settled == [{"vel": 0.5}]
@@ -0,0 +1,46 @@
+from u2can.DM_CAN import DM_Motor_State, DM_Motor_Type, Motor, MotorControl
+
+
+def _rx_packet(can_id, data, cmd=0x11):
+    """U2CAN 接收帧：AA, CMD, 保留, CAN ID（小端 4 字节）, 8 字节数据, 55。"""
+    return bytes([0xAA, cmd, 0x00]) + can_id.to_bytes(4, "little") + bytes(data) + b"\x55"
+
+
+def _setup(fake_serial):
+    mc = MotorControl(fake_serial)
+    motor = Motor(DM_Motor_Type.DM4310, 0x01, 0x11)
+    mc.addMotor(motor)
+    events = []
+    mc.health.add_callback(lambda m, event, value: events.append(event))
+    return mc, motor, events
+
+
+def test_feedback_updates_state_and_temperatures(fake_serial):
+    mc, motor, events = _setup(fake_serial)
+    fake_serial.rx = _rx_packet(0x11, [0x11, 0x80, 0x00, 0x80, 0x08, 0x00, 40, 35])
+    mc.recv()
+    assert motor.getState() == DM_Motor_State.ENABLED
+    assert motor.isEnable
+    assert (motor.temp_mos, motor.temp_rotor) == (40.0, 35.0)
+    assert events == []
+
+
+def test_overtemperature_feedback_fires_callback(fake_serial):
+    mc, motor, events = _setup(fake_serial)
+    fake_serial.rx = _rx_packet(0x11, [0x11, 0x80, 0x00, 0x80, 0x08, 0x00, 95, 35])
+    mc.recv()
+    assert events
+
+
+def test_param_reply_does_not_touch_health(fake_serial):
+    mc, motor, events = _setup(fake_serial)
+    fake_serial.rx = _rx_packet(0x11, [0x11, 0x80, 0x00, 0x80, 0x08, 0x00, 40, 35])
+    mc.recv()
+    # 迟到的参数读取应答：D[0:2] = SlaveID，D[2] = 0x33，D[4:8] 为参数值（此处 0xFFFF...）
+    for rid_cmd in (0x33, 0x55):
+        fake_serial.rx = _rx_packet(0x11, [0x01, 0x00, rid_cmd, 0x0A, 0xFF, 0xFF, 0xFF, 0xFF])
+        mc.recv()
+    assert motor.isEnable
+    assert motor.getState() == DM_Motor_State.ENABLED
+    assert (motor.temp_mos, motor.temp_rotor) == (40.0, 35.0)
+    assert events == []
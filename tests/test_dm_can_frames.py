@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from u2can.DM_CAN import DM_Motor_Type, Motor, MotorControl
+
+
+@pytest.fixture
+def mc(fake_serial):
+    mc = MotorControl(fake_serial)
+    motors = [Motor(DM_Motor_Type.DM4310, i, 0x10 + i) for i in range(1, 4)]
+    for m in motors:
+        mc.addMotor(m)
+    return mc, motors
+
+
+def _single_frames(mc, motors, send):
+    """逐个电机发送，返回写出的帧；发送前先使能，使发送缓冲残留非零数据。"""
+    ser = mc.serial_
+    for m in motors:
+        mc.enable(m)
+    ser.written.clear()
+    for i, m in enumerate(motors):
+        send(i, m)
+    return ser.frames()
+
+
+def _batch_frames(mc, motors, send):
+    """批量发送前同样先使能：帧模板在第一次批量调用时由发送缓冲生成。"""
+    ser = mc.serial_
+    for m in motors:
+        mc.enable(m)
+    ser.written.clear()
+    send()
+    return ser.frames()
+
+
+def test_vel_batch_matches_single(mc):
+    mc, motors = mc
+    vel = np.array([0.5, -1.25, 3.0])
+    single = _single_frames(mc, motors, lambda i, m: mc.control_Vel(m, vel[i]))
+    batch = _batch_frames(mc, motors, lambda: mc.control_Vel_batch(motors, vel))
+    assert batch == single
+    # 速度模式数据段后 4 字节为 0，不能残留使能指令的 FF FF FF FC
+    assert all(f[25:29] == bytes(4) for f in batch)
+
+
+def test_pos_vel_batch_matches_single(mc):
+    mc, motors = mc
+    pos, vel = np.array([0.1, -0.2, 0.3]), np.array([1.0, 2.0, 0.5])
+    single = _single_frames(mc, motors, lambda i, m: mc.control_Pos_Vel(m, pos[i], vel[i]))
+    batch = _batch_frames(mc, motors, lambda: mc.control_Pos_Vel_batch(motors, pos, vel))
+    assert batch == single
+
+
+def test_mit_batch_matches_single(mc):
+    mc, motors = mc
+    q = np.array([0.3, -20.0, 1.5])          # -20 超出 Q_MAX，检验限幅
+    dq = np.array([0.0, 1.0, -2.0])
+    tau = np.array([0.5, -0.5, 11.0])
+    single = _single_frames(mc, motors, lambda i, m: mc.controlMIT(m, 30.0, 1.0, q[i], dq[i], tau[i]))
+    batch = _batch_frames(mc, motors, lambda: mc.controlMIT_batch(motors, 30.0, 1.0, q, dq, tau))
+    assert batch == single
+
+
+def test_batch_frames_carry_can_ids(mc):
+    mc, motors = mc
+    frames = _batch_frames(mc, motors, lambda: mc.control_Vel_batch(motors, 0.0))
+    assert [f[13] | (f[14] << 8) for f in frames] == [0x200 + m.SlaveID for m in motors]
+    assert all(f[:2] == b"\x55\xaa" for f in frames)
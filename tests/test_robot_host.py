@@ -0,0 +1,78 @@
+import queue
+import threading
+import time
+
+import async_log
+import balance
+import robot_host
+
+
+class _Listener:
+    def stop(self):
+        pass
+
+
+class _Controller:
+    """记录调用顺序的 BalanceController 替身；shutdown 时检查平衡循环是否已退出。"""
+
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.calls = []
+        self._running = False
+        self.loop_alive_at_shutdown = None
+        self._loop_done = threading.Event()
+        _Controller.instances.append(self)
+
+    def enable_all(self):
+        self.calls.append("enable_all")
+
+    def run_balance_loop(self, max_vel=1.0):
+        self._running = True
+        while self._running:
+            time.sleep(0.001)
+        self._loop_done.set()
+
+    def stop_loop(self):
+        self.calls.append("stop_loop")
+        self._running = False
+
+    def shutdown(self):
+        self.calls.append("shutdown")
+        self.loop_alive_at_shutdown = not self._loop_done.is_set()
+
+    def get_telemetry(self):
+        return {}
+
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def test_worker_stops_loop_before_shutdown(monkeypatch):
+    monkeypatch.setattr(async_log, "setup_logging", lambda *a, **k: _Listener())
+    monkeypatch.setattr(balance, "BalanceController", _Controller)
+    cmd_q, telemetry_q = queue.Queue(), queue.Queue(maxsize=8)
+    worker = threading.Thread(target=robot_host._robot_worker,
+                              args=({"id": "r1"}, cmd_q, telemetry_q, 50.0))
+    worker.start()
+    cmd_q.put(("start", ()))
+    time.sleep(0.05)
+    cmd_q.put(("shutdown", ()))
+    worker.join(5.0)
+    assert not worker.is_alive()
+    ctrl = _Controller.instances[-1]
+    assert ctrl.calls.index("stop_loop") < ctrl.calls.index("shutdown")
+    assert ctrl.loop_alive_at_shutdown is False
+
+
+def test_send_routes_by_id_and_rejects_unknown():
+    host = robot_host.RobotHost([{"id": "r1"}, {"id": "r2"}])
+    for robot_id in ("r1", "r2"):
+        host.robots[robot_id] = robot_host.RobotHandle({"id": robot_id}, None, queue.Queue(), queue.Queue())
+    assert robot_host.route(host, "r2", "wheels", 0.5, 0.1) == "已向 r2 下发 wheels"
+    assert host.robots["r2"].cmd_q.get_nowait() == ("wheels", (0.5, 0.1))
+    assert host.robots["r1"].cmd_q.empty()
+    robot_host.route(host, robot_host.ALL_ROBOTS, "estop")
+    assert all(r.cmd_q.get_nowait() == ("estop", ()) for r in host.robots.values())
+    assert "r9" in robot_host.route(host, "r9", "start")
+    assert "rm" in robot_host.route(host, "r1", "rm")
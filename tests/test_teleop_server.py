@@ -0,0 +1,111 @@
+import math
+import socket
+import time
+
+import pytest
+
+from teleop_server import (
+    HEIGHT_RANGE, SPEED_LIMIT, TELEOP_FORMAT, TURN_LIMIT, TeleopServer, pack_command,
+)
+
+
+class _Commands:
+    def __init__(self):
+        self.submitted = []
+
+    def submit_now(self, **values):
+        self.submitted.append(values)
+
+
+class _Controller:
+    def __init__(self):
+        self.commands = _Commands()
+        self.estops = 0
+
+    def emergency_stop(self):
+        self.estops += 1
+
+
+@pytest.fixture
+def server():
+    return TeleopServer(_Controller())
+
+
+def test_packet_layout():
+    payload = pack_command(7, 0.5, -0.1, (0.1, 0.2, 0.3, 0.4), estop=True)
+    assert len(payload) == TELEOP_FORMAT.size == 33
+    assert payload[:4] == b"BTEL"
+    assert int.from_bytes(payload[4:8], "little") == 7
+    assert payload[-1] == 0x01
+
+
+def test_command_is_submitted(server):
+    server._handle(pack_command(1, 0.5, -0.1, (0.1, 0.2, 0.3, 0.4)))
+    cmd = server.controller.commands.submitted[-1]
+    assert cmd["vel"] == pytest.approx(0.5) and cmd["off"] == pytest.approx(-0.1)
+    assert cmd["legs"] == pytest.approx((0.1, 0.2, 0.3, 0.4))
+    # 不给出高度时保持不变
+    server._handle(pack_command(2, 0.0, 0.0))
+    assert "legs" not in server.controller.commands.submitted[-1]
+    assert server.received == 2 and server.rejected == 0
+
+
+def test_values_are_clamped(server):
+    server._handle(pack_command(1, 99.0, -99.0, (-1.0, 5.0, 0.5, 0.5)))
+    cmd = server.controller.commands.submitted[-1]
+    assert cmd["vel"] == SPEED_LIMIT and cmd["off"] == -TURN_LIMIT
+    assert cmd["legs"][:2] == HEIGHT_RANGE
+
+
+@pytest.mark.parametrize("payload", [
+    b"short",
+    b"XXXX" + pack_command(1, 0.0, 0.0)[4:],
+    pack_command(1, math.nan, 0.0),
+    pack_command(1, 0.0, math.inf),
+    pack_command(1, 0.0, 0.0, (0.1, math.nan, 0.1, 0.1)),
+])
+def test_malformed_packets_are_rejected(server, payload):
+    server._handle(payload)
+    assert server.rejected == 1
+    assert server.controller.commands.submitted == []
+
+
+def test_sequence_order_and_wraparound(server):
+    server._handle(pack_command(0xFFFFFFFE, 0.1, 0.0))
+    server._handle(pack_command(0xFFFFFFFD, 0.2, 0.0))   # 乱序
+    server._handle(pack_command(0xFFFFFFFE, 0.3, 0.0))   # 重复
+    server._handle(pack_command(1, 0.4, 0.0))            # 回绕后更新
+    vels = [c["vel"] for c in server.controller.commands.submitted]
+    assert vels == pytest.approx([0.1, 0.4])
+    assert server.rejected == 2
+
+
+def test_estop_calls_hook():
+    stops = []
+    server = TeleopServer(_Controller(), on_estop=lambda: stops.append(1))
+    server._handle(pack_command(1, 0.5, 0.0, estop=True))
+    assert stops == [1]
+    assert server.controller.commands.submitted == []
+
+
+def test_stale_commands_zero_wheels(server):
+    server._handle(pack_command(1, 0.5, 0.1))
+    server.last_rx = time.monotonic() - 2 * server.stale_timeout
+    server._check_stale()
+    server._check_stale()                                  # 只清零一次
+    assert server.controller.commands.submitted[1:] == [{"vel": 0.0, "off": 0.0}]
+
+
+def test_udp_round_trip():
+    server = TeleopServer(_Controller(), address=("127.0.0.1", 0))
+    server.start()
+    try:
+        addr = server._sock.getsockname()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(pack_command(1, 0.25, 0.0), addr)
+        deadline = time.monotonic() + 2.0
+        while not server.controller.commands.submitted and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert server.controller.commands.submitted[0]["vel"] == pytest.approx(0.25)
+    finally:
+        server.stop()
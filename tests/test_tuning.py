@@ -0,0 +1,26 @@
+import inspect
+
+import pytest
+
+import tuning
+from balance import BalanceController
+
+
+def test_default_params_match_controller():
+    defaults = {name: p.default for name, p in inspect.signature(BalanceController).parameters.items()
+                if name in tuning.PARAM_NAMES}
+    assert defaults == tuning.DEFAULT_PARAMS
+
+
+def test_batch_rule_matches_controller():
+    candidates = [dict(tuning.DEFAULT_PARAMS)] + tuning.random_search(samples=7, seed=1)
+    tuning.check_batch_rule(candidates, steps=1000, seed=1)
+
+
+def test_batch_rule_detects_divergence(monkeypatch):
+    update = tuning.BatchBalance.update
+    monkeypatch.setattr(tuning.BatchBalance, "update",
+                        lambda self, pitch, roll: update(self, pitch, roll) * 1.5)
+    with pytest.raises(RuntimeError):
+        tuning.check_batch_rule([dict(tuning.DEFAULT_PARAMS)], steps=200)
+
@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+
+# -------------------------------------------------
+# 机器人拓扑：电机、总线、类型、安装方向与分组
+#
+#   buses   {总线名: 串口路径}
+#   motors  {电机名: {"type": DM_Motor_Type 名称, "slave": SlaveID, "master": MasterID,
+#                     "group": 分组名, "dir": 安装方向 ±1, "turn": 差速系数（轮子，可省略）,
+#                     "bus": 总线名（可省略，默认第一个总线）}}
+#
+# 电机名同时作为 LegsController 的属性名（motor1、wheel1 ...），分组内的顺序即字典中的顺序。
+# 轮速指令为 dir * (vel + turn * of_vel)，腿部位置指令为 dir * pos。
+# -------------------------------------------------
+DEFAULT_TOPOLOGY = {
+    "buses": {"main": "/dev/dm-u2can"},
+    "motors": {
+        # 四条腿电机（DM4340）
+        "motor1": {"type": "DM4340", "slave": 0x01, "master": 0x11, "group": "legs", "dir": -1},
+        "motor2": {"type": "DM4340", "slave": 0x02, "master": 0x12, "group": "legs", "dir": 1},
+        "motor3": {"type": "DM4340", "slave": 0x03, "master": 0x13, "group": "legs", "dir": 1},
+        "motor4": {"type": "DM4340", "slave": 0x04, "master": 0x14, "group": "legs", "dir": -1},
+        # 四个轮子电机（DMH6215）
+        "wheel1": {"type": "DMH6215", "slave": 0x05, "master": 0x15, "group": "wheels", "dir": -1, "turn": 1},
+        "wheel2": {"type": "DMH6215", "slave": 0x06, "master": 0x16, "group": "wheels", "dir": 1, "turn": -1},
+        "wheel3": {"type": "DMH6215", "slave": 0x07, "master": 0x17, "group": "wheels", "dir": -1, "turn": -1},
+        "wheel4": {"type": "DMH6215", "slave": 0x08, "master": 0x18, "group": "wheels", "dir": 1, "turn": 1},
+    },
+}
+
+
+class GroupPlan:
+    """一个分组在某个总线上的部分：电机列表与其在分组中的下标。"""
+
+    def __init__(self, motors, index):
+        self.motors = motors
+        self.index = np.asarray(index, dtype=np.intp)
+
+
+class Group:
+    """
+    编译后的电机分组：电机元组、方向 / 差速系数数组，以及按总线拆分的 GroupPlan。
+    分组指令先在整组数组上计算，再按 plans 切片交给各总线的批量接口。
+    """
+
+    def __init__(self, name, motors, dirs, turns, buses):
+        self.name = name
+        self.motors = tuple(motors)
+        self.dirs = np.asarray(dirs, dtype=np.float64)
+        self.turns = np.asarray(turns, dtype=np.float64)
+        plans = {}
+        for i, bus in enumerate(buses):
+            plans.setdefault(bus, ([], []))
+            plans[bus][0].append(self.motors[i])
+            plans[bus][1].append(i)
+        self.plans = {bus: GroupPlan(m, idx) for bus, (m, idx) in plans.items()}
+
+    def __len__(self):
+        return len(self.motors)
+
+
+def load_topology(source=None):
+    """
+    读取拓扑描述。
+    :param source: None（默认拓扑）、dict，或 JSON 文件路径
+    :return: 拓扑字典
+    """
+    if source is None:
+        return DEFAULT_TOPOLOGY
+    if isinstance(source, dict):
+        return source
+    with open(source, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def validate_topology(topo):
+    """检查拓扑描述的完整性，出错时抛出 ValueError。"""
+    buses = topo.get("buses") or {}
+    motors = topo.get("motors") or {}
+    if not motors:
+        raise ValueError("拓扑中没有定义电机")
+    seen = {}
+    for name, spec in motors.items():
+        for key in ("type", "slave", "master", "group"):
+            if key not in spec:
+                raise ValueError(f"电机 {name} 缺少字段 {key}")
+        bus = spec.get("bus")
+        if bus is not None and buses and bus not in buses:
+            raise ValueError(f"电机 {name} 所在总线 {bus} 未定义")
+        key = (bus, spec["slave"])
+        if key in seen:
+            raise ValueError(f"电机 {name} 与 {seen[key]} 的 SlaveID 重复")
+        seen[key] = name
@@ -0,0 +1,245 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulator import PlatformSim
+
+# -------------------------------------------------
+# 平衡控制器参数离线整定
+#
+# 候选参数（BalanceController 的 pitch_gain / roll_gain / pitch_deadband / roll_deadband /
+# max_offset）按块分给进程池；每个工作进程把“候选 × 场景”展开为一个 PlatformSim 中的
+# 多台机器人，用 BatchBalance（与 BalanceController._update_offsets 相同的规则，按数组计算）
+# 一次推进全部机器人，再按调节时间、超调与执行器动作量打分；整定前用 check_batch_rule
+# 确认 BatchBalance 与控制器的规则仍然一致。
+# 场景 = 随机地面坡度（由 seed 决定，所有候选共用），可叠加回放的 IMU 姿态变化作为扰动。
+# -------------------------------------------------
+
+PARAM_NAMES = ("pitch_gain", "roll_gain", "pitch_deadband", "roll_deadband", "max_offset")
+DEFAULT_PARAMS = {"pitch_gain": 0.0002, "roll_gain": 0.0001,
+                  "pitch_deadband": 2.0, "roll_deadband": 2.0, "max_offset": 0.5}
+
+# 默认搜索空间：{参数名: (下限, 上限)}，增益按对数均匀采样
+DEFAULT_SPACE = {"pitch_gain": (2e-5, 2e-3), "roll_gain": (1e-5, 1e-3),
+                 "pitch_deadband": (0.5, 4.0), "roll_deadband": (0.5, 4.0)}
+LOG_SCALE = ("pitch_gain", "roll_gain")
+
+
+class BatchBalance:
+    """n 台机器人的 _update_offsets，参数与偏置均为数组（规则与 BalanceController 完全相同）。"""
+
+    def __init__(self, params):
+        """:param params: {参数名: (n,) 数组}"""
+        self.pg = np.asarray(params["pitch_gain"], np.float64)
+        self.rg = np.asarray(params["roll_gain"], np.float64)
+        self.pdb = np.asarray(params["pitch_deadband"], np.float64)
+        self.rdb = np.asarray(params["roll_deadband"], np.float64)
+        self.max_offset = np.asarray(params["max_offset"], np.float64)
+        self.offs = np.zeros((len(self.pg), 4))
+
+    def update(self, pitch, roll):
+        offs = self.offs
+        # 与标量版本相同的累加顺序（未触发的分支加 0，不影响结果）
+        a = np.where(pitch > self.pdb, self.pg * pitch, 0.0)[:, None]
+        b = np.where(pitch < -self.pdb, self.pg * -pitch, 0.0)[:, None]
+        c = np.where(roll < -self.rdb, self.rg * -roll, 0.0)[:, None]
+        d = np.where(roll > self.rdb, self.rg * roll, 0.0)[:, None]
+        offs[:, 0:2] += a
+        offs[:, 2:4] += b
+        offs[:, 0::3] += c
+        offs[:, 1:3] += d
+        offs -= offs.min(axis=1, keepdims=True)
+        np.clip(offs, 0.0, self.max_offset[:, None], out=offs)
+        return offs
+
+
+def check_batch_rule(candidates, steps=500, seed=0, atol=1e-12):
+    """
+    用随机姿态序列同时推进 BatchBalance 与 BalanceController._update_offsets，
+    确认两者输出一致；控制器的规则改动后整定结果不再适用，此时抛出 RuntimeError。
+    :param candidates: 候选参数字典列表（取前几个即可）
+    """
+    from balance import BalanceController, DummyImu, DummyLegs
+
+    rng = np.random.default_rng(seed)
+    att = rng.normal(0.0, 6.0, (steps, 2))
+    batch = BatchBalance({name: [c[name] for c in candidates] for name in PARAM_NAMES})
+    scalars = [BalanceController(legs=DummyLegs(), imu=DummyImu(), **c) for c in candidates]
+    n = len(candidates)
+    for pitch, roll in att:
+        offs = batch.update(np.full(n, pitch), np.full(n, roll))
+        for i, ctrl in enumerate(scalars):
+            ref = ctrl._update_offsets({"pitch": pitch, "roll": roll})
+            if not np.allclose(offs[i], ref, rtol=0.0, atol=atol):
+                raise RuntimeError(f"BatchBalance 与 BalanceController._update_offsets 不一致："
+                                   f"参数 {candidates[i]}，{offs[i].tolist()} != {list(ref)}")
+
+
+# -------------------------------------------------
+# 候选参数生成
+# -------------------------------------------------
+def grid(space):
+    """
+    网格搜索：space 为 {参数名: 取值序列}，未列出的参数取 DEFAULT_PARAMS。
+    :return: 候选参数字典列表
+    """
+    names = list(space)
+    return [dict(DEFAULT_PARAMS, **dict(zip(names, values)))
+            for values in itertools.product(*(space[n] for n in names))]
+
+
+def random_search(space=None, samples=1000, seed=0):
+    """随机搜索：space 为 {参数名: (下限, 上限)}，LOG_SCALE 中的参数按对数均匀采样。"""
+    space = space or DEFAULT_SPACE
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (lo, hi) in space.items():
+        if name in LOG_SCALE:
+            columns[name] = np.exp(rng.uniform(np.log(lo), np.log(hi), samples))
+        else:
+            columns[name] = rng.uniform(lo, hi, samples)
+    return [dict(DEFAULT_PARAMS, **{n: float(columns[n][i]) for n in columns}) for i in range(samples)]
+
+
+def make_scenarios(count, slope_std=3.0, seed=0):
+    """生成 count 个场景的地面坡度 (count, 2)（pitch, roll，度）。"""
+    return np.random.default_rng(seed).normal(0.0, slope_std, (count, 2))
+
+
+def load_imu_trace(path):
+    """读取 IMU 记录（imu_data.csv 格式），返回相对第一帧的 (pitch, roll) 变化量 (T, 2)。"""
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    trace = np.array([[float(r["pitch"]), float(r["roll"])] for r in rows])
+    return trace - trace[0]
+
+
+# -------------------------------------------------
+# 评估
+# -------------------------------------------------
+def evaluate(candidates, scenarios, duration=5.0, control_dt=0.002, leg_base=0.85, leg_vel=1.0,
+             band=2.5, noise_std=0.0, latency=0.0, trace=None, trace_dt=0.001, seed=0, sim_dt=0.001):
+    """
+    在仿真中评估一组候选参数（每个候选 × 每个场景一台机器人，一次向量化推进）。
+    :param candidates: 候选参数字典列表
+    :param scenarios: (m, 2) 地面坡度
+    :param band: 认为已稳定的姿态范围（度）
+    :param trace: 可选，(T, 2) 回放的姿态变化量，按 trace_dt 逐点叠加到地面坡度上（循环播放）
+    :return: 每个候选的指标字典列表（各场景取平均）
+    """
+    k, m = len(candidates), len(scenarios)
+    params = {name: np.repeat([c[name] for c in candidates], m) for name in PARAM_NAMES}
+    base_slope = np.tile(scenarios, (k, 1))
+    sim = PlatformSim(k * m, dt=sim_dt, seed=seed, slope=base_slope, noise_std=noise_std,
+                      latency=latency, leg_height=leg_base)
+    sim.enabled[:] = True
+    ctrl = BatchBalance(params)
+    sub = max(1, int(round(control_dt / sim_dt)))
+    steps = int(round(duration / (sub * sim_dt)))
+
+    err0 = np.stack([sim.pitch, sim.roll])             # 初始姿态误差 (2, n)
+    sign0 = np.sign(err0)
+    overshoot = np.zeros_like(err0)
+    last_out = np.zeros_like(err0)                     # 最后一次超出 band 的时刻
+    effort = np.zeros(k * m)
+    prev_legs = sim.legs.copy()
+    for step in range(steps):
+        if trace is not None:
+            sim.slope[:] = base_slope + trace[int(sim.t / trace_dt) % len(trace)]
+        offs = ctrl.update(sim.meas_pitch, sim.meas_roll)
+        sim.set_legs(slice(None), leg_base - offs, leg_vel)
+        sim.step(sub)
+        att = np.stack([sim.pitch, sim.roll])
+        np.maximum(overshoot, -sign0 * att, out=overshoot)
+        last_out[np.abs(att) > band] = sim.t
+        effort += np.abs(sim.legs - prev_legs).sum(axis=1)
+        prev_legs[:] = sim.legs
+
+    settle = last_out.max(axis=0).reshape(k, m)
+    overshoot = overshoot.max(axis=0).reshape(k, m)
+    effort = (effort / duration).reshape(k, m)
+    final = np.abs(np.stack([sim.pitch, sim.roll])).max(axis=0).reshape(k, m)
+    return [{"settling_time": float(settle[i].mean()), "settled": float((settle[i] < duration - control_dt).mean()),
+             "overshoot": float(overshoot[i].mean()), "effort": float(effort[i].mean()),
+             "final_error": float(final[i].mean())} for i in range(k)]
+
+
+def score(metrics, w_settle=1.0, w_overshoot=0.2, w_effort=0.5):
+    """综合得分（越小越好）：调节时间（秒）+ 超调（度）+ 动作量（腿部行程 / 秒）的加权和。"""
+    return (w_settle * metrics["settling_time"] + w_overshoot * metrics["overshoot"]
+            + w_effort * metrics["effort"])
+
+
+def _evaluate_chunk(args):
+    candidates, scenarios, kwargs = args
+    return evaluate(candidates, scenarios, **kwargs)
+
+
+def tune(candidates, scenarios, workers=None, chunk=64, weights=None, **kwargs):
+    """
+    用进程池并行评估所有候选参数，按得分升序返回。
+    :param workers: 进程数，默认 CPU 核数
+    :param chunk: 每个任务评估的候选数（同一任务内向量化推进）
+    :param weights: 可选，传给 score 的权重字典
+    :param kwargs: 传给 evaluate 的仿真参数
+    :return: [{"params": {...}, "score": float, 指标...}, ...]
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [candidates[i:i + chunk] for i in range(0, len(candidates), chunk)]
+    tasks = [(c, scenarios, kwargs) for c in chunks]
+    if workers == 1:
+        results = [_evaluate_chunk(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_evaluate_chunk, tasks))
+    ranked = []
+    for cands, metrics in zip(chunks, results):
+        for params, m in zip(cands, metrics):
+            ranked.append(dict(m, params=params, score=score(m, **(weights or {}))))
+    ranked.sort(key=lambda r: r["score"])
+    return ranked
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="平衡控制器参数整定（仿真 + 进程池）")
+    parser.add_argument("--samples", type=int, default=2000, help="随机搜索的候选数")
+    parser.add_argument("--scenarios", type=int, default=8, help="每个候选评估的坡度场景数")
+    parser.add_argument("--seconds", type=float, default=5.0, help="每个场景的仿真时长（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slope", type=float, default=3.0, help="场景坡度标准差（度）")
+    parser.add_argument("--noise", type=float, default=0.0, help="IMU 噪声标准差（度）")
+    parser.add_argument("--latency", type=float, default=0.0, help="执行器延迟（秒）")
+    parser.add_argument("--trace", help="回放的 IMU 记录（imu_data.csv 格式），叠加为坡度扰动")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--chunk", type=int, default=64)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    candidates = [dict(DEFAULT_PARAMS)] + random_search(samples=args.samples, seed=args.seed)
+    check_batch_rule(candidates[:8], seed=args.seed)
+    scenarios = make_scenarios(args.scenarios, args.slope, args.seed)
+    trace = load_imu_trace(args.trace) if args.trace else None
+    start = time.perf_counter()
+    ranked = tune(candidates, scenarios, workers=args.workers, chunk=args.chunk,
+                  duration=args.seconds, noise_std=args.noise, latency=args.latency,
+                  trace=trace, seed=args.seed)
+    wall = time.perf_counter() - start
+    print(f"{len(candidates)} 个候选 × {args.scenarios} 个场景，耗时 {wall:.1f}s")
+    print(f"{'排名':>4s} {'得分':>7s} {'调节(s)':>8s} {'稳定率':>6s} {'超调(°)':>7s} {'动作量':>7s}  参数")
+    default_rank = next(i for i, r in enumerate(ranked) if r["params"] == DEFAULT_PARAMS)
+    for i, r in enumerate(ranked[:args.top]):
+        p = r["params"]
+        print(f"{i + 1:4d} {r['score']:7.3f} {r['settling_time']:8.3f} {r['settled']:6.0%} "
+              f"{r['overshoot']:7.2f} {r['effort']:7.3f}  "
+              + " ".join(f"{n}={p[n]:.4g}" for n in PARAM_NAMES))
+    r = ranked[default_rank]
+    print(f"当前默认参数排名 {default_rank + 1}，得分 {r['score']:.3f}，调节 {r['settling_time']:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,8 @@
-from time import sleep
+import json
+import os
+import threading
+from collections import deque
+from time import sleep, monotonic
 import numpy as np
 from enum import IntEnum
 from struct import unpack
@@ -6,29 +10,148 @@ from struct import pack
 
 
 class Motor:
-    def __init__(self, MotorType, SlaveID, MasterID):
+    def __init__(self, MotorType, SlaveID, MasterID, history_len=256, filter_tau=0.01):
         """
         define Motor object 定义电机对象
         :param MotorType: Motor type 电机类型
         :param SlaveID: CANID 电机ID
         :param MasterID: MasterID 主机ID 建议不要设为0
+        :param history_len: feedback history length 反馈历史长度（环形缓冲区）
+        :param filter_tau: low-pass time constant of the estimates 速度/加速度/力矩趋势估计的低通时间常数 单位秒
         """
         self.Pd = float(0)
         self.Vd = float(0)
         self.state_q = float(0)
         self.state_dq = float(0)
         self.state_tau = float(0)
+        self.last_update = float(0)  # 最近一次收到反馈的 monotonic 时间，0 表示从未收到
         self.SlaveID = SlaveID
         self.MasterID = MasterID
         self.MotorType = MotorType
         self.isEnable = False
         self.NowControlMode = Control_Type.MIT
         self.temp_param_dict = {}
+        # 反馈历史：每行 (t, q, dq, tau)，_count 为累计收到的反馈数
+        self.history = np.zeros((history_len, 4))
+        self._count = 0
+        # 在线估计（每次收到反馈时增量更新）
+        self.filter_tau = filter_tau
+        self.vel_filtered = float(0)
+        self.acceleration = float(0)
+        self.torque_trend = float(0)
+        # 健康状态：反馈帧 D[0] 高 4 位（DM_Motor_State）与 D[6] / D[7] 的 MOS / 线圈温度
+        self.state = None  # None 表示从未收到反馈
+        self.temp_mos = float(0)
+        self.temp_rotor = float(0)
+        self.fault_frames = 0  # 累计收到的故障状态帧数
 
     def recv_data(self, q: float, dq: float, tau: float):
+        q, dq, tau = float(q), float(dq), float(tau)
+        now = monotonic()
+        dt = now - self.last_update
+        if self.last_update == 0 or dt <= 0:
+            self.vel_filtered = float(dq)
+        else:
+            # 一阶低通：速度取电机上报的 dq 滤波；加速度 / 力矩趋势为相邻两帧差分后滤波
+            alpha = dt / (self.filter_tau + dt)
+            vel = self.vel_filtered + alpha * (dq - self.vel_filtered)
+            self.acceleration += alpha * ((vel - self.vel_filtered) / dt - self.acceleration)
+            self.torque_trend += alpha * ((tau - self.state_tau) / dt - self.torque_trend)
+            self.vel_filtered = vel
         self.state_q = q
         self.state_dq = dq
         self.state_tau = tau
+        self.last_update = now
+        self.history[self._count % len(self.history)] = (now, q, dq, tau)
+        self._count += 1
+
+    def recv_health(self, state, temp_mos, temp_rotor):
+        """
+        update the state nibble and temperatures from a feedback frame 更新反馈帧中的状态与温度
+        """
+        self.state = state
+        self.isEnable = state == DM_Motor_State.ENABLED
+        if state >= DM_Motor_State.OVER_VOLTAGE:
+            self.fault_frames += 1
+        self.temp_mos = float(temp_mos)
+        self.temp_rotor = float(temp_rotor)
+
+    def getState(self):
+        """
+        get the state reported in the latest feedback 获取最近一次反馈中的电机状态
+        :return: DM_Motor_State, None if never received 从未收到时为 None
+        """
+        return self.state
+
+    def getFault(self):
+        """
+        get the active fault 获取当前故障
+        :return: DM_Motor_State fault code, None if no fault 无故障时为 None
+        """
+        if self.state is not None and self.state >= DM_Motor_State.OVER_VOLTAGE:
+            return self.state
+        return None
+
+    def getMosTemperature(self):
+        """
+        get the MOS temperature 获取驱动 MOS 温度 ℃
+        """
+        return self.temp_mos
+
+    def getRotorTemperature(self):
+        """
+        get the rotor (coil) temperature 获取电机线圈温度 ℃
+        """
+        return self.temp_rotor
+
+    def getHealth(self):
+        """
+        get a health snapshot 获取健康状态快照
+        :return: dict of state, enabled, fault, temp_mos, temp_rotor, fault_frames
+        """
+        fault = self.getFault()
+        return {"state": None if self.state is None else int(self.state), "enabled": self.isEnable,
+                "fault": None if fault is None else state_name(fault),
+                "temp_mos": self.temp_mos, "temp_rotor": self.temp_rotor,
+                "fault_frames": self.fault_frames}
+
+    def getAge(self):
+        """
+        get the age of the latest feedback 获取最近一次反馈距今的时间
+        :return: seconds since last feedback, inf if never received 秒，从未收到时为 inf
+        """
+        if self.last_update == 0:
+            return float("inf")
+        return monotonic() - self.last_update
+
+    def getHistory(self, n=None):
+        """
+        get the recent feedback history 获取最近的反馈历史
+        :param n: number of latest samples, default all available 最近 n 条，默认全部
+        :return: array of shape (k, 4), columns t, q, dq, tau, oldest first 按时间先后排列
+        """
+        size = len(self.history)
+        k = min(self._count, size if n is None else min(n, size))
+        idx = np.arange(self._count - k, self._count) % size
+        return self.history[idx]
+
+    def getFilteredVelocity(self):
+        """
+        get the low-pass filtered velocity 获取低通滤波后的速度
+        """
+        return self.vel_filtered
+
+    def getAcceleration(self):
+        """
+        get the estimated acceleration 获取估计的加速度 rad/s^2
+        """
+        return self.acceleration
+
+    def getTorqueTrend(self):
+        """
+        get the estimated torque rate 获取力矩变化趋势 N·m/s
+        """
+        return self.torque_trend
 
     def getPosition(self):
         """
@@ -63,6 +186,237 @@ class Motor:
             return None
 
 
+class BusScheduler:
+    """
+    U2CAN serial link budget and priority scheduler 串口链路带宽预算与优先级调度
+    以令牌桶估算发送方向的链路占用（每帧 30 字节，8N1 下 921600 baud 约 92 kB/s）：
+      * PRIO_SAFETY  使能/失能/设零点，总是立即发送
+      * PRIO_CONTROL 控制指令与参数写入，总是立即发送（预算为负时表示 OS 缓冲区中已有积压）
+      * PRIO_STATUS  状态查询与参数读取，预算不足一半时进入延迟队列，
+                     预算恢复后按先后顺序补发；排队超过 max_defer_s 或队列已满时丢弃
+    同时统计收发两个方向的字节/帧速率，stats() 返回最近一个统计窗口的结果
+    """
+    PRIO_SAFETY = 0
+    PRIO_CONTROL = 1
+    PRIO_STATUS = 2
+    TX_FRAME_BYTES = 30
+    RX_FRAME_BYTES = 16
+
+    def __init__(self, baudrate=921600, max_utilization=0.9, burst_s=0.005,
+                 max_deferred=32, max_defer_s=0.1, window_s=1.0, enforce=True):
+        """
+        :param baudrate: serial baudrate 串口波特率
+        :param max_utilization: usable fraction of the link 可使用的链路比例
+        :param burst_s: token bucket depth in seconds 令牌桶深度 单位秒
+        :param max_deferred: max queued low-priority frames 延迟队列长度
+        :param max_defer_s: max queueing time before drop 延迟帧最长等待时间 单位秒
+        :param window_s: statistics window 统计窗口 单位秒
+        :param enforce: False = only count, never defer 只统计不调度
+        """
+        self.bytes_per_s = baudrate / 10 * max_utilization
+        self.capacity = self.bytes_per_s * burst_s
+        self.reserve = self.capacity * 0.5
+        self.tokens = self.capacity
+        self.max_deferred = max_deferred
+        self.max_defer_s = max_defer_s
+        self.window_s = window_s
+        self.enforce = enforce
+        self.link_bytes_per_s = baudrate / 10
+        self._last = monotonic()
+        self._deferred = deque()
+        self.totals = {"tx_frames": 0, "tx_bytes": 0, "rx_frames": 0, "rx_bytes": 0,
+                       "deferred": 0, "dropped": 0,
+                       "safety": 0, "control": 0, "status": 0}
+        self._window_start = self._last
+        self._window_totals = dict(self.totals)
+        self._stats = {}
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.bytes_per_s)
+        self._last = now
+        if now - self._window_start >= self.window_s:
+            self._roll_window(now)
+
+    def _roll_window(self, now):
+        dt = now - self._window_start
+        prev = self._window_totals
+        tot = self.totals
+        tx_bps = (tot["tx_bytes"] - prev["tx_bytes"]) / dt
+        rx_bps = (tot["rx_bytes"] - prev["rx_bytes"]) / dt
+        self._stats = {
+            "tx_bytes_per_s": tx_bps,
+            "rx_bytes_per_s": rx_bps,
+            "tx_frames_per_s": (tot["tx_frames"] - prev["tx_frames"]) / dt,
+            "rx_frames_per_s": (tot["rx_frames"] - prev["rx_frames"]) / dt,
+            "tx_utilization": tx_bps / self.link_bytes_per_s,
+            "rx_utilization": rx_bps / self.link_bytes_per_s,
+            "deferred_per_s": (tot["deferred"] - prev["deferred"]) / dt,
+            "dropped_per_s": (tot["dropped"] - prev["dropped"]) / dt,
+        }
+        self._window_start = now
+        self._window_totals = dict(tot)
+
+    def _consume(self, priority):
+        # 积压估算上限 1 秒：串口写满 OS 缓冲区后会阻塞，实际积压不会无限增长
+        self.tokens = max(self.tokens - self.TX_FRAME_BYTES, -self.bytes_per_s)
+        self.totals["tx_frames"] += 1
+        self.totals["tx_bytes"] += self.TX_FRAME_BYTES
+        self.totals[("safety", "control", "status")[priority]] += 1
+
+    def admit(self, priority):
+        """
+        decide whether a frame may be sent now 判断一帧是否可以立即发送
+        :return: True = send (budget consumed) 发送并扣除预算；False = caller should defer 应进入延迟队列
+        """
+        self._refill(monotonic())
+        if (self.enforce and priority >= self.PRIO_STATUS
+                and (self._deferred or self.tokens < self.reserve)):
+            return False
+        self._consume(priority)
+        return True
+
+    def defer(self, motor_id, data):
+        """queue a low-priority frame 低优先级帧进入延迟队列（相同帧只保留一份）"""
+        frame = bytes(data)
+        for _, queued_id, queued in self._deferred:
+            if queued_id == motor_id and queued == frame:
+                return
+        if len(self._deferred) >= self.max_deferred:
+            self._deferred.popleft()
+            self.totals["dropped"] += 1
+        self._deferred.append((monotonic(), motor_id, frame))
+        self.totals["deferred"] += 1
+
+    def pop_deferred(self):
+        """
+        next deferred frame if the budget allows 预算允许时取出下一条延迟帧
+        :return: (motor_id, data) or None
+        """
+        if not self._deferred:
+            return None
+        now = monotonic()
+        self._refill(now)
+        while self._deferred and now - self._deferred[0][0] > self.max_defer_s:
+            self._deferred.popleft()
+            self.totals["dropped"] += 1
+        if not self._deferred or self.tokens < self.reserve:
+            return None
+        _, motor_id, frame = self._deferred.popleft()
+        self._consume(self.PRIO_STATUS)
+        return motor_id, frame
+
+    def on_rx(self, nbytes, nframes):
+        """account received bytes / frames 统计接收方向"""
+        self.totals["rx_bytes"] += nbytes
+        self.totals["rx_frames"] += nframes
+
+    def backlog(self):
+        """
+        estimated send backlog in seconds 估算的发送积压 单位秒
+        预算为负说明发送速度已超过链路能力，数据在 OS 缓冲区中排队
+        """
+        # 只读计算，不修改令牌桶状态（可在监控线程中调用）
+        tokens = self.tokens + (monotonic() - self._last) * self.bytes_per_s
+        return max(0.0, -tokens) / self.bytes_per_s
+
+    def stats(self):
+        """
+        utilization counters for monitoring 链路利用率统计
+        :return: dict，最近一个统计窗口的速率/利用率 + 累计计数 + 当前积压与队列长度
+        """
+        result = dict(self._stats)
+        result.update(self.totals)
+        result["backlog_s"] = self.backlog()
+        result["queued"] = len(self._deferred)
+        return result
+
+
+class HealthMonitor:
+    """
+    motor health monitor 电机健康监测：温度阈值、故障 / 过温回调与汇总计数
+
+    MotorControl 每解码一帧反馈调用一次 update()；回调只在状态变化时触发
+    （进入 / 解除故障、超过 / 回落到阈值以下），签名 callback(motor, event, value)：
+      "fault"          value 为故障码（DM_Motor_State 的取值，state_name() 可转为名称）
+      "fault_cleared"  value 为新的状态
+      "mos_overtemp" / "rotor_overtemp"   value 为温度 ℃
+      "mos_temp_ok" / "rotor_temp_ok"     温度回落到 阈值 - hysteresis 以下
+    """
+
+    def __init__(self, mos_temp_limit=80.0, rotor_temp_limit=80.0, hysteresis=5.0):
+        self.mos_temp_limit = mos_temp_limit
+        self.rotor_temp_limit = rotor_temp_limit
+        self.hysteresis = hysteresis
+        self.callbacks = []
+        self.frames = 0          # 解码的反馈帧数
+        self.fault_frames = 0    # 其中处于故障状态的帧数
+        self.fault_counts = {}   # {故障码: 帧数}
+        self.events = {}         # {事件名: 次数}
+        self.max_temp_mos = float(0)
+        self.max_temp_rotor = float(0)
+        self._alarms = {}        # {(motor, 类别): 是否处于报警}
+
+    def add_callback(self, fn):
+        """
+        register callback(motor, event, value) 注册健康事件回调（在接收线程中调用，应尽快返回）
+        """
+        self.callbacks.append(fn)
+
+    def update(self, motor):
+        self.frames += 1
+        fault = motor.getFault()
+        if fault is not None:
+            self.fault_frames += 1
+            self.fault_counts[fault] = self.fault_counts.get(fault, 0) + 1
+        if motor.temp_mos > self.max_temp_mos:
+            self.max_temp_mos = motor.temp_mos
+        if motor.temp_rotor > self.max_temp_rotor:
+            self.max_temp_rotor = motor.temp_rotor
+        self.__edge(motor, "fault", fault is not None, fault is None,
+                    "fault", "fault_cleared", motor.state)
+        self.__edge(motor, "mos", motor.temp_mos >= self.mos_temp_limit,
+                    motor.temp_mos < self.mos_temp_limit - self.hysteresis,
+                    "mos_overtemp", "mos_temp_ok", motor.temp_mos)
+        self.__edge(motor, "rotor", motor.temp_rotor >= self.rotor_temp_limit,
+                    motor.temp_rotor < self.rotor_temp_limit - self.hysteresis,
+                    "rotor_overtemp", "rotor_temp_ok", motor.temp_rotor)
+
+    def __edge(self, motor, kind, raise_, clear, on_event, off_event, value):
+        key = (motor, kind)
+        active = self._alarms.get(key, False)
+        if not active and raise_:
+            self._alarms[key] = True
+            self.__emit(motor, on_event, value)
+        elif active and clear:
+            self._alarms[key] = False
+            self.__emit(motor, off_event, value)
+
+    def __emit(self, motor, event, value):
+        self.events[event] = self.events.get(event, 0) + 1
+        for fn in self.callbacks:
+            try:
+                fn(motor, event, value)
+            except Exception as e:
+                print(f"health callback error: {e}")
+
+    def active_alarms(self):
+        """
+        motors currently in alarm 当前处于报警的电机
+        :return: list of (SlaveID, kind) 类别为 fault / mos / rotor
+        """
+        return [(motor.SlaveID, kind) for (motor, kind), active in list(self._alarms.items()) if active]
+
+    def stats(self):
+        """
+        aggregated counters 汇总计数（只读）
+        """
+        return {"frames": self.frames, "fault_frames": self.fault_frames,
+                "faults": {state_name(code): n for code, n in list(self.fault_counts.items())},
+                "events": dict(self.events),
+                "max_temp_mos": self.max_temp_mos, "max_temp_rotor": self.max_temp_rotor,
+                "alarms": self.active_alarms()}
+
+
 class MotorControl:
     send_data_frame = np.array(
         [0x55, 0xAA, 0x1e, 0x03, 0x01, 0x00, 0x00, 0x00, 0x0a, 0x00, 0x00, 0x00, 0x00, 0, 0, 0, 0, 0x00, 0x08, 0x00,
@@ -74,18 +428,34 @@ class MotorControl:
                    # H3510            DMG6215      DMH6220
                    [12.5 , 280 , 1],[12.5 , 45 , 10],[12.5 , 45 , 10]]
 
-    def __init__(self, serial_device):
+    def __init__(self, serial_device, capture=None, scheduler=None, param_cache=None, health=None):
         """
         define MotorControl object 定义电机控制对象
         :param serial_device: serial object 串口对象
+        :param capture: optional frame tap with tx(can_id, data) / rx(cmd, can_id, data) /
+                        resync(skipped), e.g. can_capture.CanCapture.tap() 可选的收发帧抓包入口
+        :param scheduler: BusScheduler, default one sized from the serial baudrate 链路预算与优先级调度
+        :param param_cache: optional MotorParamCache used by load_motor_params 电机参数持久化缓存
+        :param health: HealthMonitor, default one with 80 ℃ limits 电机健康监测（状态 / 温度）
         """
         self.serial_ = serial_device
+        self.capture = capture
+        if scheduler is None:
+            scheduler = BusScheduler(getattr(serial_device, "baudrate", 921600))
+        self.scheduler = scheduler
+        self.param_cache = param_cache
+        self.health = health if health is not None else HealthMonitor()
         self.motors_map = dict()
+        self._batch_plans = {}  # 批量控制接口的帧模板 / 限幅参数缓存
+        # 每个实例使用自己的发送缓冲与限幅参数表，多个总线的 MotorControl 在各自线程中
+        # 发送、修改 PMAX/VMAX/TMAX 时互不干扰（类属性只作为默认值）
+        self.send_data_frame = self.send_data_frame.copy()
+        self.Limit_Param = [list(limits) for limits in MotorControl.Limit_Param]
         self.data_save = bytes()  # save data
-        if self.serial_.is_open:  # open the serial port
-            print("Serial port is open")
-            serial_device.close()
-        self.serial_.open()
+        if self.serial_.is_open:  # 已打开则只清空残留数据，不再关闭重开
+            self.serial_.reset_input_buffer()
+        else:
+            self.serial_.open()
 
     def controlMIT(self, DM_Motor, kp: float, kd: float, q: float, dq: float, tau: float):
         """
@@ -122,6 +492,135 @@ class MotorControl:
         self.__send_data(DM_Motor.SlaveID, data_buf)
         self.recv()  # receive the data from serial port
 
+    def controlMIT_batch(self, Motors, kp, kd, q, dq, tau):
+        """
+        MIT Control Mode for many motors at once 批量MIT控制
+        所有电机的 kp/kd/q/dq/tau 按各自电机类型的 Limit_Param 在一次 NumPy 运算中限幅、量化，
+        打包后一次写入串口，再统一接收反馈
+        :param Motors: Motor objects 电机对象列表
+        :param kp, kd, q, dq, tau: scalars or arrays of len(Motors) 标量或与电机数相同长度的数组
+        :return: None
+        """
+        plan = self.__mit_plan(Motors)
+        if plan is None:
+            print("controlMIT_batch ERROR : Motor ID not found")
+            return
+        lo, span, scale, frames, ids = plan
+        n = len(ids)
+        # 行顺序 kp, kd, q, dq, tau；一次限幅 + 量化
+        x = np.empty((5, n))
+        x[0] = kp
+        x[1] = kd
+        x[2] = q
+        x[3] = dq
+        x[4] = tau
+        np.clip(x, lo, lo + span, out=x)
+        u = ((x - lo) / span * scale).astype(np.uint16)
+        kp_uint, kd_uint, q_uint, dq_uint, tau_uint = u
+        data = frames[:, 21:29]
+        data[:, 0] = q_uint >> 8
+        data[:, 1] = q_uint & 0xff
+        data[:, 2] = dq_uint >> 4
+        data[:, 3] = ((dq_uint & 0xf) << 4) | (kp_uint >> 8)
+        data[:, 4] = kp_uint & 0xff
+        data[:, 5] = kd_uint >> 4
+        data[:, 6] = ((kd_uint & 0xf) << 4) | (tau_uint >> 8)
+        data[:, 7] = tau_uint & 0xff
+        self.__write_batch(frames, ids)
+
+    def control_Pos_Vel_batch(self, Motors, P_desired, V_desired):
+        """
+        position-velocity mode for many motors at once 批量位置速度控制
+        :param Motors: Motor objects 电机对象列表
+        :param P_desired: scalar or array of len(Motors) 期望位置
+        :param V_desired: scalar or array of len(Motors) 期望速度
+        """
+        plan = self.__frame_plan("pos_vel", Motors, 0x100)
+        if plan is None:
+            print("control_Pos_Vel_batch ERROR : Motor ID not found")
+            return
+        frames, ids = plan
+        n = len(ids)
+        values = np.empty((n, 2), "<f4")
+        values[:, 0] = P_desired
+        values[:, 1] = V_desired
+        frames[:, 21:29] = values.view(np.uint8)
+        self.__write_batch(frames, ids)
+
+    def control_Vel_batch(self, Motors, Vel_desired):
+        """
+        velocity mode for many motors at once 批量速度控制
+        :param Motors: Motor objects 电机对象列表
+        :param Vel_desired: scalar or array of len(Motors) 期望速度
+        """
+        plan = self.__frame_plan("vel", Motors, 0x200)
+        if plan is None:
+            print("control_Vel_batch ERROR : Motor ID not found")
+            return
+        frames, ids = plan
+        values = np.empty((len(ids), 1), "<f4")
+        values[:, 0] = Vel_desired
+        frames[:, 21:25] = values.view(np.uint8)
+        self.__write_batch(frames, ids)
+
+    def __write_batch(self, frames, ids):
+        """write prepared frames in one call, then receive 一次写入多帧并接收反馈"""
+        for _ in range(len(ids)):
+            self.scheduler.admit(BusScheduler.PRIO_CONTROL)
+        self.serial_.write(frames.tobytes())
+        if self.capture is not None:
+            for i, motor_id in enumerate(ids):
+                self.capture.tx(motor_id, frames[i, 21:29])
+        self.recv()  # receive the data from serial port
+
+    def __frame_plan(self, mode, Motors, id_offset):
+        """
+        cached frame template for a motor group 缓存一组电机的帧模板（CAN ID 已填好，数据段每次覆盖）
+        :return: (frames, can_ids) or None if a motor is not registered
+        """
+        key = (mode, tuple(Motors))
+        plan = self._batch_plans.get(key)
+        if plan is not None:
+            return plan
+        if any(Motor.SlaveID not in self.motors_map for Motor in Motors):
+            return None
+        ids = [id_offset + Motor.SlaveID for Motor in Motors]
+        frames = np.tile(self.send_data_frame, (len(Motors), 1))
+        # 发送缓冲中残留上一帧的数据段；清零后与逐个电机发送的帧一致（速度模式只覆盖前 4 字节）
+        frames[:, 21:29] = 0
+        for i, motor_id in enumerate(ids):
+            frames[i, 13] = motor_id & 0xff
+            frames[i, 14] = (motor_id >> 8) & 0xff
+        plan = (frames, ids)
+        self._batch_plans[key] = plan
+        return plan
+
+    def __mit_plan(self, Motors):
+        """
+        cached limits and frame template for a motor group 缓存一组电机的限幅参数与帧模板
+        :return: (lo, span, scale, frames, ids) or None if a motor is not registered
+        """
+        key = ("mit", tuple(Motors))
+        plan = self._batch_plans.get(key)
+        if plan is not None:
+            return plan
+        template = self.__frame_plan("mit_frames", Motors, 0)
+        if template is None:
+            return None
+        frames, ids = template
+        n = len(Motors)
+        limits = np.array([self.Limit_Param[Motor.MotorType] for Motor in Motors], np.float64)
+        lo = np.empty((5, n))
+        span = np.empty((5, n))
+        lo[0], span[0] = 0, 500          # kp
+        lo[1], span[1] = 0, 5            # kd
+        lo[2:] = -limits.T               # q, dq, tau
+        span[2:] = 2 * limits.T
+        scale = np.array([[4095], [4095], [65535], [4095], [4095]], np.float64)
+        plan = (lo, span, scale, frames, ids)
+        self._batch_plans[key] = plan
+        return plan
+
     def control_delay(self, DM_Motor, kp: float, kd: float, q: float, dq: float, tau: float, delay: float):
         """
         MIT Control Mode Function with delay 达妙电机MIT控制模式函数带延迟
@@ -216,7 +715,7 @@ class MotorControl:
         """
         data_buf = np.array([0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xfc], np.uint8)
         enable_id = ((int(ControlMode)-1) << 2) + Motor.SlaveID
-        self.__send_data(enable_id, data_buf)
+        self.__send_data(enable_id, data_buf, BusScheduler.PRIO_SAFETY)
         sleep(0.1)
         self.recv()  # receive the data from serial port
 
@@ -238,54 +737,57 @@ class MotorControl:
         self.recv()  # receive the data from serial port
 
     def recv(self):
+        self.flush_deferred()  # 预算允许时顺带补发延迟的低优先级帧
         # 把上次没有解析完的剩下的也放进来
-        data_recv = b''.join([self.data_save, self.serial_.read_all()])
+        new_data = self.serial_.read_all()
+        data_recv = b''.join([self.data_save, new_data])
         packets = self.__extract_packets(data_recv)
+        self.scheduler.on_rx(len(new_data), len(packets))
         for packet in packets:
             data = packet[7:15]
             CANID = (packet[6] << 24) | (packet[5] << 16) | (packet[4] << 8) | packet[3]
             CMD = packet[1]
+            if self.capture is not None:
+                self.capture.rx(CMD, CANID, data)
             self.__process_packet(data, CANID, CMD)
 
     def recv_set_param_data(self):
         data_recv = self.serial_.read_all()
         packets = self.__extract_packets(data_recv)
+        self.scheduler.on_rx(len(data_recv), len(packets))
         for packet in packets:
             data = packet[7:15]
             CANID = (packet[6] << 24) | (packet[5] << 16) | (packet[4] << 8) | packet[3]
             CMD = packet[1]
+            if self.capture is not None:
+                self.capture.rx(CMD, CANID, data)
             self.__process_set_param_packet(data, CANID, CMD)
 
     def __process_packet(self, data, CANID, CMD):
         if CMD == 0x11:
             if CANID != 0x00:
-                if CANID in self.motors_map:
-                    q_uint = np.uint16((np.uint16(data[1]) << 8) | data[2])
-                    dq_uint = np.uint16((np.uint16(data[3]) << 4) | (data[4] >> 4))
-                    tau_uint = np.uint16(((data[4] & 0xf) << 8) | data[5])
-                    MotorType_recv = self.motors_map[CANID].MotorType
-                    Q_MAX = self.Limit_Param[MotorType_recv][0]
-                    DQ_MAX = self.Limit_Param[MotorType_recv][1]
-                    TAU_MAX = self.Limit_Param[MotorType_recv][2]
-                    recv_q = uint_to_float(q_uint, -Q_MAX, Q_MAX, 16)
-                    recv_dq = uint_to_float(dq_uint, -DQ_MAX, DQ_MAX, 12)
-                    recv_tau = uint_to_float(tau_uint, -TAU_MAX, TAU_MAX, 12)
-                    self.motors_map[CANID].recv_data(recv_q, recv_dq, recv_tau)
+                motor = self.motors_map.get(CANID)
             else:
-                MasterID=data[0] & 0x0f
-                if MasterID in self.motors_map:
-                    q_uint = np.uint16((np.uint16(data[1]) << 8) | data[2])
-                    dq_uint = np.uint16((np.uint16(data[3]) << 4) | (data[4] >> 4))
-                    tau_uint = np.uint16(((data[4] & 0xf) << 8) | data[5])
-                    MotorType_recv = self.motors_map[MasterID].MotorType
-                    Q_MAX = self.Limit_Param[MotorType_recv][0]
-                    DQ_MAX = self.Limit_Param[MotorType_recv][1]
-                    TAU_MAX = self.Limit_Param[MotorType_recv][2]
-                    recv_q = uint_to_float(q_uint, -Q_MAX, Q_MAX, 16)
-                    recv_dq = uint_to_float(dq_uint, -DQ_MAX, DQ_MAX, 12)
-                    recv_tau = uint_to_float(tau_uint, -TAU_MAX, TAU_MAX, 12)
-                    self.motors_map[MasterID].recv_data(recv_q, recv_dq, recv_tau)
-
+                motor = self.motors_map.get(data[0] & 0x0f)
+            if motor is not None:
+                q_uint = np.uint16((np.uint16(data[1]) << 8) | data[2])
+                dq_uint = np.uint16((np.uint16(data[3]) << 4) | (data[4] >> 4))
+                tau_uint = np.uint16(((data[4] & 0xf) << 8) | data[5])
+                MotorType_recv = motor.MotorType
+                Q_MAX = self.Limit_Param[MotorType_recv][0]
+                DQ_MAX = self.Limit_Param[MotorType_recv][1]
+                TAU_MAX = self.Limit_Param[MotorType_recv][2]
+                recv_q = uint_to_float(q_uint, -Q_MAX, Q_MAX, 16)
+                recv_dq = uint_to_float(dq_uint, -DQ_MAX, DQ_MAX, 12)
+                recv_tau = uint_to_float(tau_uint, -TAU_MAX, TAU_MAX, 12)
+                motor.recv_data(recv_q, recv_dq, recv_tau)
+                # 迟到的参数读写应答（D[2] 为 0x33 / 0x55，D[0:2] 为本电机 SlaveID）也是 CMD 0x11，
+                # 其 D[0] / D[6] / D[7] 是 ID 与参数值而不是状态与温度，不能更新健康状态
+                if (data[2] == 0x33 or data[2] == 0x55) and ((data[1] << 8) | data[0]) == motor.SlaveID:
+                    return
+                # D[0] 高 4 位为状态 / 故障码，D[6] / D[7] 为 MOS / 线圈温度
+                motor.recv_health(data[0] >> 4, data[6], data[7])
+                self.health.update(motor)
 
     def __process_set_param_packet(self, data, CANID, CMD):
         if CMD == 0x11 and (data[2] == 0x33 or data[2] == 0x55):
@@ -325,25 +827,49 @@ class MotorControl:
 
     def __control_cmd(self, Motor, cmd: np.uint8):
         data_buf = np.array([0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, cmd], np.uint8)
-        self.__send_data(Motor.SlaveID, data_buf)
+        self.__send_data(Motor.SlaveID, data_buf, BusScheduler.PRIO_SAFETY)
 
-    def __send_data(self, motor_id, data):
+    def __send_data(self, motor_id, data, priority=BusScheduler.PRIO_CONTROL):
         """
         send data to the motor 发送数据到电机
+        低优先级帧在链路预算不足时进入调度器的延迟队列，稍后由 flush_deferred 补发
         :param motor_id:
         :param data:
-        :return:
+        :param priority: BusScheduler.PRIO_* 优先级
+        :return: True if written now 是否已立即发送
         """
+        if not self.scheduler.admit(priority):
+            self.scheduler.defer(motor_id, data)
+            return False
+        self.__write_frame(motor_id, data)
+        return True
+
+    def __write_frame(self, motor_id, data):
         self.send_data_frame[13] = motor_id & 0xff
         self.send_data_frame[14] = (motor_id >> 8)& 0xff  #id high 8 bits
         self.send_data_frame[21:29] = data
         self.serial_.write(bytes(self.send_data_frame.T))
+        if self.capture is not None:
+            self.capture.tx(motor_id, self.send_data_frame[21:29])
+
+    def flush_deferred(self):
+        """
+        send deferred low-priority frames while the budget allows 在预算允许时补发延迟的低优先级帧
+        :return: number of frames sent 补发的帧数
+        """
+        sent = 0
+        while True:
+            item = self.scheduler.pop_deferred()
+            if item is None:
+                return sent
+            self.__write_frame(item[0], np.frombuffer(item[1], np.uint8))
+            sent += 1
 
     def __read_RID_param(self, Motor, RID):
         can_id_l = Motor.SlaveID & 0xff #id low 8 bits
         can_id_h = (Motor.SlaveID >> 8)& 0xff  #id high 8 bits
         data_buf = np.array([np.uint8(can_id_l), np.uint8(can_id_h), 0x33, np.uint8(RID), 0x00, 0x00, 0x00, 0x00], np.uint8)
-        self.__send_data(0x7FF, data_buf)
+        self.__send_data(0x7FF, data_buf, BusScheduler.PRIO_STATUS)
 
     def __write_motor_param(self, Motor, RID, data):
         can_id_l = Motor.SlaveID & 0xff #id low 8 bits
@@ -366,6 +892,7 @@ class MotorControl:
         max_retries = 10
         retry_interval = 0.05  #retry times
         RID = 10
+        Motor.temp_param_dict.pop(RID, None)  # 丢弃旧值（可能来自参数缓存），只认本次应答
         self.__write_motor_param(Motor, RID, np.uint8(ControlMode))
         for _ in range(max_retries):
             sleep(retry_interval)
@@ -373,6 +900,7 @@ class MotorControl:
             if Motor.SlaveID in self.motors_map:
                 if RID in self.motors_map[Motor.SlaveID].temp_param_dict:
                     if self.motors_map[Motor.SlaveID].temp_param_dict[RID] == ControlMode:
+                        self.__remember_param(Motor, RID)
                         return True
                     else:
                         return False
@@ -394,6 +922,7 @@ class MotorControl:
     def change_limit_param(self, Motor_Type, PMAX, VMAX, TMAX):
         """
         change the PMAX VMAX TMAX of the motor 改变电机的PMAX VMAX TMAX
+        只影响本 MotorControl（本总线）的限幅参数表，并使本实例缓存的批量帧模板失效
         :param Motor_Type:
         :param PMAX: 电机的PMAX
         :param VMAX: 电机的VMAX
@@ -403,6 +932,7 @@ class MotorControl:
         self.Limit_Param[Motor_Type][0] = PMAX
         self.Limit_Param[Motor_Type][1] = VMAX
         self.Limit_Param[Motor_Type][2] = TMAX
+        self._batch_plans.clear()
 
     def refresh_motor_status(self,Motor):
         """
@@ -411,9 +941,31 @@ class MotorControl:
         can_id_l = Motor.SlaveID & 0xff #id low 8 bits
         can_id_h = (Motor.SlaveID >> 8) & 0xff  #id high 8 bits
         data_buf = np.array([np.uint8(can_id_l), np.uint8(can_id_h), 0xCC, 0x00, 0x00, 0x00, 0x00, 0x00], np.uint8)
-        self.__send_data(0x7FF, data_buf)
+        self.__send_data(0x7FF, data_buf, BusScheduler.PRIO_STATUS)
         self.recv()  # receive the data from serial port
 
+    def refresh_motors_status(self, Motors, timeout=0.02):
+        """
+        batch refresh motor status 批量刷新多个电机状态
+        先一次性发出全部查询帧，再在 timeout 内接收反馈，直到所有电机都更新或超时
+        :param Motors: Motor objects 电机对象列表
+        :param timeout: max wait time in seconds 最长等待时间 单位秒
+        :return: True if all motors updated 全部电机均收到反馈时返回 True
+        """
+        start = monotonic()
+        for Motor in Motors:
+            can_id_l = Motor.SlaveID & 0xff
+            can_id_h = (Motor.SlaveID >> 8) & 0xff
+            data_buf = np.array([np.uint8(can_id_l), np.uint8(can_id_h), 0xCC, 0x00, 0x00, 0x00, 0x00, 0x00], np.uint8)
+            self.__send_data(0x7FF, data_buf, BusScheduler.PRIO_STATUS)
+        while True:
+            self.recv()
+            if all(m.last_update >= start for m in Motors):
+                return True
+            if monotonic() - start >= timeout:
+                return False
+            sleep(0.0005)
+
     def change_motor_param(self, Motor, RID, data):
         """
         change the RID of the motor 改变电机的参数
@@ -425,11 +977,13 @@ class MotorControl:
         max_retries = 20
         retry_interval = 0.05  #retry times
 
+        Motor.temp_param_dict.pop(RID, None)  # 丢弃旧值（可能来自参数缓存），只认本次应答
         self.__write_motor_param(Motor, RID, data)
         for _ in range(max_retries):
             self.recv_set_param_data()
             if Motor.SlaveID in self.motors_map and RID in self.motors_map[Motor.SlaveID].temp_param_dict:
                 if abs(self.motors_map[Motor.SlaveID].temp_param_dict[RID] - data) < 0.1:
+                    self.__remember_param(Motor, RID)
                     return True
                 else:
                     return False
@@ -445,9 +999,11 @@ class MotorControl:
         """
         max_retries = 20
         retry_interval = 0.05  #retry times
+        Motor.temp_param_dict.pop(RID, None)  # 丢弃旧值（可能来自参数缓存），只认本次应答
         self.__read_RID_param(Motor, RID)
         for _ in range(max_retries):
             sleep(retry_interval)
+            self.flush_deferred()
             self.recv_set_param_data()
             if Motor.SlaveID in self.motors_map:
                 if RID in self.motors_map[Motor.SlaveID].temp_param_dict:
@@ -456,6 +1012,103 @@ class MotorControl:
                     return None
         return None
 
+    def read_motor_params(self, Motors, RIDs, timeout=0.5):
+        """
+        batch read registers of many motors 批量读取多个电机的多个参数
+        按轮次发送：每轮为所有尚未应答的参数发出读取帧（超出链路预算的部分由调度器排队，
+        被丢弃的在下一轮重发），直到全部收到或超时
+        :param Motors: Motor objects 电机对象列表
+        :param RIDs: DM_variable list 参数列表
+        :param timeout: max wait time in seconds 最长等待时间 单位秒
+        :return: {SlaveID: {RID: value}}, missing registers are omitted 未应答的参数不出现在结果中
+        """
+        for Motor in Motors:
+            for RID in RIDs:
+                Motor.temp_param_dict.pop(RID, None)
+        start = monotonic()
+        while True:
+            pending = [(Motor, RID) for Motor in Motors for RID in RIDs if RID not in Motor.temp_param_dict]
+            if not pending or monotonic() - start >= timeout:
+                break
+            for Motor, RID in pending:
+                self.__read_RID_param(Motor, RID)
+            round_end = monotonic() + 0.02
+            while monotonic() < round_end:
+                sleep(0.002)
+                self.flush_deferred()
+                self.recv_set_param_data()
+                if all(RID in Motor.temp_param_dict for Motor, RID in pending):
+                    break
+        return {Motor.SlaveID: {RID: Motor.temp_param_dict[RID] for RID in RIDs if RID in Motor.temp_param_dict}
+                for Motor in Motors}
+
+    def load_motor_params(self, Motors, registers=None, force=False, timeout=0.5):
+        """
+        load motor parameters through the persistent cache 通过参数缓存加载电机参数
+        只读取指纹（SN + sw_ver）；缓存中有相同指纹的记录时直接使用缓存，
+        否则（或 force=True）完整读取 registers 并写回缓存。
+        读到的参数放入 Motor.temp_param_dict，PMAX/VMAX/TMAX 自动更新本实例的 Limit_Param
+        （同一类型的电机读数不一致时不更新，并打印警告）。
+        :param Motors: Motor objects 电机对象列表
+        :param registers: DM_variable list, default MotorParamCache.REGISTERS 完整读取的参数列表
+        :param force: always do the full read 强制完整读取
+        :return: {SlaveID: "cached" | "read" | "partial" | "missing"}，partial 表示完整读取未全部应答（不写入缓存）
+        """
+        cache = self.param_cache
+        if registers is None:
+            registers = MotorParamCache.REGISTERS
+        fingerprint = self.read_motor_params(Motors, MotorParamCache.FINGERPRINT, timeout)
+        result = {}
+        sweep = []
+        for Motor in Motors:
+            fp = fingerprint[Motor.SlaveID]
+            if DM_variable.SN not in fp or DM_variable.sw_ver not in fp:
+                result[Motor.SlaveID] = "missing"
+                continue
+            entry = cache.get(fp[DM_variable.SN]) if cache is not None else None
+            if entry is not None and not force and entry.get(DM_variable.sw_ver) == fp[DM_variable.sw_ver]:
+                Motor.temp_param_dict.update(entry)
+                result[Motor.SlaveID] = "cached"
+            else:
+                sweep.append(Motor)
+        if sweep:
+            values = self.read_motor_params(sweep, registers, timeout)
+            for Motor in sweep:
+                if len(values[Motor.SlaveID]) < len(registers):
+                    result[Motor.SlaveID] = "partial"
+                    continue
+                result[Motor.SlaveID] = "read"
+                if cache is not None:
+                    cache.put(fingerprint[Motor.SlaveID][DM_variable.SN], values[Motor.SlaveID])
+            if cache is not None:
+                cache.save()
+        # 同一类型的电机共用一行限幅参数：读数一致时才更新，不一致时保留原值并给出警告
+        by_type = {}
+        for Motor in Motors:
+            p = Motor.temp_param_dict
+            if all(RID in p for RID in (DM_variable.PMAX, DM_variable.VMAX, DM_variable.TMAX)):
+                limits = [p[DM_variable.PMAX], p[DM_variable.VMAX], p[DM_variable.TMAX]]
+                by_type.setdefault(Motor.MotorType, {})[Motor.SlaveID] = limits
+        for MotorType, readings in by_type.items():
+            distinct = {tuple(limits) for limits in readings.values()}
+            if len(distinct) > 1:
+                detail = ", ".join(f"0x{sid:02X}={limits}" for sid, limits in readings.items())
+                print(f"load_motor_params WARNING : PMAX/VMAX/TMAX differ within motor type "
+                      f"{get_enum_by_index(MotorType, DM_Motor_Type).name} ({detail}), "
+                      f"keeping {self.Limit_Param[MotorType]}")
+                continue
+            limits = list(distinct.pop())
+            if self.Limit_Param[MotorType] != limits:
+                self.change_limit_param(MotorType, *limits)
+        return result
+
+    def __remember_param(self, Motor, RID):
+        """write a confirmed parameter change back to the cache 参数修改成功后同步到缓存"""
+        sn = Motor.temp_param_dict.get(DM_variable.SN)
+        if self.param_cache is not None and sn is not None:
+            self.param_cache.update(sn, RID, Motor.temp_param_dict[RID])
+            self.param_cache.save()
+
     # -------------------------------------------------
     # Extract packets from the serial data
     def __extract_packets(self, data):
@@ -465,16 +1118,20 @@ class MotorControl:
         frame_length = 16
         i = 0
         remainder_pos = 0
+        skipped = 0  # bytes dropped while re-aligning 为对齐帧头而丢弃的字节数
 
         while i <= len(data) - frame_length:
             if data[i] == header and data[i + frame_length - 1] == tail:
                 frame = data[i:i + frame_length]
                 frames.append(frame)
+                skipped += i - remainder_pos
                 i += frame_length
                 remainder_pos = i
             else:
                 i += 1
         self.data_save = data[remainder_pos:]
+        if skipped and self.capture is not None:
+            self.capture.resync(skipped)
         return frames
 
 
@@ -483,10 +1140,11 @@ def LIMIT_MIN_MAX(x, min, max):
         x = min
     elif x > max:
         x = max
+    return x
 
 
 def float_to_uint(x: float, x_min: float, x_max: float, bits):
-    LIMIT_MIN_MAX(x, x_min, x_max)
+    x = LIMIT_MIN_MAX(x, x_min, x_max)
     span = x_max - x_min
     data_norm = (x - x_min) / span
     return np.uint16(data_norm * ((1 << bits) - 1))
@@ -555,6 +1213,12 @@ def get_enum_by_index(index, enum_class):
         return None
 
 
+def state_name(state):
+    """name of a feedback state nibble 反馈状态码的名称，未定义的码返回十六进制字符串"""
+    member = get_enum_by_index(state, DM_Motor_State)
+    return member.name if member is not None else f"0x{int(state):X}"
+
+
 class DM_Motor_Type(IntEnum):
     DM4310 = 0
     DM4310_48V = 1
@@ -618,8 +1282,80 @@ class DM_variable(IntEnum):
     xout = 81
 
 
+class DM_Motor_State(IntEnum):
+    DISABLED = 0x0
+    ENABLED = 0x1
+    OVER_VOLTAGE = 0x8
+    UNDER_VOLTAGE = 0x9
+    OVER_CURRENT = 0xA
+    MOS_OVER_TEMP = 0xB
+    ROTOR_OVER_TEMP = 0xC
+    LOST_COMM = 0xD
+    OVERLOAD = 0xE
+
+
 class Control_Type(IntEnum):
     MIT = 1
     POS_VEL = 2
     VEL = 3
     Torque_Pos = 4
+
+
+class MotorParamCache:
+    """
+    persistent motor parameter cache keyed by SN 以电机 SN 为键的参数持久化缓存（JSON 文件）
+    每个电机一条记录 {参数名: 值}，启动时只需读取指纹（SN + sw_ver）即可判断缓存是否可用
+    """
+    FINGERPRINT = (DM_variable.SN, DM_variable.sw_ver)
+    REGISTERS = (DM_variable.SN, DM_variable.sw_ver, DM_variable.hw_ver, DM_variable.sub_ver,
+                 DM_variable.CTRL_MODE, DM_variable.PMAX, DM_variable.VMAX, DM_variable.TMAX,
+                 DM_variable.MST_ID, DM_variable.ESC_ID, DM_variable.TIMEOUT, DM_variable.can_br)
+
+    def __init__(self, path):
+        """
+        :param path: JSON file path, created on first save 缓存文件路径，首次保存时创建
+        """
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()  # 多个总线可共享同一个缓存
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+                if not isinstance(entries, dict):
+                    raise ValueError("top level is not an object")
+                self.entries = entries
+            except (ValueError, OSError) as e:
+                # 文件损坏（例如写入时断电）不影响启动：从空缓存开始，下次保存时覆盖
+                print(f"MotorParamCache WARNING : ignoring unreadable cache {path}: {e}")
+
+    def get(self, sn):
+        """
+        :return: {RID: value} for the motor, None if not cached 未缓存时返回 None
+        """
+        entry = self.entries.get(str(sn))
+        if entry is None:
+            return None
+        return {DM_variable[name]: value for name, value in entry.items()}
+
+    def put(self, sn, params):
+        """replace the record of a motor 替换某个电机的记录"""
+        with self._lock:
+            self.entries[str(sn)] = {DM_variable(RID).name: value for RID, value in params.items()}
+
+    def update(self, sn, RID, value):
+        """update one parameter of a cached motor 更新已缓存电机的单个参数"""
+        with self._lock:
+            entry = self.entries.get(str(sn))
+            if entry is not None:
+                entry[DM_variable(RID).name] = value
+
+    def save(self):
+        with self._lock:
+            tmp = self.path + ".tmp"
+            # 先完整写入临时文件并落盘，再原子替换，文件不会处于写了一半的状态
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
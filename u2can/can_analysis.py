@@ -0,0 +1,321 @@
+"""
+CAN 抓包离线分析：指令→反馈延迟、串口链路利用率、丢帧 / 重复帧、接收流重同步、控制循环周期分布。
+
+输入为 can_capture.CanCapture 写出的抓包文件（``main.py --can-capture``），全部统计按 NumPy
+向量化计算，一小时的抓包（数千万条记录）也只需数秒。
+
+    python -m u2can.can_analysis can.bin
+    python -m u2can.can_analysis can.bin --start 60 --end 120 -o can_report.png --no-show
+
+说明：
+  * 电机按（总线，SlaveID 低 4 位）归类：TX 取目标 SlaveID，RX 取反馈数据 data[0] 的低 4 位
+    （达妙反馈帧 data[0] = 状态 << 4 | ID 低 4 位），因此无需电机表即可配对；
+    不同总线上 ID 相同的电机分别统计。
+  * 参数读写的应答（见 can_capture.param_replies）不是反馈帧，不计入延迟、丢帧与重复帧。
+  * RX 时间戳是 MotorControl.recv() 解析该帧的时间，延迟包含串口缓冲与软件调度，
+    反映的是控制循环实际看到的延迟。
+  * 每条需要应答的 TX 与同一电机下一条 TX 之间收到的第一个反馈视为其应答；
+    窗口内没有反馈记为丢帧，多于一个反馈记为重复帧。
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from u2can.can_capture import (
+    KIND_MARK, KIND_RESYNC, KIND_RX, KIND_TX,
+    MODE_PARAM, load_capture, load_meta, param_replies, tx_mode, tx_target,
+)
+
+SERIAL_BAUD = 921600
+SERIAL_BYTES_PER_S = SERIAL_BAUD / 10      # 8N1：每字节 10 bit
+TX_FRAME_BYTES = 30                        # MotorControl.send_data_frame
+RX_FRAME_BYTES = 16                        # __extract_packets 的帧长
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+
+
+# -------------------------------------------------
+# 预处理
+# -------------------------------------------------
+def select_window(records, start=None, end=None):
+    """
+    截取 [start, end) 秒（相对第一条记录）的窗口，并把各字段复制为连续数组。
+    结构化记录的字段是跨步视图，逐字段复制一次后后续所有统计都在连续内存上进行。
+    :return: {"t", "kind", "bus", "cmd", "can_id", "data"} 列字典，按时间排序
+    """
+    t = np.array(records["t"])
+    order = None
+    if len(t) > 1 and np.any(t[1:] < t[:-1]):
+        # 多总线共享文件时记录可能轻微乱序
+        order = np.argsort(t, kind="stable")
+        t = t[order]
+    lo, hi = 0, len(t)
+    if len(t) and start is not None:
+        lo = np.searchsorted(t, t[0] + start, "left")
+    if len(t) and end is not None:
+        hi = np.searchsorted(t, t[0] + end, "left")
+
+    def column(name):
+        col = records[name]
+        col = col[order] if order is not None else col
+        return np.ascontiguousarray(col[lo:hi])
+
+    return {"t": t[lo:hi], "kind": column("kind"), "bus": column("bus"),
+            "cmd": column("cmd"), "can_id": column("can_id"), "data": column("data")}
+
+
+def _expects_reply(can_id, data):
+    """需要电机应答的 TX：各控制模式、使能/失能/设零点，以及 0x7FF 的状态查询（0xCC）。"""
+    mode = tx_mode(can_id, data)
+    return (mode != MODE_PARAM) | (data[:, 2] == 0xCC)
+
+
+def _percentiles(x):
+    if len(x) == 0:
+        return {p: np.nan for p in LATENCY_PERCENTILES}
+    return dict(zip(LATENCY_PERCENTILES, np.percentile(x, LATENCY_PERCENTILES)))
+
+
+def _group(keys, values):
+    """按 keys 稳定分组，返回 {key: values 子数组}（保持原有时间顺序）。"""
+    order = np.argsort(keys, kind="stable")
+    keys, values = keys[order], values[order]
+    uniq, first = np.unique(keys, return_index=True)
+    return dict(zip(uniq.tolist(), np.split(values, first[1:])))
+
+
+# -------------------------------------------------
+# 各项统计（输入为 select_window() 返回的列字典）
+# -------------------------------------------------
+def motor_latency(cols):
+    """
+    按（总线，电机）统计指令→反馈延迟、丢帧与重复帧。
+    :return: {(总线编号, 电机号): {"tx", "rx", "answered", "dropped", "duplicated",
+                                  "latency"(秒数组), "t"(对应 TX 时间)}}
+    """
+    kind, bus = cols["kind"], cols["bus"].astype(np.uint32)
+    is_tx = kind == KIND_TX
+    tx_id, tx_data = cols["can_id"][is_tx], cols["data"][is_tx]
+    reply = _expects_reply(tx_id, tx_data)
+    tx_t = cols["t"][is_tx][reply]
+    # 分组键：总线编号 << 8 | 电机号
+    tx_key = (bus[is_tx][reply] << 8) | (tx_target(tx_id[reply], tx_data[reply]) & 0x0F)
+    is_rx = (kind == KIND_RX) & (cols["cmd"] == 0x11)
+    is_fb = is_rx & ~param_replies(cols)
+    rx_t = cols["t"][is_fb]
+    rx_key = (bus[is_fb] << 8) | (cols["data"][is_fb, 0] & 0x0F)
+
+    cmds = _group(tx_key, tx_t)
+    fbs = _group(rx_key, rx_t)
+    result = {}
+    for key in sorted(set(cmds) | set(fbs)):
+        t_cmd = cmds.get(key, np.zeros(0))
+        t_fb = fbs.get(key, np.zeros(0))
+        next_cmd = np.append(t_cmd[1:], np.inf)
+        first = np.searchsorted(t_fb, t_cmd, "left")
+        last = np.searchsorted(t_fb, next_cmd, "left")
+        n_reply = last - first
+        answered = n_reply > 0
+        result[(key >> 8, key & 0xFF)] = {
+            "tx": len(t_cmd),
+            "rx": len(t_fb),
+            "answered": int(np.count_nonzero(answered)),
+            "dropped": int(np.count_nonzero(~answered)),
+            "duplicated": int(np.maximum(n_reply - 1, 0).sum()),
+            "latency": t_fb[first[answered]] - t_cmd[answered],
+            "t": t_cmd[answered],
+        }
+    return result
+
+
+def link_utilization(cols, bin_s=1.0):
+    """
+    按总线、方向统计串口链路利用率（相对 921600 baud 的字节预算），以 bin_s 秒为一格。
+    :return: {总线编号: {"t": 各格起点(相对秒), "tx": 利用率数组, "rx": 利用率数组}}
+    """
+    t, kind, bus = cols["t"], cols["kind"], cols["bus"]
+    if len(t) == 0:
+        return {}
+    duration = t[-1] - t[0]
+    n_bins = max(1, int(np.ceil(duration / bin_s)))
+    cell = np.minimum(((t - t[0]) / bin_s).astype(np.int64), n_bins - 1)
+    # 最后一格通常不满 bin_s，按实际时长计算预算
+    width = np.full(n_bins, bin_s)
+    width[-1] = max(duration - (n_bins - 1) * bin_s, 1e-3)
+    budget = SERIAL_BYTES_PER_S * width
+    # TX 方向：定长帧；RX 方向：有效帧 + 重同步时丢弃的字节
+    tx_bytes = np.where(kind == KIND_TX, TX_FRAME_BYTES, 0)
+    rx_bytes = np.where(kind == KIND_RX, RX_FRAME_BYTES,
+                        np.where(kind == KIND_RESYNC, cols["can_id"], 0))
+    result = {}
+    for b in np.unique(bus[kind != KIND_MARK]):
+        on_bus = bus == b
+        result[int(b)] = {
+            "t": np.arange(n_bins) * bin_s,
+            "tx": np.bincount(cell[on_bus], tx_bytes[on_bus], n_bins) / budget,
+            "rx": np.bincount(cell[on_bus], rx_bytes[on_bus], n_bins) / budget,
+        }
+    return result
+
+
+def resync_events(cols):
+    """接收流重同步事件：{"t"(相对秒), "bus", "bytes"}。"""
+    sel = cols["kind"] == KIND_RESYNC
+    t0 = cols["t"][0] if len(cols["t"]) else 0.0
+    return {"t": cols["t"][sel] - t0, "bus": cols["bus"][sel], "bytes": cols["can_id"][sel]}
+
+
+def loop_periods(cols):
+    """控制循环周期（相邻两个 MARK 记录的间隔，秒）。"""
+    return np.diff(cols["t"][cols["kind"] == KIND_MARK])
+
+
+def analyze(cols, bin_s=1.0):
+    """汇总全部统计。"""
+    t = cols["t"]
+    return {
+        "duration": float(t[-1] - t[0]) if len(t) else 0.0,
+        "records": len(t),
+        "motors": motor_latency(cols),
+        "utilization": link_utilization(cols, bin_s),
+        "resync": resync_events(cols),
+        "loop": loop_periods(cols),
+    }
+
+
+# -------------------------------------------------
+# 输出
+# -------------------------------------------------
+def format_report(result, bus_names=None):
+    """把 analyze() 的结果格式化为文本表格。"""
+    bus_names = bus_names or []
+    lines = [f"记录数 {result['records']}，时长 {result['duration']:.2f}s", ""]
+
+    lines.append("总线          电机  TX      RX      丢帧    重复    延迟 p50/p90/p99/p99.9/max (ms)")
+    for (bus, motor), m in sorted(result["motors"].items()):
+        name = bus_names[bus] if bus < len(bus_names) else str(bus)
+        pct = _percentiles(m["latency"])
+        lat_max = m["latency"].max() if len(m["latency"]) else np.nan
+        lat = "/".join(f"{pct[p] * 1e3:.2f}" for p in LATENCY_PERCENTILES)
+        lines.append(f"{name:<12s}  0x{motor:02X}  {m['tx']:<7d} {m['rx']:<7d} {m['dropped']:<7d} "
+                     f"{m['duplicated']:<7d} {lat}/{lat_max * 1e3:.2f}")
+    lines.append("")
+
+    lines.append(f"总线          TX 平均/峰值      RX 平均/峰值   （{SERIAL_BAUD} baud 预算）")
+    for bus, u in sorted(result["utilization"].items()):
+        name = bus_names[bus] if bus < len(bus_names) else str(bus)
+        lines.append(f"{name:<12s}  {u['tx'].mean():6.1%} / {u['tx'].max():6.1%}  "
+                     f"{u['rx'].mean():6.1%} / {u['rx'].max():6.1%}")
+    lines.append("")
+
+    rs = result["resync"]
+    lines.append(f"重同步事件 {len(rs['t'])} 次，共丢弃 {int(rs['bytes'].sum())} 字节")
+    for t, bus, n in list(zip(rs["t"], rs["bus"], rs["bytes"]))[:10]:
+        lines.append(f"  t={t:9.3f}s  bus={int(bus)}  丢弃 {int(n)} 字节")
+    lines.append("")
+
+    periods = result["loop"]
+    if len(periods):
+        med = np.median(periods)
+        pct = np.percentile(periods, (50, 90, 99, 99.9))
+        overrun = int(np.count_nonzero(periods > 2 * med))
+        lines.append(f"控制循环 {len(periods) + 1} 个周期，平均 {periods.mean() * 1e3:.3f} ms "
+                     f"({1.0 / periods.mean():.0f} Hz)")
+        lines.append("  p50/p90/p99/p99.9/max (ms): "
+                     + "/".join(f"{p * 1e3:.3f}" for p in pct) + f"/{periods.max() * 1e3:.3f}")
+        lines.append(f"  超过中位数 2 倍的周期: {overrun}")
+    else:
+        lines.append("无控制周期标记（MARK）记录")
+    return "\n".join(lines)
+
+
+def plot_report(result, out_path, bus_names=None, show=True):
+    """绘制延迟分布、链路利用率、循环周期分布与重同步事件并保存为 PNG。"""
+    import matplotlib
+    if not show:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    bus_names = bus_names or []
+    plt.figure(figsize=(12, 10))
+
+    # 1. 指令→反馈延迟分布
+    ax1 = plt.subplot(3, 1, 1)
+    for (bus, motor), m in sorted(result["motors"].items()):
+        if len(m["latency"]):
+            name = bus_names[bus] if bus < len(bus_names) else str(bus)
+            ax1.hist(m["latency"] * 1e3, bins=100, histtype="step", label=f"{name} 0x{motor:02X}")
+    ax1.set_xlabel("Latency (ms)")
+    ax1.set_yscale("log")
+    ax1.set_title("指令→反馈延迟")
+    ax1.legend()
+    ax1.grid(True)
+
+    # 2. 链路利用率 + 重同步事件
+    ax2 = plt.subplot(3, 1, 2)
+    for bus, u in sorted(result["utilization"].items()):
+        name = bus_names[bus] if bus < len(bus_names) else str(bus)
+        ax2.plot(u["t"], u["tx"] * 100, label=f"{name} TX")
+        ax2.plot(u["t"], u["rx"] * 100, label=f"{name} RX")
+    for t in result["resync"]["t"][:1000]:
+        ax2.axvline(t, color="r", alpha=0.3, linewidth=0.8)
+    ax2.set_xlabel("Time (s)")
+    ax2.set_ylabel("Utilization (%)")
+    ax2.set_title(f"串口链路利用率（{SERIAL_BAUD} baud，红线为重同步事件）")
+    ax2.legend()
+    ax2.grid(True)
+
+    # 3. 控制循环周期分布
+    ax3 = plt.subplot(3, 1, 3)
+    if len(result["loop"]):
+        ax3.hist(result["loop"] * 1e3, bins=200)
+        ax3.set_yscale("log")
+    ax3.set_xlabel("Period (ms)")
+    ax3.set_title("控制循环周期")
+    ax3.grid(True)
+
+    plt.tight_layout()
+    plt.savefig(out_path)
+    print(f"绘图已保存至 {out_path}")
+
+    if show:
+        try:
+            plt.show()
+        except Exception:
+            pass
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CAN 抓包离线分析")
+    parser.add_argument("paths", nargs="+", help="抓包文件（可多个，分别分析）")
+    parser.add_argument("--start", type=float, default=None, help="窗口起点（秒，相对第一条记录）")
+    parser.add_argument("--end", type=float, default=None, help="窗口终点（秒，相对第一条记录）")
+    parser.add_argument("--bin", type=float, default=1.0, help="链路利用率统计的时间格（秒）")
+    parser.add_argument("-o", "--out", default=None,
+                        help="输出 PNG 路径（多个文件时自动加序号）；不给出则只打印表格")
+    parser.add_argument("--no-show", action="store_true", help="只保存 PNG，不弹出窗口")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    for i, path in enumerate(args.paths):
+        cols = select_window(load_capture(path), args.start, args.end)
+        if len(cols["t"]) == 0:
+            print(f"{path}: 所选时间窗口内没有数据", file=sys.stderr)
+            continue
+        bus_names = load_meta(path).get("buses", [])
+        result = analyze(cols, args.bin)
+        print(f"== {path}")
+        print(format_report(result, bus_names))
+        if args.out:
+            out = args.out
+            if len(args.paths) > 1:
+                stem, dot, ext = out.rpartition(".")
+                out = f"{stem}_{i}.{ext}" if dot else f"{out}_{i}"
+            plot_report(result, out, bus_names, show=not args.no_show)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+CAN 收发抓包：把 MotorControl 发出与收到的每一帧连同 monotonic 时间戳写入紧凑的二进制文件，
+并提供离线解码，把抓包转换为按电机划分的 NumPy 数组。
+
+记录格式（小端，每条 24 字节，文件只追加、无文件头）::
+
+    t       f8   time.monotonic() 时间戳（秒）；RX 为解析该帧时的时间
+    kind    u1   0 = TX，1 = RX，2 = RESYNC（接收流中丢弃了无法对齐的字节），3 = MARK（控制周期标记）
+    bus     u1   总线编号（见同名 .meta.json 中的 buses）
+    cmd     u1   RX 帧的 CMD 字节（0x11 为电机反馈）；其余为 0
+    _pad    u1
+    can_id  u4   TX 为发送的 CAN ID；RX 为反馈帧中的 CANID；RESYNC 为丢弃的字节数；MARK 为标记值
+    data    8B   CAN 数据段（RESYNC / MARK 为 0）
+
+用法::
+
+    capture = CanCapture("can.bin")
+    mc = MotorControl(serial_device, capture=capture.tap("legs"))
+    ...
+    capture.close()
+
+    python -m u2can.can_capture can.bin       # 打印每个电机的帧统计
+"""
+
+import argparse
+import json
+import queue
+import struct
+import threading
+from time import monotonic
+
+import numpy as np
+
+CAPTURE_FORMAT = struct.Struct("<dBBBxI8s")
+CAPTURE_DTYPE = np.dtype([
+    ("t", "<f8"), ("kind", "u1"), ("bus", "u1"), ("cmd", "u1"), ("_pad", "u1"),
+    ("can_id", "<u4"), ("data", "u1", (8,)),
+])
+assert CAPTURE_DTYPE.itemsize == CAPTURE_FORMAT.size == 24
+
+KIND_TX = 0
+KIND_RX = 1
+KIND_RESYNC = 2
+KIND_MARK = 3
+_NO_DATA = bytes(8)
+
+# TX 指令模式（按 CAN ID 偏移区分，与 MotorControl 各控制函数一致）
+MODE_MIT = 0
+MODE_POS_VEL = 1
+MODE_VEL = 2
+MODE_POS_FORCE = 3
+MODE_SPECIAL = 4    # 使能 / 失能 / 设零点（数据前 7 字节为 0xFF）
+MODE_PARAM = 5      # 0x7FF：参数读写、状态查询、保存
+
+
+class _Tap:
+    """绑定到某个总线编号的抓包入口，作为 MotorControl 的 capture 参数。"""
+
+    __slots__ = ("capture", "bus")
+
+    def __init__(self, capture, bus):
+        self.capture = capture
+        self.bus = bus
+
+    def tx(self, can_id, data):
+        self.capture.record(KIND_TX, self.bus, 0, can_id, data)
+
+    def rx(self, cmd, can_id, data):
+        self.capture.record(KIND_RX, self.bus, cmd, can_id, data)
+
+    def resync(self, skipped):
+        self.capture.record(KIND_RESYNC, self.bus, 0, skipped, _NO_DATA)
+
+
+class CanCapture:
+    """
+    只追加的二进制 CAN 抓包文件。
+
+    ``record()`` 只把定长记录打包进内存缓冲区（持锁约 1 µs），缓冲区写满或超过
+    flush_interval 后交给后台线程写盘，收发路径上不做文件 I/O。多个总线可共享同一个文件，
+    各自通过 ``tap(name)`` 取得带总线编号的入口。
+    """
+
+    def __init__(self, path, buffer_records=4096, flush_interval=0.5):
+        """
+        :param path: 抓包文件路径（追加写入）
+        :param buffer_records: 内存缓冲区可容纳的记录数，写满后交给后台线程
+        :param flush_interval: 缓冲区未写满时的最长滞留时间（秒）
+        """
+        self.path = path
+        self.bus_names = []
+        self.records = 0
+        self._size = buffer_records * CAPTURE_FORMAT.size
+        self._buf = bytearray(self._size)
+        self._pos = 0
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._flush_interval = flush_interval
+        self._file = open(path, "ab")
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, name="can-capture", daemon=True)
+        self._thread.start()
+
+    # ---------- 采集 ----------
+    def tap(self, name="main"):
+        """返回绑定到总线 name 的抓包入口；总线编号与名称写入 <path>.meta.json。"""
+        if name not in self.bus_names:
+            self.bus_names.append(name)
+            with open(self.path + ".meta.json", "w", encoding="utf-8") as f:
+                json.dump({"record_size": CAPTURE_FORMAT.size, "buses": self.bus_names}, f)
+        return _Tap(self, self.bus_names.index(name))
+
+    def tx(self, can_id, data):
+        self.record(KIND_TX, 0, 0, can_id, data)
+
+    def rx(self, cmd, can_id, data):
+        self.record(KIND_RX, 0, cmd, can_id, data)
+
+    def resync(self, skipped):
+        self.record(KIND_RESYNC, 0, 0, skipped, _NO_DATA)
+
+    def mark(self, tag=0):
+        """记录一个控制周期标记（LegsController.control_tick 每周期调用一次），用于离线统计循环周期。"""
+        self.record(KIND_MARK, 0, 0, tag, _NO_DATA)
+
+    def record(self, kind, bus, cmd, can_id, data):
+        """追加一条记录（data 为 8 字节的 bytes / uint8 数组）。"""
+        t = monotonic()
+        with self._lock:
+            if self._closed:
+                return
+            CAPTURE_FORMAT.pack_into(self._buf, self._pos, t, kind, bus, cmd, can_id & 0xFFFFFFFF, bytes(data))
+            self._pos += CAPTURE_FORMAT.size
+            self.records += 1
+            if self._pos >= self._size:
+                self._swap()
+
+    def _swap(self):
+        # 调用方持有 _lock
+        self._queue.put(bytes(self._buf[:self._pos]))
+        self._pos = 0
+
+    # ---------- 写盘 ----------
+    def _writer(self):
+        while True:
+            try:
+                chunk = self._queue.get(timeout=self._flush_interval)
+            except queue.Empty:
+                with self._lock:
+                    if self._pos:
+                        self._swap()
+                continue
+            if chunk is None:
+                break
+            self._file.write(chunk)
+            self._file.flush()
+
+    def close(self):
+        """写出缓冲区中剩余的记录并关闭文件。"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._pos:
+                self._swap()
+            self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------------------------------------
+# 离线解码
+# -------------------------------------------------
+def load_capture(path):
+    """以内存映射方式读取抓包文件，返回 CAPTURE_DTYPE 结构化数组（末尾不完整的记录被忽略）。"""
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        n = f.tell() // CAPTURE_DTYPE.itemsize
+    if n == 0:
+        return np.zeros(0, CAPTURE_DTYPE)
+    return np.memmap(path, dtype=CAPTURE_DTYPE, mode="r", shape=(n,))
+
+
+def load_meta(path):
+    """读取 <path>.meta.json（不存在时返回空字典）。"""
+    try:
+        with open(path + ".meta.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _f32(data, start):
+    """把 data[:, start:start+4] 按小端 float32 解释。"""
+    return np.ascontiguousarray(data[:, start:start + 4]).view("<f4")[:, 0]
+
+
+def _uint_to_float(x, lo, hi, bits):
+    return x.astype(np.float64) / ((1 << bits) - 1) * (hi - lo) + lo
+
+
+def tx_mode(can_id, data):
+    """按 CAN ID 与数据段向量化地区分 TX 指令模式（MODE_*）。"""
+    base = can_id & 0xF00
+    mode = np.full(len(can_id), MODE_MIT, np.uint8)
+    mode[base == 0x100] = MODE_POS_VEL
+    mode[base == 0x200] = MODE_VEL
+    mode[base == 0x300] = MODE_POS_FORCE
+    # 前 7 字节全为 0xFF：按 8 字节小端整数一次比较
+    head = np.ascontiguousarray(data).view("<u8")[:, 0] & 0x00FFFFFFFFFFFFFF
+    mode[(base == 0) & (head == 0x00FFFFFFFFFFFFFF)] = MODE_SPECIAL
+    mode[can_id == 0x7FF] = MODE_PARAM
+    return mode
+
+
+def decode_feedback(data, limits):
+    """
+    向量化解码电机反馈帧（CMD 0x11）的数据段。
+    :param data: (N, 8) uint8
+    :param limits: (Q_MAX, DQ_MAX, TAU_MAX)
+    :return: q, dq, tau 三个 float64 数组
+    """
+    d = data.astype(np.uint16)
+    q_uint = (d[:, 1] << 8) | d[:, 2]
+    dq_uint = (d[:, 3] << 4) | (d[:, 4] >> 4)
+    tau_uint = ((d[:, 4] & 0xF) << 8) | d[:, 5]
+    q_max, dq_max, tau_max = limits
+    return (_uint_to_float(q_uint, -q_max, q_max, 16),
+            _uint_to_float(dq_uint, -dq_max, dq_max, 12),
+            _uint_to_float(tau_uint, -tau_max, tau_max, 12))
+
+
+def decode_commands(can_id, data, limits):
+    """
+    向量化解码 TX 指令的目标值。
+    :return: mode, pos, vel, tau（不适用的字段为 NaN）
+    """
+    mode = tx_mode(can_id, data)
+    n = len(can_id)
+    pos = np.full(n, np.nan)
+    vel = np.full(n, np.nan)
+    tau = np.full(n, np.nan)
+
+    m = (mode == MODE_POS_VEL) | (mode == MODE_POS_FORCE)
+    pos[m] = _f32(data[m], 0)
+    m = mode == MODE_POS_VEL
+    vel[m] = _f32(data[m], 4)
+    m = mode == MODE_VEL
+    vel[m] = _f32(data[m], 0)
+
+    m = mode == MODE_MIT
+    if m.any():
+        d = data[m].astype(np.uint16)
+        q_max, dq_max, tau_max = limits
+        pos[m] = _uint_to_float((d[:, 0] << 8) | d[:, 1], -q_max, q_max, 16)
+        vel[m] = _uint_to_float((d[:, 2] << 4) | (d[:, 3] >> 4), -dq_max, dq_max, 12)
+        tau[m] = _uint_to_float(((d[:, 6] & 0xF) << 8) | d[:, 7], -tau_max, tau_max, 12)
+    return mode, pos, vel, tau
+
+
+def tx_target(can_id, data):
+    """TX 帧的目标电机 SlaveID：0x7FF 帧的 ID 在数据段前两个字节，其余为 CAN ID 低 8 位。"""
+    param = can_id == 0x7FF
+    return np.where(param, data[:, 0].astype(np.uint32) | (data[:, 1].astype(np.uint32) << 8), can_id & 0xFF)
+
+
+def rx_source(can_id, data):
+    """RX 反馈帧对应的电机键：CANID 为 0 时取 data[0] 低 4 位（与 MotorControl.__process_packet 一致）。"""
+    return np.where(can_id == 0, data[:, 0] & 0x0F, can_id)
+
+
+def param_replies(records):
+    """
+    参数读写（0x33 / 0x55）应答的布尔掩码：CMD 0x11 的 RX 帧，data[2] 为 0x33 / 0x55，
+    且 data[0:2] 为同一总线上某条参数读写 TX 的目标 SlaveID。这类帧不是电机反馈；
+    普通反馈帧的 data[2] 是位置低字节，也可能等于 0x33 / 0x55，因此同时按目标 ID 区分。
+    :param records: 抓包记录（或具有 kind / bus / cmd / can_id / data 字段的列字典）
+    """
+    kind, bus, data = records["kind"], records["bus"].astype(np.uint32), records["data"]
+    is_param_cmd = (data[:, 2] == 0x33) | (data[:, 2] == 0x55)
+    param_tx = (kind == KIND_TX) & (records["can_id"] == 0x7FF) & is_param_cmd
+    targets = (bus[param_tx] << 16) | tx_target(records["can_id"][param_tx], data[param_tx])
+    slave = data[:, 0].astype(np.uint32) | (data[:, 1].astype(np.uint32) << 8)
+    return ((kind == KIND_RX) & (records["cmd"] == 0x11) & is_param_cmd
+            & np.isin((bus << 16) | slave, targets))
+
+
+def decode_capture(records, motors, limit_param=None):
+    """
+    把抓包记录拆分为按（总线，电机）的指令与反馈数组。
+    指令与反馈只在同一总线内配对，参数读写的应答（见 param_replies）不计入反馈。
+    :param records: load_capture() 的返回值（或其切片）
+    :param motors: Motor 对象（或具有 SlaveID / MasterID / MotorType 属性的对象）列表
+    :param limit_param: 各电机类型的 [Q_MAX, DQ_MAX, TAU_MAX]，默认 MotorControl.Limit_Param
+    :return: {(总线编号, SlaveID): {"tx_t", "tx_mode", "tx_pos", "tx_vel", "tx_tau", "rx_t", "q", "dq", "tau"}}，
+             只包含在该总线上有收发帧的电机
+    """
+    if limit_param is None:
+        from u2can.DM_CAN import MotorControl
+        limit_param = MotorControl.Limit_Param
+
+    tx = records[records["kind"] == KIND_TX]
+    rx = records[(records["kind"] == KIND_RX) & (records["cmd"] == 0x11) & ~param_replies(records)]
+    tx_slave = tx_target(tx["can_id"], tx["data"])
+    rx_master = rx_source(rx["can_id"], rx["data"])
+
+    result = {}
+    for bus in np.unique(np.concatenate([tx["bus"], rx["bus"]])).tolist():
+        tx_on, rx_on = tx["bus"] == bus, rx["bus"] == bus
+        for m in motors:
+            limits = limit_param[int(m.MotorType)]
+            sel = tx_on & (tx_slave == m.SlaveID)
+            keys = [m.MasterID] if m.MasterID != 0 else []
+            keys.append(m.SlaveID)
+            fb_sel = rx_on & np.isin(rx_master, keys)
+            if not sel.any() and not fb_sel.any():
+                continue
+            mode, pos, vel, tau = decode_commands(tx["can_id"][sel], tx["data"][sel], limits)
+            fb = rx[fb_sel]
+            q, dq, fb_tau = decode_feedback(fb["data"], limits)
+            result[(bus, m.SlaveID)] = {
+                "tx_t": np.asarray(tx["t"][sel]), "tx_mode": mode,
+                "tx_pos": pos, "tx_vel": vel, "tx_tau": tau,
+                "rx_t": np.asarray(fb["t"]), "q": q, "dq": dq, "tau": fb_tau,
+            }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CAN 抓包统计")
+    parser.add_argument("path", help="抓包文件")
+    args = parser.parse_args()
+
+    records = load_capture(args.path)
+    meta = load_meta(args.path)
+    if len(records) == 0:
+        print("空抓包")
+        return
+    duration = float(records["t"][-1] - records["t"][0])
+    n_tx = int(np.count_nonzero(records["kind"] == KIND_TX))
+    print(f"记录数 {len(records)}（TX {n_tx} / RX {len(records) - n_tx}），时长 {duration:.2f}s，"
+          f"总线 {meta.get('buses', ['?'])}")
+
+    tx = records[records["kind"] == KIND_TX]
+    rx = records[(records["kind"] == KIND_RX) & (records["cmd"] == 0x11) & ~param_replies(records)]
+    tx_ids, tx_counts = np.unique(tx_target(tx["can_id"], tx["data"]), return_counts=True)
+    rx_ids, rx_counts = np.unique(rx_source(rx["can_id"], rx["data"]), return_counts=True)
+    print("TX 目标 SlaveID   帧数")
+    for i, c in zip(tx_ids, tx_counts):
+        print(f"  0x{int(i):02X}           {int(c)}")
+    print("RX 反馈 ID        帧数")
+    for i, c in zip(rx_ids, rx_counts):
+        print(f"  0x{int(i):02X}           {int(c)}")
+
+
+if __name__ == "__main__":
+    main()